@@ -0,0 +1,76 @@
+"""Synthetic listing exports in the column layout load_listings() reads.
+
+    python bench/gen_listings.py --n 5000 --out /tmp/listings.csv --image-base http://127.0.0.1:8765
+"""
+from pathlib import Path
+import argparse
+import csv
+import random
+
+BRANDS = ["Nike", "Adidas", "Puma", "Reebok", "Converse", "Generic", "Stridex", "Urbano"]
+ITEMS  = ["running shoes", "sneakers", "trail runners", "slip-ons", "high tops", "sandals"]
+PRAISE = ["great fit", "very comfortable", "true to size", "good value", "nice colour",
+          "light and breathable", "solid build", "fast delivery", "looks premium", "grip is good"]
+GRIPES = ["sole came off", "runs small", "smells of glue", "colour faded", "laces broke"]
+TEMPLATE = "Best product ever!!! Highly recommended to everyone, five stars"
+
+COLUMNS = ["asin", "type", "title", "description", "rating", "returns", "image", "review_texts"]
+
+
+def _review(rng: random.Random) -> str:
+    bits = rng.sample(PRAISE, 2) if rng.random() < 0.8 else [rng.choice(PRAISE), rng.choice(GRIPES)]
+    return f"{bits[0].capitalize()}, {bits[1]}. Bought for {rng.choice(['running', 'the gym', 'daily wear'])}."
+
+
+def rows(n: int, image_base: str, seed: int = 0, images: int = 3, reviews: int = 12,
+         shared_images: float = 0.2, fake_share: float = 0.15):
+    """Yield CSV rows for n listings. `shared_images` of the photos come from a
+    small pool reused across listings; `fake_share` of listings get templated
+    reviews and skewed ratings."""
+    rng  = random.Random(seed)
+    pool = max(1, n // 20)
+    for i in range(n):
+        asin  = f"B{i:09d}"
+        fake  = rng.random() < fake_share
+        brand = rng.choice(BRANDS)
+        k     = rng.randint(0, 2 * reviews)
+        texts = [TEMPLATE if fake and rng.random() < 0.7 else _review(rng) for _ in range(k)]
+        yield {
+            "asin": asin, "type": "product",
+            "title": f"{brand} {rng.choice(ITEMS)} for men, size {rng.randint(6, 12)}",
+            "description": f"{brand} footwear. Synthetic listing {i}.",
+            "returns": rng.randint(0, 40) if fake else rng.randint(0, 5),
+            "review_texts": " | ".join(texts),
+        }
+        for j in range(rng.randint(1, images)):
+            key = f"p{rng.randrange(pool)}" if rng.random() < shared_images else f"{asin}-{j}"
+            yield {"asin": asin, "type": "image", "image": f"{image_base}/img/{key}.jpg"}
+        for _ in range(k):
+            stars = 5 if fake and rng.random() < 0.9 else rng.choice([1, 2, 3, 4, 4, 5, 5, 5])
+            yield {"asin": asin, "type": "review", "rating": stars}
+
+
+def write_csv(path: Path, n: int, image_base: str = "http://127.0.0.1:8765", **kwargs) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.DictWriter(fh, fieldnames=COLUMNS)
+        w.writeheader()
+        for r in rows(n, image_base, **kwargs):
+            w.writerow(r)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic listings CSV")
+    parser.add_argument("--n", type=int, default=1000, help="Number of listings (ASINs)")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--image-base", default="http://127.0.0.1:8765", help="Base URL of bench/server.py")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", type=int, default=3, help="Max images per listing")
+    parser.add_argument("--reviews", type=int, default=12, help="Mean reviews per listing")
+    parser.add_argument("--shared-images", type=float, default=0.2, help="Share of photos reused across listings")
+    args = parser.parse_args()
+    write_csv(args.out, args.n, args.image_base, seed=args.seed, images=args.images,
+              reviews=args.reviews, shared_images=args.shared_images)
+    print(f"✓ {args.n} listings → {args.out}")
@@ -0,0 +1,252 @@
+"""Offline benchmark suite: synthetic listings, a local image/Gemini stand-in
+and stub models, so numbers are comparable across machines and commits.
+
+    python bench/run.py --n 2000                       # results → bench/results/<timestamp>.json
+    python bench/run.py --n 2000 --save-baseline       # also write bench/baseline.json
+    python bench/run.py --n 2000 --fail-on-regression  # exit 1 if >15% worse than the baseline
+
+Visual signals need torch and the clip package for tokenisation; without them
+the end-to-end run disables `visual` and records that in the results.
+"""
+from pathlib import Path
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+# trustguard reads its config at import time: point it at throwaway state first
+_TMP = Path(tempfile.mkdtemp(prefix="tg-bench-"))
+os.environ.setdefault("TRUSTGUARD_CACHE_DIR", str(_TMP / "cache"))
+os.environ.setdefault("TRUSTGUARD_LLM_RPM", "100000")
+os.environ.setdefault("TRUSTGUARD_LLM_TPM", "1000000000")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+import server                                # noqa: E402
+from gen_listings import write_csv           # noqa: E402
+
+BASELINE = ROOT / "bench" / "baseline.json"
+
+
+def _rate(n: int, fn, repeat: int = 3) -> float:
+    """Best-of-`repeat` items per second."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return n / best
+
+
+def _has_visual() -> bool:
+    return all(importlib.util.find_spec(m) is not None for m in ("torch", "clip"))
+
+
+# ───────────────────────── micro benchmarks ─────────────────────────
+
+def bench_ingest(csv: Path) -> dict:
+    from trustguard.ingest import load_listings
+
+    n = sum(1 for _ in load_listings(csv))
+    return {
+        "ingest.listings_per_s":         _rate(n, lambda: sum(1 for _ in load_listings(csv))),
+        "ingest_chunked.listings_per_s": _rate(n, lambda: sum(1 for _ in load_listings(csv, chunksize=5000))),
+    }
+
+
+def bench_embed(listings) -> dict:
+    from trustguard.embed_store import EmbedDB
+
+    reviews = [r for l in listings for r in l["reviews"]]
+    queries = reviews[:500]
+
+    def add():
+        db = EmbedDB()
+        for l in listings:
+            db.add(l["reviews"], owner=l["id"])
+        return db
+
+    db = add()
+    return {
+        "embed_add.reviews_per_s":  _rate(len(reviews), add, repeat=1),
+        "embed_similar.queries_per_s": _rate(len(queries), lambda: db.similar_many(queries, k=5)),
+    }
+
+
+def bench_lfu(ops: int = 200_000) -> dict:
+    import numpy as np
+    from trustguard.embed_store import LFUCache
+
+    rng  = np.random.default_rng(0)
+    keys = [f"k{k}" for k in rng.zipf(1.2, ops) % 20_000]
+    vec  = np.ones(384, dtype=np.float32)
+
+    def run(cache):
+        for k in keys:
+            if cache.get(k) is None:
+                cache.put(k, vec)
+
+    return {
+        "lfu.ops_per_s":      _rate(ops, lambda: run(LFUCache(cap=4096))),
+        "lfu_slab.ops_per_s": _rate(ops, lambda: run(LFUCache(cap=4096, slab=True))),
+    }
+
+
+def bench_rules(listings) -> dict:
+    import numpy as np
+    from trustguard.ingest import to_columns
+    from trustguard.rules import anomaly_score, anomaly_scores, rating_entropy
+    from trustguard.scoring import aggregate, aggregate_many
+
+    n    = len(listings)
+    cols = to_columns(listings)
+    rng  = np.random.default_rng(0)
+    text, vis, flag = rng.random(n), rng.random(n), rng.random(n) < 0.1
+
+    def columnar():
+        rule = anomaly_scores(cols["ratings"], cols["offsets"], cols["returns"])
+        rating_entropy(cols["ratings"], cols["offsets"])
+        aggregate_many(text, vis, rule, flag)
+
+    def scalar():
+        for i, l in enumerate(listings):
+            aggregate(text[i], vis[i], anomaly_score(l["ratings"], l["returns"]), flag[i])
+
+    return {
+        "rules_columnar.listings_per_s": _rate(n, columnar),
+        "rules_scalar.listings_per_s":   _rate(n, scalar),
+    }
+
+
+# ───────────────────────── end to end ─────────────────────────
+
+def _server_stats(base_url: str) -> dict:
+    import urllib.request
+    with urllib.request.urlopen(f"{base_url}/stats") as resp:
+        return json.loads(resp.read())
+
+
+def bench_e2e(csv: Path, n: int, disabled: set, out_dir: Path, base_url: str) -> dict:
+    spec = importlib.util.spec_from_file_location("batch_run", ROOT / "scripts" / "batch_run.py")
+    batch_run = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(batch_run)
+    from trustguard import metrics
+
+    res = {}
+    for phase in ("cold", "warm"):  # warm: every cache populated by the cold pass
+        metrics.reset()
+        out = out_dir / f"e2e-{phase}.json"
+        before = _server_stats(base_url)
+        t0 = time.perf_counter()
+        batch_run.main(csv, out, disabled=disabled, window=32)
+        res[f"e2e_{phase}.listings_per_s"] = n / (time.perf_counter() - t0)
+        after = _server_stats(base_url)
+        # deterministic for a given --n: compared exactly, not within --tolerance
+        res[f"e2e_{phase}.llm_requests"]   = after["llm"] - before["llm"]
+        res[f"e2e_{phase}.image_requests"] = after["images"] - before["images"]
+        res[f"e2e_{phase}.stages"] = metrics.summary()["stages"]
+    return res
+
+
+# ───────────────────────── baseline ─────────────────────────
+
+def compare(results: dict, baseline: dict, tolerance: float, n: int) -> list:
+    """Throughput metrics more than `tolerance` below the baseline, and request
+    counts (`*_requests`) above it; counts only apply when --n matches."""
+    same_n = baseline.get("meta", {}).get("n_listings") == n
+    worse = []
+    for name, base in baseline.get("results", {}).items():
+        cur = results.get(name)
+        if not (isinstance(base, (int, float)) and isinstance(cur, (int, float))):
+            continue
+        if name.endswith("_requests"):
+            if same_n and cur > base:
+                worse.append((name, base, cur))
+        elif cur < base * (1 - tolerance):
+            worse.append((name, base, cur))
+    return worse
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main(n: int, out: Path, latency: dict, tolerance: float, save_baseline: bool,
+         fail_on_regression: bool, skip_e2e: bool, image_latency: float, llm_latency: float) -> int:
+    base_url = server.start(image_latency=image_latency, llm_latency=llm_latency)
+    os.environ["GEMINI_BASE_URL"] = base_url
+
+    from trustguard import stubs
+    from trustguard.ingest import load_listings
+    lat = stubs.install(latency)
+
+    csv = write_csv(_TMP / "listings.csv", n, base_url)
+    listings = list(load_listings(csv))
+
+    disabled = set() if _has_visual() else {"visual"}
+    results: dict = {}
+    for name, fn in [("ingest", lambda: bench_ingest(csv)), ("embed", lambda: bench_embed(listings)),
+                     ("lfu", bench_lfu), ("rules", lambda: bench_rules(listings))]:
+        print(f"· {name}")
+        results.update(fn())
+    if not skip_e2e:
+        print("· end-to-end batch_run")
+        results.update(bench_e2e(csv, len(listings), disabled, _TMP, base_url))
+
+    report = {
+        "meta": {
+            "n_listings": len(listings), "git": _git_rev(), "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "stub_latency": lat,
+            "image_latency": image_latency, "llm_latency": llm_latency, "disabled": sorted(disabled),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    for name, v in results.items():
+        if isinstance(v, (int, float)):
+            print(f"  {name:<34} {v:12.1f}")
+    print(f"✓ Results: {out}")
+
+    status = 0
+    if BASELINE.exists() and not save_baseline:
+        worse = compare(results, json.loads(BASELINE.read_text()), tolerance, len(listings))
+        for name, base, cur in worse:
+            print(f"  ✗ {name}: {cur:.1f} vs baseline {base:.1f} ({cur / base - 1:+.0%})")
+        if not worse:
+            print(f"✓ Within {tolerance:.0%} of {BASELINE.name}, no extra requests")
+        status = 1 if worse and fail_on_regression else 0
+    if save_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2))
+        print(f"✓ Baseline saved: {BASELINE}")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline TrustGuard+ benchmarks with stub backends")
+    parser.add_argument("--n", type=int, default=1000, help="Synthetic listings to generate")
+    parser.add_argument("--out", type=Path, default=None, help="Results JSON (default bench/results/<time>.json)")
+    parser.add_argument("--latency", default="", help="Stub latencies, e.g. blip2=0.1,clip=0.005 (seconds per item)")
+    parser.add_argument("--image-latency", type=float, default=0.0, help="Stand-in server delay per image")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stand-in server delay per Gemini call")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed throughput drop vs the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results to bench/baseline.json")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when a metric regresses")
+    parser.add_argument("--skip-e2e", action="store_true", help="Micro benchmarks only")
+    args = parser.parse_args()
+    latency = {k: float(v) for k, v in (kv.split("=") for kv in args.latency.split(",") if kv)}
+    out = args.out or ROOT / "bench" / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    sys.exit(main(args.n, out, latency, args.tolerance, args.save_baseline, args.fail_on_regression,
+                  args.skip_e2e, args.image_latency, args.llm_latency))
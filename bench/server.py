@@ -0,0 +1,104 @@
+"""Local stand-in for the image CDN and the Gemini REST endpoint.
+
+    python bench/server.py --port 8765 --image-latency 0.01 --llm-latency 0.3
+
+GET  /img/<key>.jpg                       deterministic JPEG per key
+POST /v1beta/models/<model>:generateContent  JSON verdict(s) derived from the prompt
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import re
+import threading
+
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+
+def _h(data: str) -> int:
+    return int(hashlib.blake2b(data.encode(), digest_size=8).hexdigest(), 16)
+
+
+def _jpeg(key: str, side: int) -> bytes:
+    h   = _h(key)
+    img = Image.new("RGB", (side, side * 3 // 4), (h & 255, (h >> 8) & 255, (h >> 16) & 255))
+    d   = ImageDraw.Draw(img)
+    for i in range(6):
+        x, y = (h >> (i * 7)) % side, (h >> (i * 5 + 3)) % (side // 2)
+        d.rectangle((x, y, x + side // 4, y + side // 5), fill=((h >> i) & 255, 40 * i % 255, 200))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _verdict(text: str) -> dict:
+    h = _h(text)
+    return {"score": round((h % 100) / 100, 2), "why": "synthetic verdict"}
+
+
+def make_app(image_side: int = 640, image_latency: float = 0.0, llm_latency: float = 0.0) -> web.Application:
+    cache: dict = {}
+    stats = {"images": 0, "llm": 0}
+
+    async def image(request: web.Request) -> web.Response:
+        await asyncio.sleep(image_latency)
+        key = request.match_info["key"]
+        if key not in cache:
+            cache[key] = _jpeg(key, image_side)
+        stats["images"] += 1
+        return web.Response(body=cache[key], content_type="image/jpeg")
+
+    async def generate(request: web.Request) -> web.Response:
+        await asyncio.sleep(llm_latency)
+        body   = await request.json()
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        blocks = re.split(r"^### Listing (\d+)$", prompt, flags=re.M)
+        if len(blocks) > 1:  # packed prompt
+            out = {"results": [{"id": int(i), **_verdict(t)} for i, t in zip(blocks[1::2], blocks[2::2])]}
+        else:
+            out = _verdict(prompt)
+        stats["llm"] += 1
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": json.dumps(out)}]}}]})
+
+    async def health(_request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/img/{key}.jpg", image)
+    app.router.add_post("/v1beta/models/{model}:generateContent", generate)
+    app.router.add_get("/stats", health)
+    return app
+
+
+def start(host: str = "127.0.0.1", port: int = 0, **kwargs) -> str:
+    """Serve on a daemon thread; returns the base URL."""
+    ready = threading.Event()
+    box: dict = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(make_app(**kwargs))
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, host, port)
+        loop.run_until_complete(site.start())
+        box["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="bench-server", daemon=True).start()
+    ready.wait()
+    return f"http://{host}:{box['port']}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local image + Gemini stand-in for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--image-side", type=int, default=640)
+    parser.add_argument("--image-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(make_app(args.image_side, args.image_latency, args.llm_latency), host=args.host, port=args.port)
@@ -1,67 +1,127 @@
 import streamlit as st
 st.set_page_config(page_title="TrustGuard+ Dashboard", layout="wide")
 
-import json
 import pathlib
+import sys
 import pandas as pd
 
 # Base directory of the project
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
 
-# Sidebar: allow user to override the JSON report path
+from trustguard.report_store import ReportStore, SORTS, build, store_path
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Sidebar: allow user to override the report path
 default_json = ROOT / "my_report.json"
-json_path = st.sidebar.text_input("Path to results JSON", str(default_json))
+json_path = st.sidebar.text_input("Path to results JSON (or its .sqlite store)", str(default_json))
 REPORTS = pathlib.Path(json_path)
+STORE = REPORTS if REPORTS.suffix == ".sqlite" else store_path(REPORTS)
+
+if not STORE.exists():
+    if REPORTS.exists() and REPORTS != STORE:
+        # reports from before batch_run wrote a store: index them once
+        with st.spinner(f"Indexing {REPORTS.name} …"):
+            build(REPORTS, STORE)
+    else:
+        st.warning(
+            f"Could not find {REPORTS}.\n\n"
+            "Run:\n"
+            "`python scripts/batch_run.py --csv data/your.csv --out my_report.json`\n"
+            "then paste the path above."
+        )
+        st.stop()
+
+
+# One connection per store; query results are cached per (filters, page) and
+# invalidated whenever the store file changes, so reruns do no work.
+@st.cache_resource
+def get_store(path: str) -> ReportStore:
+    return ReportStore(pathlib.Path(path))
 
-if not REPORTS.exists():
-    st.warning(
-        f"Could not find {REPORTS}.\n\n"
-        "Run:\n"
-        "`python scripts/batch_run.py --csv data/your.csv --out my_report.json`\n"
-        "then paste the path above."
-    )
-    st.stop()
 
-# Read the JSON with replacement for any invalid bytes
-json_str = REPORTS.read_text(encoding="utf-8", errors="replace")
-data     = json.loads(json_str)
+@st.cache_data(max_entries=256)
+def page(path: str, version: float, verdict, score_range, brand, search: str,
+         sort: str, descending: bool, limit: int, offset: int):
+    rows, total = get_store(path).query(verdict=verdict, min_score=score_range[0], max_score=score_range[1],
+                                        brand_mismatch=brand, search=search or None, sort=sort,
+                                        descending=descending, limit=limit, offset=offset)
+    return pd.DataFrame(rows), total
 
-# Build DataFrame and sort by risk (lowest trust first)
-df = pd.DataFrame(data).sort_values("trust_score")
 
-# Determine which key columns are present
-key_col = "asin" if "asin" in df.columns else "id"
-url_col = "product_url" if "product_url" in df.columns else "url"
+@st.cache_data(max_entries=1024)
+def details(path: str, version: float, asin: str):
+    return get_store(path).get(asin)
+
+
+@st.cache_data
+def counts(path: str, version: float):
+    return get_store(path).counts()
+
+
+store   = get_store(str(STORE))
+version = store.version()
 
 st.title("TrustGuard+ • Moderator Queue")
 
-st.subheader("All Listings")
+c = counts(str(STORE), version)
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Listings", c["total"])
+m2.metric("Listable", c["listable"])
+m3.metric("Flagged", c["flagged"])
+m4.metric("Brand mismatch", c["brand_mismatch"])
+
+# Filters (all applied in SQLite)
+st.sidebar.markdown("### Filters")
+verdict_opt = st.sidebar.selectbox("Verdict", ["All", "Flagged", "Listable"])
+verdict     = {"All": None, "Flagged": False, "Listable": True}[verdict_opt]
+score_range = st.sidebar.slider("Trust score", 0, 100, (0, 100))
+brand_opt   = st.sidebar.selectbox("Brand mismatch", ["Any", "Yes", "No"])
+brand       = {"Any": None, "Yes": True, "No": False}[brand_opt]
+search      = st.sidebar.text_input("Title search")
+sort        = st.sidebar.selectbox("Sort by", sorted(SORTS), index=sorted(SORTS).index("trust_score"))
+descending  = st.sidebar.checkbox("Descending", value=False)
+page_size   = st.sidebar.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+_, total = page(str(STORE), version, verdict, score_range, brand, search, sort, descending, 1, 0)
+pages = max(1, -(-total // page_size))
+page_no = st.sidebar.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+df, total = page(str(STORE), version, verdict, score_range, brand, search, sort, descending,
+                 page_size, (page_no - 1) * page_size)
+
+st.subheader(f"Listings — {total} match, page {page_no} of {pages}")
+if df.empty:
+    st.info("No listings match these filters.")
+    st.stop()
+
 st.dataframe(
-    df[[key_col, "title", "trust_score", "verdict"]],
+    df[["asin", "title", "trust_score", "verdict", "brand_mismatch"]],
     height=300,
     use_container_width=True
 )
 
-# Select a single listing to inspect
+# Select a single listing to inspect; its full record is loaded only now
 sel = st.selectbox(
     "Select a listing to inspect",
     df.index,
-    format_func=lambda i: f"{df.at[i, key_col]} — {df.at[i,'title']} (score {df.at[i,'trust_score']})"
+    format_func=lambda i: f"{df.at[i, 'asin']} — {df.at[i, 'title']} (score {df.at[i, 'trust_score']})"
 )
 
-record = df.loc[sel]
+record = details(str(STORE), version, df.at[sel, "asin"]) or {}
+url = record.get("product_url") or record.get("url", "")
 
 st.markdown("## Listing Details")
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    st.markdown(f"**{key_col.upper()}:** {record[key_col]}")
-    st.markdown(f"**Title:** {record['title']}")
-    st.markdown(f"**URL:** [{record[url_col]}]({record[url_col]})")
+    st.markdown(f"**ASIN:** {record.get('asin', '')}")
+    st.markdown(f"**Title:** {record.get('title', '')}")
+    st.markdown(f"**URL:** [{url}]({url})")
 
 with col2:
-    st.metric("Trust Score", record["trust_score"])
-    st.metric("Verdict", record["verdict"])
+    st.metric("Trust Score", record.get("trust_score"))
+    st.metric("Verdict", record.get("verdict"))
 
 st.markdown("### Breakdown of Signals")
 if "breakdown" in record:
@@ -1,24 +1,126 @@
 from pathlib import Path
 import argparse
-import json
+import collections
+import itertools
 import tqdm
 
-from trustguard.orchestrator import analyse_listing
+from trustguard import fingerprint, metrics, models, orchestrator, shard
+from trustguard.config import DISABLED_SIGNALS, LLM_PACK, EMBED_INDEX, EMBED_INDEX_PQ, EMBED_INDEX_MMAP
+from trustguard.embed_store import EmbedDB
+from trustguard.orchestrator import analyse_batch, analyse_since
 from trustguard.ingest import load_listings
+from trustguard.pipeline import run_pipeline
+from trustguard.report import open_writer
+from trustguard.report_store import ReportStore, store_path
 
-def main(input_csv: Path, output_json: Path):
-    results = []
-    for listing in tqdm.tqdm(
-        load_listings(input_csv),
-        desc="Scanning listings",
-        unit="listing"
-    ):
-        results.append(analyse_listing(listing))
+def _windows(it, size: int):
+    it = iter(it)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
 
-    output_json.write_text(
-        json.dumps(results, indent=2, ensure_ascii=False)
-    )
-    print(f"✓ Done. Wrote {len(results)} records to {output_json}")
+def main(input_csv: Path, output_json: Path, disabled=DISABLED_SIGNALS, warmup: bool = False,
+         window: int = 32, pipeline: bool = False, workers: int = 2,
+         resume: bool = False, checkpoint_every: int = None, pack: int = LLM_PACK,
+         index_dir: Path = None, index_mmap: bool = EMBED_INDEX_MMAP, chunksize: int = None, cascade: bool = False,
+         metrics_json: Path = None, prometheus: Path = None, profile: str = None,
+         shards: int = 1, shard_threads: int = None, since: Path = None,
+         store: Path = None, no_store: bool = False):
+    if pipeline:
+        # the stages score one listing at a time: no packed prompts, no batch cascade
+        clash = [flag for flag, on in (("--since", since), ("--cascade", cascade),
+                                       ("--pack", pack > 1), ("--shards", shards > 1)) if on]
+        if clash:
+            raise SystemExit(f"--pipeline scores one listing at a time; drop it to use {', '.join(clash)}")
+    metrics.profile(profile)
+    if warmup:
+        models.warmup(disabled=disabled)
+    if index_dir:
+        orchestrator.vecdb = EmbedDB.open(index_dir, kind=EMBED_INDEX, pq_m=EMBED_INDEX_PQ, mmap=index_mmap)
+
+    previous = fingerprint.load_previous(since) if since else None
+    if previous is not None:
+        print(f"↻ Incremental: {len(previous)} records in {since}; unchanged signals are carried forward")
+
+    report_store = None if no_store else ReportStore(store or store_path(output_json))
+    if report_store is not None and not resume:
+        report_store.clear()
+
+    stage_stats, shard_stats = {}, {}
+    skipped, carried = collections.Counter(), collections.Counter()
+    if shards > 1:
+        bar = tqdm.tqdm(desc=f"Scanning listings ({shards} shards)", unit="listing")
+        shard_stats = shard.run_sharded(
+            load_listings(input_csv, chunksize=chunksize), output_json, shards, disabled=disabled,
+            window=window, pack=pack, cascade=cascade, resume=resume,
+            checkpoint_every=checkpoint_every, threads=shard_threads, progress=bar.update,
+            previous=previous, store=report_store)
+        bar.close()
+        written = shard_stats["written"]
+        if shard_stats["resumed"]:
+            print(f"↻ Resumed: {shard_stats['resumed']} records were already in the report or earlier shard files")
+    else:
+        with open_writer(output_json, resume=resume, checkpoint_every=checkpoint_every,
+                          store=report_store) as writer:
+            if writer.count:
+                print(f"↻ Resuming: {writer.count} records already in {output_json}")
+            listings = (l for l in load_listings(input_csv, chunksize=chunksize) if str(l["id"]) not in writer.done)
+            bar = tqdm.tqdm(desc="Scanning listings", unit="listing")
+            if pipeline:
+                for record in run_pipeline(listings, disabled=disabled,
+                                           workers=workers, stats=stage_stats):
+                    writer.write(record)
+                    bar.update(1)
+            else:
+                for chunk in _windows(listings, window):
+                    if previous is not None:
+                        records = analyse_since(chunk, previous, disabled=disabled, pack=pack, cascade=cascade)
+                    else:
+                        records = analyse_batch(chunk, disabled=disabled, pack=pack, cascade=cascade)
+                    for record in records:
+                        writer.write(record)
+                        skipped.update(record["explanation"].get("cascade", {}).get("skipped", []))
+                        carried.update(record["explanation"].get("carried", []))
+                    bar.update(len(chunk))
+            bar.close()
+        written = writer.count
+
+    if index_dir and shards > 1:
+        print(f"  review index not saved: each of the {shards} shards extended its own copy")
+    elif index_dir:
+        orchestrator.vecdb.save(index_dir)
+        print(f"✓ Review index: {orchestrator.vecdb.ntotal} vectors saved to {index_dir}")
+    print(f"✓ Done. Wrote {written} records to {output_json}")
+    if report_store is not None:
+        report_store.close()
+        print(f"✓ Dashboard store: {len(report_store)} listings in {report_store.path}")
+    if shard_stats:
+        print(f"  shards {shards} × {shard_stats['threads_per_shard']} threads, listings per shard "
+              f"{shard_stats['listings_per_shard']}")
+    for signal, n in sorted(carried.items()):
+        print(f"  carried {signal:<7} forward on {n} listings")
+    for stage, n in sorted(skipped.items()):
+        print(f"  cascade skipped {stage:<7} on {n} listings")
+    for name, st in stage_stats.items():
+        print(f"  stage {name:<10} {st['items']:>7} items  {st['items_per_sec']:8.2f}/s  "
+              f"busy {st['busy_seconds']:9.1f}s  util {st['utilisation']:.0%}")
+    for name, st in models.stats().items():
+        print(f"  model {name:<10} loaded in {st['load_seconds']:6.1f}s  (+{st['rss_delta_mb']:.0f} MB RSS)")
+
+    metrics_json = metrics_json or Path(f"{output_json}.metrics.json")
+    summary = metrics.write_json(metrics_json, {"pipeline": stage_stats, "shards": shard_stats,
+                                                 "models": models.stats()})
+    for name, st in summary["stages"].items():
+        print(f"  time  {name:<12} {st['calls']:>7} calls  wall {st['wall_seconds']:9.1f}s  cpu {st['cpu_seconds']:9.1f}s")
+    print(f"✓ Metrics: {metrics_json}")
+    if prometheus:
+        metrics.write_prometheus(prometheus)
+        print(f"✓ Prometheus textfile: {prometheus}")
+    if profile:
+        top = metrics.dump_profile(Path(f"{output_json}.{profile}.prof"))
+        print(top or f"  (stage {profile!r} never ran, no profile written)")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -26,11 +128,100 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--csv", type=Path, required=True,
-        help="Path to the input CSV of product listings"
+        help="Path to the input listings (CSV, Parquet or JSONL export)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="Stream the input this many rows at a time (rows of one ASIN must be contiguous)"
     )
     parser.add_argument(
         "--out", type=Path, default=Path("reports.json"),
-        help="Path for the output JSON report"
+        help="Path for the output report (.json streamed array, .jsonl, or typed columnar .parquet / .arrow)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Keep records already in --out and skip their ASINs"
+    )
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=None,
+        help="fsync the report after this many records, or 30 s (default 100; .parquet / .arrow: "
+             "one part file each time, default 10000 rows)"
+    )
+    parser.add_argument(
+        "--disable", default=",".join(sorted(DISABLED_SIGNALS)),
+        help="Comma-separated signals to skip (text,visual,brand,embed); their models are never loaded"
+    )
+    parser.add_argument(
+        "--warmup", action="store_true",
+        help="Load every enabled model up front instead of on first use"
+    )
+    parser.add_argument(
+        "--window", type=int, default=32,
+        help="Listings per batched CLIP pass"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Run fetch / CPU models / LLM as concurrent stages with bounded queues "
+             "(one listing at a time: not with --pack > 1, --cascade, --shards or --since)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2,
+        help="CPU-stage workers in --pipeline mode (fetch gets twice as many)"
+    )
+    parser.add_argument(
+        "--pack", type=int, default=LLM_PACK,
+        help="Listings scored per Gemini prompt (1 = one prompt per listing)"
+    )
+    parser.add_argument(
+        "--index-dir", type=Path, default=None,
+        help="Load the review embedding index from this directory and save it back after the run"
+    )
+    parser.add_argument(
+        "--index-mmap", action="store_true", default=EMBED_INDEX_MMAP,
+        help="Memory-map the saved index instead of reading it into RAM (copied into memory on the first insert)"
+    )
+    parser.add_argument(
+        "--cascade", action="store_true",
+        help="Skip BLIP-2 / Gemini when cheaper signals already decide the verdict"
+    )
+    parser.add_argument(
+        "--metrics", type=Path, default=None,
+        help="Where to write the JSON timing / counter summary (default: <out>.metrics.json)"
+    )
+    parser.add_argument(
+        "--prometheus", type=Path, default=None,
+        help="Also write the metrics as a Prometheus textfile-collector file"
+    )
+    parser.add_argument(
+        "--profile", default=None, metavar="STAGE",
+        help="cProfile one stage (e.g. clip, blip2, ocr, gemini, sbert) into <out>.<STAGE>.prof"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=1,
+        help="Fork this many worker processes (listings split by ASIN hash; models loaded once, shared copy-on-write)"
+    )
+    parser.add_argument(
+        "--shard-threads", type=int, default=None,
+        help="torch / BLAS threads per shard (default: CPUs // shards)"
+    )
+    parser.add_argument(
+        "--since", type=Path, default=None, metavar="PREVIOUS_REPORT",
+        help="Re-run only signals whose input fingerprint changed since this report; carry the rest forward"
+    )
+    parser.add_argument(
+        "--store", type=Path, default=None,
+        help="SQLite store the dashboard reads (default: <out>.sqlite)"
+    )
+    parser.add_argument(
+        "--no-store", action="store_true",
+        help="Write only the report file, no dashboard store"
     )
     args = parser.parse_args()
-    main(args.csv, args.out)
+    disabled = {s.strip() for s in args.disable.split(",") if s.strip()}
+    main(args.csv, args.out, disabled=disabled, warmup=args.warmup, window=args.window,
+         pipeline=args.pipeline, workers=args.workers, resume=args.resume,
+         checkpoint_every=args.checkpoint_every, pack=args.pack,
+         index_dir=args.index_dir, index_mmap=args.index_mmap, chunksize=args.chunksize, cascade=args.cascade,
+         metrics_json=args.metrics, prometheus=args.prometheus, profile=args.profile,
+         shards=args.shards, shard_threads=args.shard_threads, since=args.since,
+         store=args.store, no_store=args.no_store)
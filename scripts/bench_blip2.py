@@ -0,0 +1,68 @@
+"""Images/second of the BLIP-2 risk scorer: the old one-image-per-generate fp32
+path versus batched generation at each CPU dtype.
+
+    python scripts/bench_blip2.py --images ./sample_imgs --n 32 --batch 8 --dtypes fp32,bf16,int8
+"""
+from pathlib import Path
+import argparse
+import io
+import time
+
+from PIL import Image
+
+from trustguard import models
+from trustguard.visual_clip import blip2_risk_batch
+
+OLD_THROTTLE_SECONDS = 60.0 / 15  # sleep the removed MAX_CALLS_PER_MIN = 15 imposed per image
+
+def _images(folder: Path, n: int):
+    raws = []
+    for p in sorted(folder.glob("*")) if folder else []:
+        if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp"):
+            raws.append(p.read_bytes())
+    if not raws:  # no samples given: flat-colour JPEGs
+        for i in range(n):
+            buf = io.BytesIO()
+            Image.new("RGB", (640, 640), ((37 * i) % 256, (91 * i) % 256, (53 * i) % 256)).save(buf, "JPEG")
+            raws.append(buf.getvalue())
+    return [(f"Sample product {i}", raws[i % len(raws)]) for i in range(n)]
+
+def _run(items, batch_size: int) -> float:
+    blip2_risk_batch(items[:1], batch_size=1)  # warm caches / lazy kernels
+    t0 = time.perf_counter()
+    blip2_risk_batch(items, batch_size=batch_size)
+    return len(items) / (time.perf_counter() - t0)
+
+def _load(dtype: str, threads: int):
+    models.unload("blip2")
+    models.BLIP2_DTYPE, models.BLIP2_THREADS = dtype, threads
+    models.get("blip2")
+    return models.stats()["blip2"]
+
+def main(images: Path, n: int, batch: int, dtypes, threads: int):
+    items = _images(images, n)
+    rows  = []
+
+    st = _load("fp32", threads)
+    rate = _run(items, 1)
+    rows.append(("before (fp32, batch 1)", rate, st))
+    print(f"  old path with the throttle: {1.0 / (1.0 / rate + OLD_THROTTLE_SECONDS):.3f} img/s")
+
+    for dtype in dtypes:
+        st = _load(dtype, threads)
+        rows.append((f"{dtype}, batch {batch}", _run(items, batch), st))
+
+    base = rows[0][1]
+    print(f"{'config':<24} {'img/s':>8} {'speed-up':>9} {'load s':>8} {'rss MB':>8}")
+    for name, rate, st in rows:
+        print(f"{name:<24} {rate:8.3f} {rate / base:8.2f}x {st['load_seconds']:8.1f} {st['rss_delta_mb']:8.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched / quantized BLIP-2 scoring on CPU")
+    parser.add_argument("--images", type=Path, default=None, help="Folder of sample images (default: synthetic)")
+    parser.add_argument("--n", type=int, default=32, help="Images to score per configuration")
+    parser.add_argument("--batch", type=int, default=8, help="Batch size for the batched runs")
+    parser.add_argument("--dtypes", default="fp32,bf16,int8", help="Comma-separated dtypes to compare")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+    main(args.images, args.n, args.batch, [d.strip() for d in args.dtypes.split(",") if d.strip()], args.threads)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+FUZZY_MIN_LEN = 5  # shorter tokens ("logo" vs "lego") are never fuzzy-matched
+_OCR_DIGITS = str.maketrans("0158", "oisb")  # digits OCR reads inside words: N1KE, AD1DAS
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance, or limit + 1 as soon as it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def default_distance(word: str) -> int:
+    n = len(word)
+    return 0 if n < FUZZY_MIN_LEN else 1 if n < 8 else 2
+
+
+class _TokenAutomaton:
+    """Aho-Corasick over token sequences, so multi-word aliases ("under armour")
+    match in one pass over the OCR / title tokens."""
+
+    def __init__(self):
+        self.goto : List[Dict[str, int]] = [{}]
+        self.fail : List[int] = [0]
+        self.out  : List[List[Tuple[int, str]]] = [[]]  # (alias length in tokens, canonical)
+
+    def add(self, seq: Tuple[str, ...], canonical: str):
+        node = 0
+        for tok in seq:
+            nxt = self.goto[node].get(tok)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][tok] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append((len(seq), canonical))
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for tok, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and tok not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(tok, 0) if node else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def scan(self, toks: List[str]) -> List[Tuple[int, str]]:
+        """(start token index, canonical) for every alias occurrence."""
+        hits: List[Tuple[int, str]] = []
+        node = 0
+        for i, tok in enumerate(toks):
+            while node and tok not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(tok, 0)
+            for length, canonical in self.out[node]:
+                hits.append((i - length + 1, canonical))
+        return hits
+
+
+def _deletes(word: str, depth: int) -> set:
+    out, frontier = {word}, {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+class _DeleteIndex:
+    """Symmetric-delete index: two words within k edits share a string reachable
+    from both by at most k deletions, so a lookup is a few dict probes plus
+    bounded Levenshtein checks on the candidates."""
+
+    def __init__(self, depth: int = 2):
+        self.depth = depth
+        self.index : Dict[str, List[Tuple[str, str]]] = {}  # deletion -> [(word, canonical)]
+
+    def add(self, word: str, canonical: str):
+        for d in _deletes(word, self.depth):
+            self.index.setdefault(d, []).append((word, canonical))
+
+    def nearest(self, word: str, max_dist: int) -> Optional[Tuple[int, str]]:
+        best: Optional[Tuple[int, str]] = None
+        seen = set()
+        for d in _deletes(word, min(max_dist, self.depth)):
+            for cand, canonical in self.index.get(d, ()):
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                dist = levenshtein(word, cand, max_dist)
+                if dist <= max_dist and (best is None or dist < best[0]):
+                    best = (dist, canonical)
+        return best
+
+
+class BrandLexicon:
+    """Brand names and aliases → canonical brand, with exact multi-pattern
+    matching over tokens and bounded-edit-distance lookups for OCR noise."""
+
+    def __init__(self, entries: Dict[str, Iterable[str]]):
+        self._ac    = _TokenAutomaton()
+        self._fuzzy = _DeleteIndex()
+        self.brands : Dict[str, str] = {}  # normalized alias -> canonical
+        for canonical, aliases in entries.items():
+            for alias in {canonical, *aliases}:
+                seq = tuple(tokens(alias))
+                if not seq:
+                    continue
+                flat = "".join(seq)
+                self._ac.add(seq, canonical)
+                if len(seq) > 1:
+                    self._ac.add((flat,), canonical)  # "UNDERARMOUR" on a label
+                self.brands[flat] = canonical
+                if len(flat) >= FUZZY_MIN_LEN:
+                    self._fuzzy.add(flat, canonical)
+        self._ac.build()
+
+    def __len__(self) -> int:
+        return len(set(self.brands.values()))
+
+    def __contains__(self, brand: str) -> bool:
+        return "".join(tokens(brand)) in self.brands
+
+    @classmethod
+    def from_file(cls, path: Path, extra: Iterable[str] = ()) -> "BrandLexicon":
+        """One brand per line: `canonical|alias|alias`; blank lines and # comments skipped."""
+        entries: Dict[str, List[str]] = {b.lower(): [] for b in extra}
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                names = [n.strip().lower() for n in line.split("|") if n.strip()]
+                entries.setdefault(names[0], []).extend(names[1:])
+        return cls(entries)
+
+    def canonical(self, word: str, max_dist: Optional[int] = None) -> Optional[str]:
+        """Canonical brand for a single (normalized) word, exact or within max_dist edits."""
+        hit = self.brands.get(word)
+        if hit is None and not word.isdigit() and not word.isalpha():
+            hit = self.brands.get(word.translate(_OCR_DIGITS))
+        if hit is not None:
+            return hit
+        max_dist = default_distance(word) if max_dist is None else max_dist
+        if max_dist <= 0 or len(word) < FUZZY_MIN_LEN:
+            return None
+        near = self._fuzzy.nearest(word, max_dist)
+        return near[1] if near else None
+
+    def find(self, text: str, fuzzy: bool = True, within: Optional[int] = None) -> List[str]:
+        """Brands mentioned in text, in order of first appearance; `within`
+        limits matches to those starting in the first n tokens."""
+        toks  = tokens(text)
+        limit = len(toks) if within is None else min(within, len(toks))
+        found = {c: s for s, c in reversed(self._ac.scan(toks)) if s < limit}
+        if fuzzy:
+            for i, tok in enumerate(toks[:limit]):
+                if tok not in self.brands:
+                    c = self.canonical(tok)
+                    if c is not None and c not in found:
+                        found[c] = i
+        return sorted(found, key=found.get)
+
+
+def load(path: Path, extra: Iterable[str] = ()) -> BrandLexicon:
+    return BrandLexicon.from_file(path, extra)
@@ -1,30 +1,21 @@
-import functools
-import io
 import re
-from typing import Optional
 import numpy as np
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
 from PIL import Image
-from paddleocr import PaddleOCR
 from difflib import SequenceMatcher
-from transformers import pipeline
 
-_paddle = PaddleOCR(lang="en")
+from . import fetch, metrics, models
+from .cache import SqliteCache
+from .config import CACHE_DIR, OCR_CROP, OCR_MAX_SIDE
+from .images import ImageBatch, SharedImage, shared
 
-_flan_extractor = pipeline(
-    "text2text-generation",
-    model="google/flan-t5-large",
-    tokenizer="google/flan-t5-large",
-    device=-1
-)
+OCR_DET_SIDE = 640  # resolution of the detection-only pass used by crop mode
 
-@functools.lru_cache(maxsize=512)
-def _download(url: str) -> Optional[bytes]:
-    try:
-        r = requests.get(url, timeout=10)
-        return r.content if r.ok else None
-    except:
-        return None
+_ocr_cache = SqliteCache(CACHE_DIR / "ocr.sqlite", table="ocr")
+metrics.source("ocr_cache", _ocr_cache.stats)
+
+TITLE_BRAND_TOKENS = 3  # a title's brand is named within its first few words
 
 def _normalize(s: str) -> str:
     return re.sub(r"[^a-z0-9]", "", s.lower())
@@ -32,17 +23,13 @@ def _normalize(s: str) -> str:
 def _fuzzy_ratio(a: str, b: str) -> float:
     return SequenceMatcher(None, a, b).ratio()
 
-def _ocr_with_paddle(raw: bytes) -> str:
-    img = Image.open(io.BytesIO(raw)).convert("RGB")
-    arr = np.array(img)
-    try:
-        results = _paddle.ocr(arr, det=True, rec=True)
-    except:
-        return ""
+def _ocr_lines(results) -> List[str]:
     lines = []
-    for item in results:
+    for item in results or []:
         if isinstance(item, dict):
-            txt = item.get("text") or item.get("ocr_text") or ""
+            txt = item.get("text") or item.get("ocr_text") or " ".join(item.get("rec_texts") or [])
+        elif hasattr(item, "get") and item.get("rec_texts") is not None:  # PaddleOCR 3.x result
+            txt = " ".join(item["rec_texts"])
         else:
             rec = item[1]
             if isinstance(rec, (list, tuple)):
@@ -51,8 +38,79 @@ def _ocr_with_paddle(raw: bytes) -> str:
                 txt = rec
         if txt:
             lines.append(txt)
-    return " ".join(lines)
+    return lines
+
+def _decode(img: SharedImage, max_side: int = OCR_MAX_SIDE) -> Optional[Image.Image]:
+    pil = img.pil(max_side)  # JPEG: decoded at reduced scale
+    if pil is not None and max(pil.size) > max_side:
+        pil = pil.copy()
+        pil.thumbnail((max_side, max_side))
+    return pil
+
+def _logo_crop(ocr, img: Image.Image, margin: float = 0.15) -> Image.Image:
+    """Crop to the largest detected text box – on product shots, the logo."""
+    small = img.copy()
+    small.thumbnail((OCR_DET_SIDE, OCR_DET_SIDE))
+    try:
+        boxes = ocr.ocr(np.array(small), det=True, rec=False)
+    except Exception:
+        return img
+    boxes = [np.asarray(b).reshape(-1, 2) for page in (boxes or []) for b in (page or [])]
+    if not boxes:
+        return img
+    box = max(boxes, key=lambda b: np.ptp(b[:, 0]) * np.ptp(b[:, 1]))
+    scale = img.width / small.width
+    (x0, y0), (x1, y1) = box.min(axis=0) * scale, box.max(axis=0) * scale
+    mx, my = (x1 - x0) * margin, (y1 - y0) * margin
+    return img.crop((max(0, int(x0 - mx)), max(0, int(y0 - my)),
+                     min(img.width, int(x1 + mx)), min(img.height, int(y1 + my))))
+
+def _run_ocr(imgs: List[Image.Image], crop: bool) -> List[Optional[str]]:
+    """Text per image, None where PaddleOCR failed (not cached, retried next time)."""
+    ocr = models.get("paddle_ocr")
+    if crop:
+        imgs = [_logo_crop(ocr, img) for img in imgs]
+    arrs = [np.array(img) for img in imgs]
+    if hasattr(ocr, "predict"):  # PaddleOCR 3.x batches a list natively
+        try:
+            return [" ".join(_ocr_lines([r])) for r in ocr.predict(arrs)]
+        except Exception:
+            return [None] * len(arrs)
+    out = []
+    for arr in arrs:
+        try:
+            out.append(" ".join(_ocr_lines(ocr.ocr(arr, det=True, rec=True))))
+        except Exception:
+            out.append(None)
+    return out
+
+@metrics.timed("ocr")
+def ocr_texts(raws: Sequence[Union[bytes, SharedImage, None]], max_side: int = OCR_MAX_SIDE,
+              crop: bool = OCR_CROP, workers: int = 4) -> List[str]:
+    """OCR text per image, cached by content hash so a photo reused across
+    listings, sellers or runs is only read once."""
+    raws  = [shared(raw) for raw in raws]
+    keys  = [None if not raw else f"{raw.digest}:{max_side}:{int(crop)}" for raw in raws]
+    known = _ocr_cache.get_many(k for k in keys if k)
+    todo  = list(dict.fromkeys(k for k in keys if k and k not in known))
+    if todo:
+        first = {k: raw for k, raw in zip(keys, raws) if k in todo}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            imgs = list(pool.map(lambda k: _decode(first[k], max_side), todo))
+        ok = [(k, img) for k, img in zip(todo, imgs) if img is not None]
+        texts: dict = {k: "" for k in todo}  # undecodable images read as no text
+        for (k, _), text in zip(ok, _run_ocr([img for _, img in ok], crop) if ok else []):
+            texts[k] = text
+        for k, text in texts.items():
+            known[k] = text or ""
+            if text is not None:
+                _ocr_cache.put(k, text)
+    return [known[k] if k else "" for k in keys]
 
+def _ocr_with_paddle(raw: Union[bytes, SharedImage]) -> str:
+    return ocr_texts([raw])[0]
+
+@metrics.timed("flan_t5")
 def _extract_brand_from_text(text: str) -> str:
     if not text.strip():
         return ""
@@ -61,20 +119,27 @@ def _extract_brand_from_text(text: str) -> str:
         "Respond with ONLY the brand, in lowercase, no extra words.\n\n"
         f"OCR text: {text}"
     )
-    out = _flan_extractor(prompt, max_new_tokens=8, do_sample=False)
+    out = models.get("flan_t5")(prompt, max_new_tokens=8, do_sample=False)
     gen = out[0]["generated_text"]
     if ":" in gen:
         gen = gen.split(":", 1)[1]
     return gen.strip().lower()
 
-def brand_mismatch(image_url: str, title: str, threshold: float = 0.80) -> bool:
-    title_brand = _normalize(title.split()[0] if title else "")
-    if not title_brand:
-        return False
-    raw = _download(image_url)
-    if not raw:
-        return False
-    ocr_text = _ocr_with_paddle(raw)
+def _title_brand(title: str) -> str:
+    return _normalize(title.split()[0] if title else "")
+
+def _mismatch(title: str, ocr_text: str, threshold: float = 0.80) -> bool:
+    title_brand = _title_brand(title)
+    lexicon = models.get("brand_lexicon")
+    ocr_brands = lexicon.find(ocr_text)
+    if ocr_brands:
+        title_brands = lexicon.find(title, within=TITLE_BRAND_TOKENS)
+        if title_brands:
+            return not set(title_brands) & set(ocr_brands)
+        return all(_fuzzy_ratio(title_brand, _normalize(b)) < threshold for b in ocr_brands)
+
+    # the lexicon could not resolve the label: compare the raw OCR string, and
+    # only fall back to flan-t5 when there is nothing legible to compare
     ocr_brand = _normalize(ocr_text)
     if not ocr_brand:
         extracted = _extract_brand_from_text(ocr_text)
@@ -83,3 +148,30 @@ def brand_mismatch(image_url: str, title: str, threshold: float = 0.80) -> bool:
         return False
     sim = _fuzzy_ratio(title_brand, ocr_brand)
     return sim < threshold
+
+def brand_mismatch(image_url: str, title: str, threshold: float = 0.80,
+                   images: Optional[ImageBatch] = None) -> bool:
+    if not _title_brand(title):
+        return False
+    img = images[image_url] if images is not None else SharedImage(fetch.get(image_url))
+    if not img:
+        return False
+    return _mismatch(title, _ocr_with_paddle(img), threshold)
+
+def brand_mismatch_many(items: Sequence[Tuple[str, List[str]]], n_images: int = 2,
+                        threshold: float = 0.80, images: Optional[ImageBatch] = None) -> List[bool]:
+    """brand_mismatch over the first n_images of many (title, image_urls)
+    listings, with one batched OCR pass for all of them."""
+    owners, urls = [], []
+    for i, (title, image_urls) in enumerate(items):
+        if _title_brand(title):
+            for url in image_urls[:n_images]:
+                owners.append(i)
+                urls.append(url)
+    raws  = (images if images is not None else ImageBatch()).many(urls)
+    texts = ocr_texts(raws)
+    flags = [False] * len(items)
+    for o, raw, text in zip(owners, raws, texts):
+        if raw and not flags[o]:
+            flags[o] = _mismatch(items[o][0], text, threshold)
+    return flags
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+class SqliteCache:
+    """Small persistent key → JSON value store shared by threads (and forks)."""
+
+    def __init__(self, path: Path, table: str = "kv"):
+        self.path   = Path(path)
+        self.table  = table
+        self.hits   = 0
+        self.misses = 0
+        self._lock  = threading.Lock()
+        self._conn  : Optional[sqlite3.Connection] = None
+        self._pid   : Optional[int] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db().execute(f"SELECT v FROM {self.table} WHERE k = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        out: Dict[str, Any] = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                for k, v in db.execute(f"SELECT k, v FROM {self.table} WHERE k IN ({marks})", part):
+                    out[k] = json.loads(v)
+            self.hits   += len(out)
+            self.misses += len(keys) - len(out)
+        return out
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            db = self._db()
+            db.execute(f"INSERT OR REPLACE INTO {self.table} (k, v) VALUES (?, ?)",
+                       (key, json.dumps(value, ensure_ascii=False)))
+            db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,209 @@
+from __future__ import annotations
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+BANDS = 4  # 64-bit dHash split into 4 × 16-bit bands: any two hashes ≤ 3 bits apart share a band
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash: robust to re-encoding, resizing and small edits."""
+    g = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return int(np.packbits((g[:, 1:] > g[:, :-1]).ravel()).view(">u8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _signed(h: int) -> int:  # SQLite integers are signed 64-bit
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def _bands(h: int) -> List[int]:
+    return [(h >> (16 * i)) & 0xFFFF for i in range(BANDS)]
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _Vectors:
+    """Append-only float32 matrix on disk, read through a memory map."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.dim  : Optional[int] = None
+        self._mm  : Optional[np.ndarray] = None
+
+    def append(self, vecs: np.ndarray) -> int:
+        """Write rows at the end of the file (caller holds the store lock);
+        returns the first row number."""
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+        row_bytes = vecs.shape[1] * 4
+        with open(self.path, "ab") as fh:
+            size = fh.seek(0, os.SEEK_END)
+            if size % row_bytes:  # torn row from a crashed writer
+                fh.truncate(size - size % row_bytes)
+                size -= size % row_bytes
+            fh.write(vecs.tobytes())
+        return size // row_bytes
+
+    def rows(self, idx: Sequence[int], dim: int) -> np.ndarray:
+        if self._mm is None or max(idx) >= self._mm.shape[0]:
+            n = os.path.getsize(self.path) // (dim * 4)
+            self._mm = np.memmap(self.path, dtype=np.float32, mode="r", shape=(n, dim))
+        return np.asarray(self._mm[list(idx)])
+
+
+class ClipStore:
+    """Persistent CLIP embeddings: image vectors keyed by content hash (with a
+    dHash band index for near-identical re-encodes and duplicate lookup) and
+    title vectors keyed by text hash. Vectors live in memory-mapped files,
+    keys in SQLite, so forked workers and later runs share one store."""
+
+    def __init__(self, root: Path):
+        self.root   = Path(root)
+        self._img   = _Vectors(self.root / "images.f32")
+        self._txt   = _Vectors(self.root / "texts.f32")
+        self._lock  = threading.Lock()
+        self._conn  : Optional[sqlite3.Connection] = None
+        self._pid   : Optional[int] = None
+        self.hits = self.phash_hits = self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.root / "keys.sqlite"), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            bands = ", ".join(f"b{i} INTEGER" for i in range(BANDS))
+            conn.execute(f"CREATE TABLE IF NOT EXISTS images (digest TEXT PRIMARY KEY, row INTEGER, phash INTEGER, {bands})")
+            for i in range(BANDS):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS images_b{i} ON images (b{i})")
+            conn.execute("CREATE TABLE IF NOT EXISTS texts (key TEXT PRIMARY KEY, row INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS owners (digest TEXT, owner TEXT, PRIMARY KEY (digest, owner))")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v INTEGER)")
+            self._conn, self._pid = conn, os.getpid()
+            self._img._mm = self._txt._mm = None
+        return self._conn
+
+    def _dim(self, db: sqlite3.Connection, vecs: Optional[np.ndarray] = None) -> Optional[int]:
+        row = db.execute("SELECT v FROM meta WHERE k = 'dim'").fetchone()
+        if row is None and vecs is not None:
+            db.execute("INSERT INTO meta (k, v) VALUES ('dim', ?)", (int(vecs.shape[1]),))
+            return int(vecs.shape[1])
+        return row[0] if row else None
+
+    def _get(self, table: str, col: str, vectors: _Vectors, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        with self._lock:
+            db  = self._db()
+            dim = self._dim(db)
+            if dim is None:
+                return {}
+            found: Dict[str, int] = {}
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                found.update(db.execute(f"SELECT {col}, row FROM {table} WHERE {col} IN ({marks})", part))
+            if not found:
+                return {}
+            vecs = vectors.rows(list(found.values()), dim)
+        return dict(zip(found, vecs))
+
+    def _put(self, table: str, vectors: _Vectors, rows: List[Tuple], vecs: np.ndarray):
+        """rows: (key, *extra columns); the vector row number is filled in."""
+        if not rows:
+            return
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")  # one writer across threads and processes
+            try:
+                self._dim(db, vecs)
+                start = vectors.append(vecs)
+                marks = ",".join("?" * (len(rows[0]) + 1))
+                db.executemany(f"INSERT OR IGNORE INTO {table} VALUES ({marks})",
+                               [(r[0], start + i, *r[1:]) for i, r in enumerate(rows)])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    # ── images ──
+
+    def get_images(self, digests: Sequence[str]) -> Dict[str, np.ndarray]:
+        out = self._get("images", "digest", self._img, digests)
+        self.hits += len(out)
+        return out
+
+    def near(self, phash: int, max_dist: int = 3) -> List[Tuple[str, int]]:
+        """(digest, distance) of stored images whose dHash is within max_dist
+        bits (exact for max_dist < BANDS), closest first."""
+        if max_dist < 0:
+            return []
+        where = " OR ".join(f"b{i} = ?" for i in range(BANDS))
+        with self._lock:
+            cands = self._db().execute(f"SELECT digest, phash FROM images WHERE {where}", _bands(phash)).fetchall()
+        hits = [(d, hamming(phash, p & ((1 << 64) - 1))) for d, p in cands]
+        return sorted((h for h in hits if h[1] <= max_dist), key=lambda h: h[1])
+
+    def reuse(self, digest: str, phash: int, max_dist: int) -> Optional[np.ndarray]:
+        """Vector of a near-identical stored image, recorded under `digest` too."""
+        for other, _ in self.near(phash, max_dist):
+            with self._lock:
+                db  = self._db()
+                row = db.execute("SELECT row FROM images WHERE digest = ?", (other,)).fetchone()
+                if row is None:
+                    continue
+                db.execute(f"INSERT OR IGNORE INTO images VALUES (?, ?, ?, {','.join('?' * BANDS)})",
+                           (digest, row[0], _signed(phash), *_bands(phash)))
+                vec = self._img.rows([row[0]], self._dim(db))[0]
+            self.phash_hits += 1
+            return vec
+        self.misses += 1
+        return None
+
+    def put_images(self, digests: Sequence[str], phashes: Sequence[int], vecs: np.ndarray):
+        self._put("images", self._img,
+                  [(d, _signed(p), *_bands(p)) for d, p in zip(digests, phashes)], vecs)
+
+    def tag(self, pairs: Iterable[Tuple[str, str]]):
+        """Record which listing (owner) used which image digest."""
+        with self._lock:
+            self._db().executemany("INSERT OR IGNORE INTO owners VALUES (?, ?)", list(pairs))
+
+    def duplicates(self, phash: int, max_dist: int = 3) -> List[str]:
+        """Listings that used an image near-identical to this one."""
+        digests = [d for d, _ in self.near(phash, max_dist)]
+        if not digests:
+            return []
+        with self._lock:
+            marks = ",".join("?" * len(digests))
+            return [o for (o,) in self._db().execute(
+                f"SELECT DISTINCT owner FROM owners WHERE digest IN ({marks})", digests)]
+
+    # ── titles ──
+
+    def get_texts(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        by_key = self._get("texts", "key", self._txt, [text_key(t) for t in texts])
+        return {t: by_key[text_key(t)] for t in texts if text_key(t) in by_key}
+
+    def put_texts(self, texts: Sequence[str], vecs: np.ndarray):
+        self._put("texts", self._txt, [(text_key(t),) for t in texts], vecs)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "phash_hits": self.phash_hits, "misses": self.misses}
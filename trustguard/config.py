@@ -1,10 +1,54 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
+CACHE_DIR      = Path(os.getenv("TRUSTGUARD_CACHE_DIR", ".trustguard_cache"))
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 EMBED_MODEL    = "all-MiniLM-L6-v2"
 LLM_MODEL      = "gemini-1.5-flash"
 CLIP_VARIANT   = "ViT-B/32"
 GEMINI_VISION_MODEL = "gemini-2.5-flash"
-KNOWN_BRANDS   = {"nike", "adidas", "puma", "reebok", "converse"}
\ No newline at end of file
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+LLM_RPM        = float(os.getenv("TRUSTGUARD_LLM_RPM", "15"))
+LLM_TPM        = float(os.getenv("TRUSTGUARD_LLM_TPM", "1000000"))
+LLM_CONCURRENCY = int(os.getenv("TRUSTGUARD_LLM_CONCURRENCY", "4"))
+LLM_PACK       = int(os.getenv("TRUSTGUARD_LLM_PACK", "1"))  # listings per Gemini prompt
+# text signal: "llm" (Gemini only), "local" (embedding reuse only) or
+# "hybrid" (Gemini only when review reuse does not already settle it)
+TEXT_MODE      = os.getenv("TRUSTGUARD_TEXT_MODE", "llm")
+LLM_REVIEW_TOKEN_BUDGET = int(os.getenv("TRUSTGUARD_LLM_REVIEW_TOKENS", "1500"))
+EMBED_INDEX    = os.getenv("TRUSTGUARD_EMBED_INDEX", "flat")  # flat | ivf | hnsw
+EMBED_INDEX_PQ = int(os.getenv("TRUSTGUARD_EMBED_INDEX_PQ", "0"))  # PQ sub-vectors, 0 = uncompressed
+EMBED_INDEX_MMAP = os.getenv("TRUSTGUARD_EMBED_INDEX_MMAP", "0") == "1"  # memory-map a saved index (copied on first write)
+EMBED_CACHE_ITEMS = int(os.getenv("TRUSTGUARD_EMBED_CACHE_ITEMS", "100000"))
+EMBED_CACHE_MB = int(os.getenv("TRUSTGUARD_EMBED_CACHE_MB", "256"))
+# persistent CLIP embeddings; images whose dHash is within CLIP_PHASH_REUSE bits
+# of a stored one reuse its vector (-1 = exact content hash only)
+CLIP_STORE_DIR = Path(os.getenv("TRUSTGUARD_CLIP_STORE_DIR", CACHE_DIR / "clip"))
+CLIP_PHASH_REUSE = int(os.getenv("TRUSTGUARD_CLIP_PHASH_REUSE", "2"))
+# OCR input is downscaled to this longest side; OCR_CROP reads only the largest text region
+OCR_MAX_SIDE   = int(os.getenv("TRUSTGUARD_OCR_MAX_SIDE", "1280"))
+OCR_CROP       = os.getenv("TRUSTGUARD_OCR_CROP", "0").lower() in ("1", "true", "yes")
+# local BLIP-2 inference: fp32 | bf16 | int8 (dynamic quantization, CPU only)
+BLIP2_DTYPE    = os.getenv("TRUSTGUARD_BLIP2_DTYPE", "fp32")
+BLIP2_BATCH    = int(os.getenv("TRUSTGUARD_BLIP2_BATCH", "8"))
+BLIP2_THREADS  = int(os.getenv("TRUSTGUARD_BLIP2_THREADS", "0"))  # 0 = torch default
+KNOWN_BRANDS   = {"nike", "adidas", "puma", "reebok", "converse"}
+# brand lexicon file (canonical|alias|alias per line); KNOWN_BRANDS are always added
+BRAND_LEXICON  = Path(os.getenv("TRUSTGUARD_BRAND_LEXICON", Path(__file__).parent / "data" / "brands.txt"))
+
+# comma-separated signals to skip entirely, e.g. TRUSTGUARD_DISABLE=visual,brand
+DISABLED_SIGNALS = {s.strip() for s in os.getenv("TRUSTGUARD_DISABLE", "").split(",") if s.strip()}
+
+FETCH_CACHE_DIR = CACHE_DIR / "images"
+FETCH_CACHE_MB = int(os.getenv("TRUSTGUARD_FETCH_CACHE_MB", "2048"))
+
+# scoring service (trustguard.service): concurrent requests are grouped into
+# batches of up to SERVICE_MAX_BATCH listings, waiting at most SERVICE_MAX_WAIT_MS;
+# new work is refused once SERVICE_MAX_QUEUE listings are pending or the expected
+# wait exceeds SERVICE_BUDGET_MS (0 = no latency budget)
+SERVICE_MAX_BATCH   = int(os.getenv("TRUSTGUARD_SERVICE_MAX_BATCH", "16"))
+SERVICE_MAX_WAIT_MS = float(os.getenv("TRUSTGUARD_SERVICE_MAX_WAIT_MS", "20"))
+SERVICE_MAX_QUEUE   = int(os.getenv("TRUSTGUARD_SERVICE_MAX_QUEUE", "256"))
+SERVICE_BUDGET_MS   = float(os.getenv("TRUSTGUARD_SERVICE_BUDGET_MS", "0"))
@@ -1,44 +1,179 @@
 from __future__ import annotations
 import collections
-from typing import Any, List, Tuple
+import hashlib
+import itertools
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Set, Tuple
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from .config import EMBED_MODEL
-
-_sbert = SentenceTransformer(EMBED_MODEL)
+from . import metrics, models
+from .config import EMBED_CACHE_ITEMS, EMBED_CACHE_MB
 
 class LFUCache:
-    def __init__(self, cap: int = 4096):
-        self.cap  = cap
-        self.data : dict[str, np.ndarray]      = {}
-        self.freq : collections.Counter[str]   = collections.Counter()
+    """O(1) LFU cache of embedding vectors.
+
+    Keys live in per-frequency buckets (insertion ordered, so ties evict the
+    oldest); every get/put touch moves a key up one bucket.  The non-empty
+    buckets are linked in increasing frequency, so the next-lowest one is known
+    without a scan when the least-frequent bucket empties.  The cache is bounded
+    by entry count and by bytes.  With slab=True the vectors are copied into one
+    preallocated float32 array instead of living as separate ndarrays.
+    """
+
+    def __init__(self, cap: int = 4096, max_bytes: int | None = None, slab: bool = False):
+        self.cap       = cap
+        self.max_bytes = max_bytes
+        self.slab      = slab
+        self.nbytes    = 0
+        self.hits = self.misses = self.evictions = 0
+        self.data    : dict[str, np.ndarray] = {}   # non-slab storage
+        self.slot    : dict[str, int]        = {}   # slab storage: key -> row
+        self.freq    : dict[str, int]        = {}
+        self.buckets : dict[int, collections.OrderedDict] = {}
+        self._next   : dict[int, int | None] = {}   # bucket frequency -> next higher one
+        self._prev   : dict[int, int | None] = {}
+        self.min_freq = 0
+        self._slab   : np.ndarray | None = None
+        self._free   : List[int] = []
+        self._lock   = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.freq)
+
+    def __contains__(self, k: str) -> bool:
+        return k in self.freq
+
+    def _bucket(self, f: int, after: int | None) -> collections.OrderedDict:
+        """Bucket f, created and linked in after bucket `after` (None: first) if new."""
+        if f not in self.buckets:
+            nxt = self._next[after] if after is not None else (self.min_freq if self.buckets else None)
+            self.buckets[f] = collections.OrderedDict()
+            self._prev[f], self._next[f] = after, nxt
+            if after is not None:
+                self._next[after] = f
+            if nxt is not None:
+                self._prev[nxt] = f
+        return self.buckets[f]
+
+    def _drop_bucket(self, f: int):
+        del self.buckets[f]
+        prv, nxt = self._prev.pop(f), self._next.pop(f)
+        if prv is not None:
+            self._next[prv] = nxt
+        if nxt is not None:
+            self._prev[nxt] = prv
+        if self.min_freq == f:
+            self.min_freq = nxt or 0
+
+    def _touch(self, k: str):
+        f = self.freq[k]
+        self._bucket(f + 1, f)[k] = None
+        self.freq[k] = f + 1
+        bucket = self.buckets[f]
+        del bucket[k]
+        if not bucket:
+            self._drop_bucket(f)
+
+    def _evict_one(self):
+        bucket = self.buckets[self.min_freq]
+        victim, _ = bucket.popitem(last=False)
+        if not bucket:
+            self._drop_bucket(self.min_freq)
+        del self.freq[victim]
+        if self.slab:
+            self._free.append(self.slot.pop(victim))
+            self.nbytes -= self._slab.shape[1] * 4
+        else:
+            self.nbytes -= self.data.pop(victim).nbytes
+        self.evictions += 1
+
+    def _alloc_slab(self, dim: int):
+        rows = self.cap
+        if self.max_bytes:
+            rows = max(1, min(rows, self.max_bytes // (dim * 4)))
+        self._slab = np.empty((rows, dim), dtype="float32")
+        self._free = list(range(rows - 1, -1, -1))
 
     def get(self, k: str) -> np.ndarray | None:
-        return self.data.get(k)
+        with self._lock:
+            if k not in self.freq:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(k)
+            if self.slab:
+                return self._slab[self.slot[k]].copy()
+            return self.data[k]
 
     def put(self, k: str, v: np.ndarray):
-        if k in self.data:
-            return
-        if len(self.data) >= self.cap:
-            victim, _ = self.freq.most_common()[-1]
-            self.data.pop(victim, None)
-            self.freq.pop(victim, None)
-        self.data[k] = v
+        with self._lock:
+            if k in self.freq:
+                self._touch(k)
+                return
+            if self.slab:
+                if self._slab is None:
+                    self._alloc_slab(v.shape[0])
+                if v.shape[0] != self._slab.shape[1]:
+                    return
+                size = self._slab.shape[1] * 4
+            else:
+                size = v.nbytes
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            while self.freq and (len(self.freq) >= self.cap
+                                 or (self.max_bytes is not None and self.nbytes + size > self.max_bytes)
+                                 or (self.slab and not self._free)):
+                self._evict_one()
+            if self.slab:
+                row = self._free.pop()
+                self._slab[row] = v
+                self.slot[k] = row
+            else:
+                self.data[k] = v
+            self.nbytes += size
+            self.freq[k] = 1
+            self._bucket(1, None)[k] = None
+            self.min_freq = 1
 
     def bump(self, k: str):
-        self.freq[k] += 1
+        with self._lock:
+            if k in self.freq:
+                self._touch(k)
 
     def clear(self):
-        self.data.clear()
-        self.freq.clear()
+        with self._lock:
+            self.data.clear()
+            self.slot.clear()
+            self.freq.clear()
+            self.buckets.clear()
+            self._next.clear()
+            self._prev.clear()
+            self._free = list(range(len(self._slab) - 1, -1, -1)) if self._slab is not None else []
+            self.min_freq = 0
+            self.nbytes = 0
 
-_cache = LFUCache()
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries":   len(self.freq),
+            "bytes":     self.nbytes,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "evictions": self.evictions,
+            "hit_rate":  self.hits / total if total else 0.0,
+        }
 
+_cache = LFUCache(cap=EMBED_CACHE_ITEMS, max_bytes=EMBED_CACHE_MB * 2**20, slab=True)
+metrics.source("embed_lfu", _cache.stats)
+
+@metrics.timed("sbert")
 def _embed(texts: List[str]) -> np.ndarray:
     if not texts:
         return np.empty((0, 0), dtype="float32")
-    vecs = _sbert.encode(
+    vecs = models.get("sbert").encode(
         texts,
         batch_size=32,
         convert_to_numpy=True,
@@ -48,42 +183,151 @@ def _embed(texts: List[str]) -> np.ndarray:
         raise ValueError(f"Bad embedding shape: {vecs.shape}")
     return vecs.astype("float32")
 
+def _as_text(item: Any) -> str:
+    # coerce to a string key
+    if isinstance(item, str):
+        return item
+    try:
+        return item.get("body") or item.get("text") or repr(item)
+    except Exception:
+        return repr(item)
+
+_FACTORY = {
+    # kind -> (factory spec without PQ, with PQ)
+    "flat": ("Flat",          "PQ{m}"),
+    "ivf":  ("IVF{nlist},Flat", "IVF{nlist},PQ{m}"),
+    "hnsw": ("HNSW{hnsw_m}",  "HNSW{hnsw_m}_PQ{m}"),
+}
+
+def _text_key(txt: str) -> bytes:
+    return hashlib.blake2b(txt.encode("utf-8"), digest_size=8).digest()
+
 class EmbedDB:
-    def __init__(self):
-        self.idx  : faiss.IndexFlatIP | None = None
-        self.dim  : int | None               = None
-        self.text : List[str]                = []
+    """FAISS inner-product index over review embeddings.
+
+    kind="flat" is exact brute force; "ivf" / "hnsw" are approximate and, like
+    pq_m > 0 (product quantization), need training – vectors are kept in a flat
+    index until `train_size` have arrived, then moved into the trained index.
+    Texts are de-duplicated on insert, and the whole store can be saved to a
+    directory and re-opened (optionally memory-mapped) by the next run.
+    """
+
+    def __init__(self, kind: str = "flat", nlist: int = 1024, pq_m: int = 0, hnsw_m: int = 32,
+                 train_size: int = 50_000, nprobe: int = 16, ef_search: int = 64):
+        if kind not in _FACTORY:
+            raise ValueError(f"Unknown index kind: {kind}")
+        self.kind       = kind
+        self.nlist      = nlist
+        self.pq_m       = pq_m
+        self.hnsw_m     = hnsw_m
+        self.train_size = train_size
+        self.nprobe     = nprobe
+        self.ef_search  = ef_search
+        self.idx   : faiss.Index | None = None
+        self.dim   : int | None         = None
+        self.text  : List[str]          = []
+        self.owner : List[Optional[str]] = []
+        self._keys : Set[bytes]         = set()
+        self._staging = False   # True while vectors wait in a flat index for training
+        self._mmap    = False
+        self._saved   = 0       # rows already persisted in meta.jsonl ...
+        self._saved_b = 0       # ... and the byte length they occupy
+        self._lock = threading.RLock()
+
+    def _spec(self) -> str:
+        plain, pq = _FACTORY[self.kind]
+        return (pq if self.pq_m else plain).format(nlist=self.nlist, m=self.pq_m, hnsw_m=self.hnsw_m)
+
+    def _build(self, dim: int) -> faiss.Index:
+        idx = faiss.index_factory(dim, self._spec(), faiss.METRIC_INNER_PRODUCT)
+        self._tune(idx)
+        return idx
+
+    def _tune(self, idx: faiss.Index):
+        ps = faiss.ParameterSpace()
+        for name, val in (("nprobe", self.nprobe), ("efSearch", self.ef_search)):
+            try:
+                ps.set_index_parameter(idx, name, val)
+            except RuntimeError:
+                pass
 
     def _reset(self, dim: int):
-        self.idx = faiss.IndexFlatIP(dim)
+        target = self._build(dim)
+        self._staging = not target.is_trained
+        self.idx = faiss.IndexFlatIP(dim) if self._staging else target
         self.dim = dim
-        _cache.clear()
         self.text.clear()
+        self.owner.clear()
+        self._keys.clear()
+        self._saved = self._saved_b = 0
 
     def _ensure(self, dim: int):
         if self.idx is None or dim != self.dim:
             self._reset(dim)
+        elif self._mmap:
+            # memory-mapped indexes are read-only; copy into RAM before growing
+            self.idx, self._mmap = faiss.clone_index(self.idx), False
+            self._tune(self.idx)
 
-    def add(self, items: List[Any]):
+    def _maybe_train(self):
+        if not self._staging or self.idx.ntotal < self.train_size:
+            return
+        allv = self.idx.reconstruct_n(0, self.idx.ntotal)
+        rng  = np.random.default_rng(0)
+        sample = allv[rng.choice(len(allv), size=min(len(allv), self.train_size), replace=False)]
+        trained = self._build(self.dim)
+        trained.train(sample)
+        trained.add(allv)
+        self.idx, self._staging = trained, False
+
+    @property
+    def ntotal(self) -> int:
+        return 0 if self.idx is None else self.idx.ntotal
+
+    def encode(self, items: List[Any]) -> Tuple[List[str], np.ndarray]:
+        """Embed items through the shared cache without indexing them."""
+        texts = [_as_text(i) for i in items]
+        vecs: List[Optional[np.ndarray]] = [_cache.get(t) for t in texts]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            try:
+                fresh = _embed([texts[i] for i in missing])
+            except ValueError:
+                fresh = np.empty((0, 0), dtype="float32")
+            for i, vec in zip(missing, fresh):
+                _cache.put(texts[i], vec)
+                vecs[i] = vec
+        keep = [(t, v) for t, v in zip(texts, vecs) if v is not None]
+        if not keep:
+            return [], np.empty((0, self.dim or 0), dtype="float32")
+        return [t for t, _ in keep], np.vstack([v for _, v in keep]).astype("float32")
+
+    def search_vectors(self, vecs: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched k-NN: (similarities, row ids), -1 where there is no neighbour."""
+        with self._lock:
+            if self.idx is None or self.idx.ntotal == 0 or vecs.shape[0] == 0 \
+                    or vecs.shape[1] != self.dim:
+                return (np.zeros((vecs.shape[0], k), dtype="float32"),
+                        np.full((vecs.shape[0], k), -1, dtype="int64"))
+            return self.idx.search(np.ascontiguousarray(vecs), k)
+
+    def add(self, items: List[Any], owner: Optional[str] = None):
         if not items:
             return
 
         hits, to_embed = [], []
+        batch_keys: Set[bytes] = set()
         for item in items:
-            # coerce to a string key
-            if isinstance(item, str):
-                txt = item
-            else:
-                try:
-                    txt = item.get("body") or item.get("text") or repr(item)
-                except Exception:
-                    txt = repr(item)
+            txt = _as_text(item)
+            key = _text_key(txt)
+            if key in self._keys or key in batch_keys:
+                continue  # already indexed
+            batch_keys.add(key)
             vec = _cache.get(txt)
             if vec is None:
                 to_embed.append(txt)
             else:
                 hits.append((txt, vec))
-                _cache.bump(txt)
 
         fresh: List[Tuple[str, np.ndarray]] = []
         if to_embed:
@@ -99,42 +343,98 @@ class EmbedDB:
         if not all_pairs:
             return
 
-        canon_dim = all_pairs[0][1].shape[0]
-        self._ensure(canon_dim)
+        with self._lock:
+            canon_dim = all_pairs[0][1].shape[0]
+            self._ensure(canon_dim)
 
-        valid_vecs, valid_texts = [], []
-        for txt, vec in all_pairs:
-            if vec.shape[0] == canon_dim:
-                valid_vecs.append(vec)
-                valid_texts.append(txt)
+            valid_vecs, valid_texts = [], []
+            for txt, vec in all_pairs:
+                if vec.shape[0] == canon_dim:
+                    valid_vecs.append(vec)
+                    valid_texts.append(txt)
 
-        if not valid_vecs:
-            return
+            if not valid_vecs:
+                return
 
-        arr = (valid_vecs[0].reshape(1, -1)
-               if len(valid_vecs) == 1
-               else np.vstack(valid_vecs))
-        self.idx.add(arr)
-        self.text.extend(valid_texts)
+            arr = (valid_vecs[0].reshape(1, -1)
+                   if len(valid_vecs) == 1
+                   else np.vstack(valid_vecs))
+            self.idx.add(arr)
+            self.text.extend(valid_texts)
+            self.owner.extend([owner] * len(valid_texts))
+            self._keys.update(_text_key(t) for t in valid_texts)
+            self._maybe_train()
 
     def similar(self, query: str, k: int = 5) -> List[Tuple[float, str]]:
-        if self.idx is None or self.idx.ntotal == 0:
-            return []
+        return self.similar_many([query], k)[0]
 
-        vec = _cache.get(query)
-        if vec is None:
-            try:
-                vec = _embed([query])[0]
-                _cache.put(query, vec)
-            except ValueError:
-                return []
+    def similar_many(self, queries: List[str], k: int = 5) -> List[List[Tuple[float, str]]]:
+        if self.idx is None or self.idx.ntotal == 0 or not queries:
+            return [[] for _ in queries]
+
+        texts, vecs = self.encode(queries)
+        pos = {t: i for i, t in enumerate(texts)}
+        D, I = self.search_vectors(vecs, k)
+        out: List[List[Tuple[float, str]]] = []
+        for q in queries:
+            row = pos.get(_as_text(q))
+            result: List[Tuple[float, str]] = []
+            if row is not None:
+                for dist, idx in zip(D[row], I[row]):
+                    if 0 <= idx < len(self.text):
+                        result.append((float(dist), self.text[idx]))
+            out.append(result)
+        return out
+
+    # ───────────────────────── persistence ─────────────────────────
+
+    def save(self, path: Path):
+        """Write index + metadata to `path/`; metadata rows are appended, so
+        saving the same store after each run costs O(new rows)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self.idx is None:
+                return
+            conf = {"kind": self.kind, "nlist": self.nlist, "pq_m": self.pq_m, "hnsw_m": self.hnsw_m,
+                    "train_size": self.train_size, "nprobe": self.nprobe, "ef_search": self.ef_search,
+                    "dim": self.dim, "staging": self._staging}
+            meta = path / "meta.jsonl"
+            start = self._saved if meta.exists() else 0
+            with open(meta, "r+b" if start else "wb") as fh:
+                # drop rows a crashed save may have left past the last good config
+                fh.truncate(self._saved_b if start else 0)
+                fh.seek(0, os.SEEK_END)
+                for t, o in zip(self.text[start:], self.owner[start:]):
+                    fh.write(json.dumps([t, o], ensure_ascii=False).encode("utf-8") + b"\n")
+                size = fh.tell()
+            faiss.write_index(self.idx, str(path / "index.faiss.tmp"))
+            os.replace(path / "index.faiss.tmp", path / "index.faiss")
+            conf.update(rows=len(self.text), meta_bytes=size)
+            (path / "config.json.tmp").write_text(json.dumps(conf))
+            os.replace(path / "config.json.tmp", path / "config.json")
+            self._saved, self._saved_b = len(self.text), size
 
-        if vec.shape[0] != self.dim:
-            return []
+    @classmethod
+    def load(cls, path: Path, mmap: bool = False) -> "EmbedDB":
+        path = Path(path)
+        conf = json.loads((path / "config.json").read_text())
+        db = cls(**{k: conf[k] for k in ("kind", "nlist", "pq_m", "hnsw_m", "train_size", "nprobe", "ef_search")})
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        db.idx, db.dim, db._staging, db._mmap = faiss.read_index(str(path / "index.faiss"), flags), conf["dim"], conf["staging"], mmap
+        db._tune(db.idx)
+        with open(path / "meta.jsonl", encoding="utf-8") as fh:
+            for line in itertools.islice(fh, conf["rows"]):
+                t, o = json.loads(line)
+                db.text.append(t)
+                db.owner.append(o)
+        db._keys = {_text_key(t) for t in db.text}
+        db._saved, db._saved_b = len(db.text), conf["meta_bytes"]
+        return db
 
-        D, I = self.idx.search(vec.reshape(1, -1), k)
-        result: List[Tuple[float, str]] = []
-        for dist, idx in zip(D[0], I[0]):
-            if 0 <= idx < len(self.text):
-                result.append((float(dist), self.text[idx]))
-        return result
+    @classmethod
+    def open(cls, path: Optional[Path], **kwargs) -> "EmbedDB":
+        if path is not None and (Path(path) / "config.json").exists():
+            return cls.load(path, mmap=kwargs.pop("mmap", False))
+        kwargs.pop("mmap", None)
+        return cls(**kwargs)
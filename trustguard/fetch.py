@@ -0,0 +1,208 @@
+from __future__ import annotations
+import asyncio
+import collections
+import hashlib
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+
+from . import metrics
+from .config import FETCH_CACHE_DIR, FETCH_CACHE_MB
+from .utils import at_exit, background_loop, run_sync
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class DiskCache:
+    """Content-addressed blob store: urls/<sha1(url)> -> sha256, blobs/<sha256>."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root      = Path(root)
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+        (self.root / "urls").mkdir(parents=True, exist_ok=True)
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        self.size = sum(p.stat().st_size for p in self._blobs())
+
+    def _blobs(self):
+        # skip .tmp files another writer is still filling
+        return (p for p in (self.root / "blobs").glob("*/*") if p.suffix != ".tmp" and p.is_file())
+
+    def _url_path(self, url: str) -> Path:
+        return self.root / "urls" / hashlib.sha1(url.encode()).hexdigest()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    def digest(self, url: str) -> Optional[str]:
+        try:
+            return self._url_path(url).read_text().strip() or None
+        except OSError:
+            return None
+
+    def get(self, url: str) -> Optional[bytes]:
+        digest = self.digest(url)
+        if digest is None:
+            return None
+        blob = self._blob_path(digest)
+        try:
+            data = blob.read_bytes()
+            os.utime(blob)  # mtime doubles as LRU clock
+            return data
+        except OSError:
+            self._url_path(url).unlink(missing_ok=True)
+            return None
+
+    def put(self, url: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob_path(digest)
+        with self._lock:
+            if not blob.exists():
+                blob.parent.mkdir(exist_ok=True)
+                tmp = blob.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, blob)
+                self.size += len(data)
+            self._url_path(url).write_text(digest)
+            if self.size > self.max_bytes:
+                self._evict()
+        return digest
+
+    def _evict(self):
+        target = int(self.max_bytes * 0.9)
+        for p in sorted(self._blobs(), key=lambda p: p.stat().st_mtime):
+            if self.size <= target:
+                break
+            self.size -= p.stat().st_size
+            p.unlink(missing_ok=True)
+
+
+class ImageFetcher:
+    def __init__(self, cache_dir: Optional[Path] = FETCH_CACHE_DIR,
+                 max_cache_bytes: int = FETCH_CACHE_MB * 2**20,
+                 limit: int = 64, per_host: int = 8, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 15.0, mem_items: int = 256):
+        self.disk      = DiskCache(cache_dir, max_cache_bytes) if cache_dir else None
+        self.limit     = limit
+        self.per_host  = per_host
+        self.retries   = retries
+        self.backoff   = backoff
+        self.timeout   = timeout
+        self.mem_items = mem_items
+        self._mem      : collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        self._inflight : Dict[str, asyncio.Future] = {}
+        self._session  : Optional[aiohttp.ClientSession] = None
+
+    async def _sess(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.per_host),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _remember(self, url: str, data: bytes):
+        self._mem[url] = data
+        self._mem.move_to_end(url)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        sess = await self._sess()
+        for attempt in range(self.retries + 1):
+            try:
+                async with sess.get(url) as resp:
+                    if resp.status == 200:
+                        data = await resp.read()
+                        metrics.inc("fetch.downloads")
+                        metrics.inc("fetch.bytes_downloaded", len(data))
+                        return data
+                    if resp.status not in _RETRY_STATUS:
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            if attempt < self.retries:
+                metrics.inc("fetch.retries")
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        metrics.inc("fetch.failures")
+        return None
+
+    async def _fetch(self, url: str) -> Optional[bytes]:
+        data = self.disk.get(url) if self.disk else None
+        metrics.inc("fetch.disk_hits" if data is not None else "fetch.disk_misses")
+        if data is None:
+            data = await self._download(url)
+            if data is not None and self.disk:
+                self.disk.put(url, data)
+        if data is not None:
+            self._remember(url, data)
+        return data
+
+    async def fetch(self, url: str) -> Optional[bytes]:
+        if not url:
+            return None
+        if url in self._mem:
+            metrics.inc("fetch.memory_hits")
+            self._mem.move_to_end(url)
+            return self._mem[url]
+        fut = self._inflight.get(url)
+        if fut is None:
+            fut = asyncio.ensure_future(self._fetch(url))
+            self._inflight[url] = fut
+            fut.add_done_callback(lambda _f: self._inflight.pop(url, None))
+        return await asyncio.shield(fut)
+
+    async def fetch_all(self, urls: Iterable[str]) -> List[Optional[bytes]]:
+        return list(await asyncio.gather(*(self.fetch(u) for u in urls)))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ── sync facade (runs on the shared background loop) ──
+    def get(self, url: str) -> Optional[bytes]:
+        return run_sync(self.fetch(url))
+
+    def get_many(self, urls: Iterable[str]) -> List[Optional[bytes]]:
+        return run_sync(self.fetch_all(list(urls)))
+
+    def prefetch(self, urls: Iterable[str]) -> int:
+        return sum(b is not None for b in self.get_many(dict.fromkeys(urls)))
+
+    def content_hash(self, url: str) -> Optional[str]:
+        return self.disk.digest(url) if self.disk else None
+
+
+_default     : Optional[ImageFetcher] = None
+_default_pid : Optional[int]          = None
+
+def default() -> ImageFetcher:
+    global _default, _default_pid
+    if _default is None or _default_pid != os.getpid():
+        background_loop()
+        _default, _default_pid = ImageFetcher(), os.getpid()
+    return _default
+
+@at_exit
+async def _close_default():
+    if _default is not None and _default_pid == os.getpid():
+        await _default.close()
+
+def configure(**kwargs) -> ImageFetcher:
+    global _default, _default_pid
+    _default, _default_pid = ImageFetcher(**kwargs), os.getpid()
+    return _default
+
+def get(url: str) -> Optional[bytes]:
+    return default().get(url)
+
+def get_many(urls: Iterable[str]) -> List[Optional[bytes]]:
+    return default().get_many(urls)
+
+def prefetch(urls: Iterable[str]) -> int:
+    return default().prefetch(urls)
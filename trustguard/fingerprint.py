@@ -0,0 +1,106 @@
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .config import (BLIP2_DTYPE, BRAND_LEXICON, CLIP_VARIANT, KNOWN_BRANDS, LLM_MODEL,
+                     OCR_CROP, OCR_MAX_SIDE, TEXT_MODE)
+from .images import ImageBatch
+from .models import BLIP2_MODEL, FLAN_MODEL
+
+# Per-signal input fingerprints: a short hash of everything a signal's score
+# depends on (listing fields, image bytes, model / prompt / setting versions).
+# A record whose fingerprint for a signal matches this run's can carry that
+# signal's score forward instead of recomputing it (batch_run --since).
+
+VERSION = 1          # bump when a signal's code changes its output for the same inputs
+IMAGES  = 3          # images per listing any signal looks at (orchestrator.PREFETCH_IMAGES)
+SIGNALS = ("text", "visual", "brand", "rules")
+
+# which breakdown / explanation fields each signal owns
+BREAKDOWN = {"text": "text_score", "visual": "visual_score", "brand": "brand_mismatch", "rules": "rule_score"}
+
+# signals the cascade may have estimated instead of computing
+_CASCADE = {"text": {"gemini"}, "visual": {"clip", "blip2"}}
+
+_lexicon_hash: Optional[str] = None
+
+
+def _h(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _lexicon() -> str:
+    global _lexicon_hash
+    if _lexicon_hash is None:
+        try:
+            body = Path(BRAND_LEXICON).read_bytes()
+        except OSError:
+            body = b""
+        _lexicon_hash = _h([hashlib.sha256(body).hexdigest(), sorted(KNOWN_BRANDS)])
+    return _lexicon_hash
+
+
+def _images(listing: Dict[str, Any], images: ImageBatch) -> List[List[Optional[str]]]:
+    urls = listing.get("images", [])[:IMAGES]
+    return [[u, img.digest] for u, img in zip(urls, images.many(urls))]
+
+
+def of(listing: Dict[str, Any], disabled: Iterable[str] = (),
+       images: Optional[ImageBatch] = None) -> Dict[str, Optional[str]]:
+    """Fingerprint per signal; None for a disabled signal (never carried)."""
+    from .review_llm import PROMPT_VERSION
+
+    disabled = set(disabled)
+    imgs = None
+    if not {"visual", "brand"} <= disabled:
+        imgs = _images(listing, images if images is not None else ImageBatch())
+    title = listing.get("title", "")
+    fp = {
+        "text":   _h([VERSION, LLM_MODEL, PROMPT_VERSION, TEXT_MODE, listing.get("reviews", [])]),
+        "visual": _h([VERSION, CLIP_VARIANT, BLIP2_MODEL, BLIP2_DTYPE, title, imgs]),
+        "brand":  _h([VERSION, FLAN_MODEL, OCR_MAX_SIDE, OCR_CROP, _lexicon(), title, imgs]),
+        "rules":  _h([VERSION, listing.get("ratings", []), listing.get("returns", 0)]),
+    }
+    return {s: (None if s in disabled else v) for s, v in fp.items()}
+
+
+def unchanged(previous: Optional[Dict[str, Any]], fp: Dict[str, Optional[str]]) -> Set[str]:
+    """Signals whose score in `previous` (an old report record) can be reused."""
+    if not previous or not isinstance(previous.get("fingerprint"), dict):
+        return set()
+    old  = previous["fingerprint"]
+    bd   = previous.get("breakdown", {})
+    skip = set(previous.get("explanation", {}).get("cascade", {}).get("skipped", []))
+    same = {s for s in SIGNALS if fp.get(s) and old.get(s) == fp[s] and BREAKDOWN[s] in bd
+            and not (_CASCADE.get(s, set()) & skip)}
+    # the stored visual score is forced to 1.0 on a brand mismatch: reusable
+    # exactly when that mismatch is reused too
+    if bd.get("brand_mismatch"):
+        if "brand" in same and fp.get("visual"):
+            same.add("visual")
+        else:
+            same.discard("visual")
+    return same
+
+
+def carry(record: Dict[str, Any], previous: Dict[str, Any], signals: Set[str]):
+    """Copy the given signals' scores (and reasons) from `previous` into `record`."""
+    for s in signals:
+        record["breakdown"][BREAKDOWN[s]] = previous["breakdown"][BREAKDOWN[s]]
+    old_exp = previous.get("explanation", {})
+    if "text" in signals:
+        record["explanation"]["text"] = old_exp.get("text", "")
+        if "review_reuse" in old_exp:
+            record["explanation"]["review_reuse"] = old_exp["review_reuse"]
+    if record["breakdown"]["brand_mismatch"]:
+        record["breakdown"]["visual_score"] = 1.0
+    if signals:
+        record["explanation"]["carried"] = sorted(signals)
+
+
+def load_previous(path: Path) -> Dict[str, Dict[str, Any]]:
+    """asin -> record of an earlier report (JSON array, JSONL, Parquet or Arrow)."""
+    from .report import read_report
+    return {str(r.get("asin", "")): r for r in read_report(Path(path))}
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import hashlib
+import io
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from PIL import Image, UnidentifiedImageError
+
+from . import fetch, metrics
+
+# shortest side each consumer needs; JPEGs are DCT-scaled down to about this
+CLIP_SIZE  = 224
+BLIP2_SIZE = 224
+
+
+class SharedImage:
+    """One fetched image, decoded at most once per resolution and turned into
+    each model's input at most once. Thread-safe."""
+
+    def __init__(self, raw: Optional[bytes]):
+        self.raw      = raw
+        self._digest  : Optional[str] = None
+        self._decoded : Dict[Optional[int], Optional[Image.Image]] = {}  # draft size (None = full) -> RGB
+        self._inputs  : Dict[str, Any] = {}
+        self._lock    = threading.RLock()
+
+    def __bool__(self) -> bool:
+        return bool(self.raw)
+
+    @property
+    def digest(self) -> Optional[str]:
+        if self._digest is None and self.raw:
+            self._digest = hashlib.sha256(self.raw).hexdigest()
+        return self._digest
+
+    def pil(self, size: Optional[int] = None) -> Optional[Image.Image]:
+        """RGB image whose sides are at least `size` (or the original size,
+        if smaller). Callers must not modify it in place."""
+        if not self.raw:
+            return None
+        with self._lock:
+            for s, img in self._decoded.items():
+                if s is None or (size is not None and s >= size):
+                    return img
+            try:
+                im = Image.open(io.BytesIO(self.raw))
+                full = im.size
+                if size is not None:
+                    im.draft("RGB", (size, size))  # JPEG only; no-op for other formats
+                img = im.convert("RGB")
+            except (UnidentifiedImageError, OSError):
+                img = None
+            key = size if img is not None and img.size != full else None
+            self._decoded[key] = img
+            return img
+
+    def input(self, name: str, fn: Callable[[Image.Image], Any], size: Optional[int] = None) -> Any:
+        """fn(pil(size)) computed once per consumer name; None if undecodable."""
+        with self._lock:
+            if name not in self._inputs:
+                img = self.pil(size)
+                self._inputs[name] = fn(img) if img is not None else None
+            return self._inputs[name]
+
+
+def shared(img: Union[SharedImage, bytes, None]) -> SharedImage:
+    return img if isinstance(img, SharedImage) else SharedImage(img)
+
+
+class ImageBatch:
+    """SharedImages for a set of URLs, fetched together; pass one to every
+    signal of a listing window so each image is fetched and decoded once."""
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._images: Dict[str, SharedImage] = {}
+        self.add(urls)
+
+    def add(self, urls: Iterable[str]) -> "ImageBatch":
+        todo = [u for u in dict.fromkeys(urls) if u not in self._images]
+        if not todo:
+            return self
+        with metrics.timer("fetch"):
+            raws = fetch.get_many(todo)
+        for url, raw in zip(todo, raws):
+            self._images[url] = SharedImage(raw)
+        return self
+
+    def __getitem__(self, url: str) -> SharedImage:
+        if url not in self._images:
+            self.add([url])
+        return self._images[url]
+
+    def many(self, urls: Iterable[str]) -> List[SharedImage]:
+        urls = list(urls)
+        self.add(urls)
+        return [self._images[u] for u in urls]
+
+    def __len__(self) -> int:
+        return len(self._images)
@@ -1,12 +1,14 @@
 from __future__ import annotations
 import json, re, unicodedata
 from pathlib import Path
-from typing import Any, Dict, Generator, List, Set
+from typing import Any, Dict, Generator, Iterator, List, Optional
 
+import numpy as np
 import pandas as pd
 
 _BIDI   = r"\u200e\u200f\u202a-\u202e"          # zero-width bidi chars
 _IMG_KEYS = ("image", "img_url", "image_urls", "images")
+_INT_RE = r"\s*[+-]?\d+\s*"
 
 def _clean(h: str) -> str:
     h = unicodedata.normalize("NFKC", h)
@@ -25,61 +27,157 @@ def _json_reviews(text: str) -> List[str]:
         return []
 
 
-def load_listings(csv_path: Path) -> Generator[Dict[str, Any], None, None]:
-    df = pd.read_csv(csv_path, dtype=str).fillna("")
-    df.columns = [_clean(c) for c in df.columns]
+# ───────────────────────── readers ─────────────────────────
+# Every reader yields string-typed frames with "" for missing cells, i.e. what
+# pd.read_csv(dtype=str).fillna("") gives, so one code path serves all formats.
 
-    asin_col  = next(c for c in df.columns if re.fullmatch(r"asin_*", c))
-    type_col  = "type" if "type" in df.columns else None
-    url_col   = next((c for c in df.columns if c.startswith("http") or "product_url" in c), None)
-    rating_col= "rating" if "rating" in df.columns else None
-    returns_col = next((c for c in df.columns if c in ("returns", "return_count")), None)
+def _to_str(df: pd.DataFrame) -> pd.DataFrame:
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+            s = s.astype("Int64")  # 3.0 → "3", like the CSV export
+        elif s.dtype == object:
+            s = s.map(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v)
+        out[col] = s.astype(object).where(s.notna(), "").astype(str)
+    return pd.DataFrame(out, index=df.index)
 
-    for asin, grp in df.groupby(asin_col, sort=False):
-        product_row = grp
-        if type_col and "product" in grp[type_col].str.lower().values:
-            product_row = grp[grp[type_col].str.lower() == "product"].iloc[0]
+def _frames(path: Path, chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+    suffix = "".join(Path(path).suffixes[-2:]).lower()
+    if suffix.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        if chunksize is None:
+            yield _to_str(pf.read().to_pandas())
         else:
-            product_row = grp.iloc[0]
+            for batch in pf.iter_batches(batch_size=chunksize):
+                yield _to_str(batch.to_pandas())
+    elif ".jsonl" in suffix or ".ndjson" in suffix:
+        if chunksize is None:
+            yield _to_str(pd.read_json(path, lines=True, dtype=False))
+        else:
+            with pd.read_json(path, lines=True, dtype=False, chunksize=chunksize) as reader:
+                for df in reader:
+                    yield _to_str(df)
+    elif chunksize is None:
+        yield pd.read_csv(path, dtype=str).fillna("")
+    else:
+        with pd.read_csv(path, dtype=str, chunksize=chunksize) as reader:
+            for df in reader:
+                yield df.fillna("")
+
+
+class _Schema:
+    def __init__(self, columns: List[str]):
+        self.asin_col   = next(c for c in columns if re.fullmatch(r"asin_*", c))
+        self.type_col   = "type" if "type" in columns else None
+        self.url_col    = next((c for c in columns if c.startswith("http") or "product_url" in c), None)
+        self.rating_col = "rating" if "rating" in columns else None
+        self.returns_col= next((c for c in columns if c in ("returns", "return_count")), None)
+        self.img_cols   = [c for c in _IMG_KEYS if c in columns]
+        self.columns    = columns
+
+
+def _chunk_listings(df: pd.DataFrame, sc: _Schema) -> Generator[Dict[str, Any], None, None]:
+    n = len(df)
+    # per-chunk vectorised masks and parsing; groups below only index into them
+    if sc.type_col:
+        kind       = df[sc.type_col].str.lower().to_numpy()
+        is_product = kind == "product"
+        is_image   = kind == "image"
+    else:
+        is_product = np.zeros(n, dtype=bool)
+        is_image   = np.ones(n, dtype=bool)
+
+    ratings = None
+    if sc.rating_col:
+        ratings = pd.to_numeric(df[sc.rating_col].str.strip(), errors="coerce").to_numpy(dtype="float64")
+
+    returns = None
+    if sc.returns_col:
+        col = df[sc.returns_col]
+        ok  = col.str.fullmatch(_INT_RE).fillna(False).to_numpy()
+        returns = np.zeros(n, dtype="int64")
+        returns[ok] = col[ok].str.strip().astype("int64").to_numpy()
+
+    img_vals = [df[c].to_numpy() for c in sc.img_cols]
+    records  = df.to_numpy()
+    pos      = {c: i for i, c in enumerate(df.columns)}
+
+    for asin, rows in df.groupby(sc.asin_col, sort=False).indices.items():
+        prod = rows[is_product[rows]]
+        prow = records[prod[0] if len(prod) else rows[0]]
+        get  = lambda c: prow[pos[c]] if c in pos else ""
 
-        images: Set[str] = set()
-        for col in _IMG_KEYS:
-            if col in df.columns:
-                if type_col:
-                    images.update(grp.loc[grp[type_col].str.lower() == "image", col])
-                else:
-                    images.update(grp[col])
-        images = {u for u in images if u.startswith("http")}
+        images: Dict[str, None] = {}
+        img_rows = rows[is_image[rows]]
+        for vals in img_vals:
+            for u in vals[img_rows]:
+                if u.startswith("http"):
+                    images[u] = None
 
         reviews: List[str] = []
-        if "reviews_json" in df.columns and product_row["reviews_json"]:
-            reviews = _json_reviews(product_row["reviews_json"])
-        if not reviews and "review_texts" in df.columns and product_row["review_texts"]:
-            for part in _split(product_row["review_texts"]):
+        if "reviews_json" in pos and get("reviews_json"):
+            reviews = _json_reviews(get("reviews_json"))
+        if not reviews and "review_texts" in pos and get("review_texts"):
+            for part in _split(get("review_texts")):
                 reviews.append(part)
 
-        ratings: List[float] = []
-        if rating_col:
-            for r in grp[rating_col]:
-                try:
-                    ratings.append(float(r))
-                except ValueError:
-                    pass
-
-        returns = 0
-        if returns_col and product_row[returns_col]:
-            try:
-                returns = int(product_row[returns_col])
-            except ValueError:
-                returns = 0
+        r = ratings[rows] if ratings is not None else np.empty(0)
+        r = r[~np.isnan(r)]
+
+        ret = int(returns[prod[0] if len(prod) else rows[0]]) if returns is not None else 0
 
         yield {
             "id":          asin,
-            "url":         product_row.get(url_col) or f"https://www.amazon.in/dp/{asin}",
-            "title":       product_row.get("title", ""),
-            "description": product_row.get("description", ""),
+            "url":         (get(sc.url_col) if sc.url_col else "") or f"https://www.amazon.in/dp/{asin}",
+            "title":       get("title"),
+            "description": get("description"),
             "images":      list(images),
             "reviews":     reviews,      # list[str]
-            "ratings":     ratings,      # list[float]
-            "returns":     returns,      # int
+            "ratings":     r.tolist(),   # list[float]
+            "returns":     ret,          # int
         }
+
+
+def load_listings(path: Path, chunksize: Optional[int] = None) -> Generator[Dict[str, Any], None, None]:
+    """Yield one listing dict per ASIN from a CSV, Parquet or JSONL export.
+
+    chunksize=None reads the file at once and groups ASINs wherever they occur.
+    With a chunksize rows are streamed in bounded memory; an ASIN's rows must
+    be contiguous (exports are, or sort by ASIN first) – the trailing group of
+    each chunk is carried into the next one.
+    """
+    schema: Optional[_Schema] = None
+    carry:  Optional[pd.DataFrame] = None
+
+    for df in _frames(path, chunksize):
+        df.columns = [_clean(c) for c in df.columns]
+        if schema is None:
+            schema = _Schema(list(df.columns))
+        if chunksize is None:
+            yield from _chunk_listings(df, schema)
+            return
+
+        if carry is not None:
+            df = pd.concat([carry, df], ignore_index=True)
+        if df.empty:
+            continue
+        last  = df[schema.asin_col].iat[-1]
+        tail  = (df[schema.asin_col] == last).to_numpy()
+        carry = df[tail]
+        yield from _chunk_listings(df[~tail].reset_index(drop=True), schema)
+
+    if carry is not None and not carry.empty:
+        yield from _chunk_listings(carry.reset_index(drop=True), schema)
+
+
+def to_columns(listings: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Flatten listings' ratings into CSR arrays for the columnar rules engine."""
+    lengths = np.fromiter((len(l.get("ratings", [])) for l in listings), dtype=np.int64, count=len(listings))
+    offsets = np.zeros(len(listings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    ratings = np.fromiter((r for l in listings for r in l.get("ratings", [])), dtype=np.float64,
+                          count=int(offsets[-1]))
+    returns = np.fromiter((l.get("returns", 0) for l in listings), dtype=np.int64, count=len(listings))
+    return {"ratings": ratings, "offsets": offsets, "returns": returns}
@@ -0,0 +1,172 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from . import metrics
+from .config import GOOGLE_API_KEY, LLM_MODEL, GEMINI_BASE_URL, LLM_RPM, LLM_TPM, LLM_CONCURRENCY
+
+
+def estimate_tokens(text: str) -> int:
+    # rough ~4 chars/token estimate, only used for TPM budgeting
+    return max(1, len(text) // 4)
+
+
+def parse_json(raw: str) -> Dict[str, Any]:
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = re.sub(r"^```(?:json)?|```$", "", raw, flags=re.M).strip()
+    try:
+        obj = json.loads(raw)
+    except json.JSONDecodeError:
+        block = re.search(r"\{.*\}", raw, re.S)
+        try:
+            obj = json.loads(block.group(0)) if block else {}
+        except json.JSONDecodeError:
+            obj = {}
+    return obj if isinstance(obj, dict) else {}
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, bursting up to `capacity`."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate     = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens   = self.capacity
+        self.stamp    = time.monotonic()
+        self._lock    : Optional[asyncio.Lock] = None
+        self._pid     : Optional[int] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp  = now
+
+    async def acquire(self, n: float = 1.0) -> float:
+        if self._lock is None or self._pid != os.getpid():
+            self._lock, self._pid = asyncio.Lock(), os.getpid()
+        n = min(n, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                delay = (n - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class SharedTokenBucket:
+    """TokenBucket whose state lives in shared memory, so processes forked
+    after it is created draw from one budget."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        import multiprocessing as mp
+        self.rate     = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._state   = mp.RawArray("d", [self.capacity, time.monotonic()])  # tokens, stamp
+        self._lock    = mp.Lock()
+
+    async def acquire(self, n: float = 1.0) -> float:
+        n = min(n, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:  # held for a few arithmetic ops only
+                now = time.monotonic()
+                tokens = min(self.capacity, self._state[0] + (now - self._state[1]) * self.rate)
+                self._state[1] = now
+                if tokens >= n:
+                    self._state[0] = tokens - n
+                    return waited
+                self._state[0] = tokens
+                delay = (n - tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, shared: bool = False):
+        bucket        = SharedTokenBucket if shared else TokenBucket
+        self.requests = bucket(rpm)
+        self.tokens   = bucket(tpm) if tpm else None
+        self.waited   = 0.0
+
+    async def acquire(self, tokens: int) -> float:
+        w = await self.requests.acquire(1)
+        if self.tokens is not None:
+            w += await self.tokens.acquire(tokens)
+        self.waited += w
+        metrics.inc("llm.rate_limit_wait_seconds", w)
+        return w
+
+
+class GeminiClient:
+    """Minimal asyncio client for the Gemini generateContent REST endpoint."""
+
+    def __init__(self, model: str = LLM_MODEL, api_key: Optional[str] = GOOGLE_API_KEY,
+                 base_url: str = GEMINI_BASE_URL, limiter: Optional[RateLimiter] = None,
+                 concurrency: int = LLM_CONCURRENCY, retries: int = 3, timeout: float = 60.0):
+        self.model       = model
+        self.api_key     = api_key
+        self.base_url    = base_url.rstrip("/")
+        self.limiter     = limiter or RateLimiter()
+        self.concurrency = concurrency
+        self.retries     = retries
+        self.timeout     = timeout
+        self._pid        : Optional[int] = None
+
+    def _ensure(self):
+        # asyncio primitives and sessions must not cross a fork
+        if self._pid != os.getpid():
+            self._pid     = os.getpid()
+            self._sem     = asyncio.Semaphore(self.concurrency)
+            self._session : Optional[aiohttp.ClientSession] = None
+
+    async def _sess(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def generate(self, prompt: str, max_output_tokens: int = 64) -> str:
+        self._ensure()
+        url  = f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.0, "maxOutputTokens": max_output_tokens},
+        }
+        cost = estimate_tokens(prompt) + max_output_tokens
+        async with self._sem:
+            sess = await self._sess()
+            for attempt in range(self.retries + 1):
+                await self.limiter.acquire(cost)
+                metrics.inc("llm.requests")
+                try:
+                    async with sess.post(url, params={"key": self.api_key or ""}, json=body) as resp:
+                        if resp.status == 200:
+                            data = await resp.json(content_type=None)
+                            parts = data["candidates"][0]["content"]["parts"]
+                            return "".join(p.get("text", "") for p in parts)
+                        if resp.status not in (429, 500, 502, 503, 504):
+                            raise RuntimeError(f"Gemini HTTP {resp.status}: {(await resp.text())[:200]}")
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, IndexError,
+                        ValueError, TypeError):  # incl. a 200 whose body is not the expected JSON
+                    pass
+                if attempt < self.retries:
+                    await asyncio.sleep(2 ** attempt * (1 + random.random()))
+        raise RuntimeError("Gemini request failed after retries")
+
+    async def generate_json(self, prompt: str, max_output_tokens: int = 64) -> Dict[str, Any]:
+        return parse_json(await self.generate(prompt, max_output_tokens))
+
+    async def close(self):
+        if self._pid == os.getpid() and self._session is not None:
+            await self._session.close()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_lock     = threading.Lock()
+_timers   : Dict[str, list] = {}    # stage -> [calls, wall seconds, cpu seconds]
+_counters : Dict[str, float] = {}
+_sources  : Dict[str, Callable[[], Dict[str, Any]]] = {}
+_merged   : Dict[str, Dict[str, float]] = {}  # cache stats reported by other processes
+
+# per-listing stage wall times, collected while a listing (or window) is scored
+_listing: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("tg_listing", default=None)
+
+_profile_stage : Optional[str] = None
+_profiler      : Optional[cProfile.Profile] = None
+_profile_owner : Optional[int] = None
+
+
+@contextlib.contextmanager
+def timer(stage: str) -> Iterator[None]:
+    """Wall and (thread) CPU time of a stage; nested stages are counted in both."""
+    prof = _profile_stage == stage and _start_profile()
+    w0, c0 = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - w0, time.thread_time() - c0
+        if prof:
+            _stop_profile()
+        with _lock:
+            t = _timers.setdefault(stage, [0, 0.0, 0.0])
+            t[0] += 1
+            t[1] += wall
+            t[2] += cpu
+        acc = _listing.get()
+        if acc is not None:
+            acc[stage] = acc.get(stage, 0.0) + wall
+
+
+def timed(stage: str):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def inc(name: str, n: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def source(name: str, fn: Callable[[], Dict[str, Any]]):
+    """Register a stats() callable (caches etc.) that is read at summary time."""
+    _sources[name] = fn
+
+
+@contextlib.contextmanager
+def listing() -> Iterator[Dict[str, float]]:
+    """Collect the stage timings of whatever runs inside into a fresh dict."""
+    acc: Dict[str, float] = {}
+    token = _listing.set(acc)
+    try:
+        yield acc
+    finally:
+        _listing.reset(token)
+
+
+def as_ms(acc: Dict[str, float], share: int = 1) -> Dict[str, float]:
+    return {k: round(v * 1000 / share, 2) for k, v in acc.items()}
+
+
+# ───────────────────────── profiling ─────────────────────────
+
+def profile(stage: Optional[str]):
+    """cProfile every call of `stage` (one thread at a time) until dump_profile()."""
+    global _profile_stage, _profiler
+    _profile_stage = stage
+    _profiler = cProfile.Profile() if stage else None
+
+
+def _start_profile() -> bool:
+    global _profile_owner
+    with _lock:
+        if _profiler is None or _profile_owner is not None:
+            return False
+        _profile_owner = threading.get_ident()
+    _profiler.enable()
+    return True
+
+
+def _stop_profile():
+    global _profile_owner
+    _profiler.disable()
+    with _lock:
+        _profile_owner = None
+
+
+def dump_profile(path: Path, top: int = 25) -> Optional[str]:
+    if _profiler is None:
+        return None
+    _profiler.dump_stats(str(path))
+    out = io.StringIO()
+    try:
+        pstats.Stats(_profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    except TypeError:  # stage never ran
+        return None
+    return out.getvalue()
+
+
+# ───────────────────────── export ─────────────────────────
+
+def summary() -> Dict[str, Any]:
+    with _lock:
+        stages = {
+            k: {"calls": c, "wall_seconds": round(w, 3), "cpu_seconds": round(u, 3)}
+            for k, (c, w, u) in sorted(_timers.items())
+        }
+        counters = dict(sorted(_counters.items()))
+    caches = {}
+    for name, fn in sorted(_sources.items()):
+        try:
+            caches[name] = fn()
+        except Exception as exc:
+            caches[name] = {"error": str(exc)}
+    for name, st in _merged.items():
+        mine = caches.setdefault(name, {})
+        for k, v in st.items():
+            if isinstance(mine.get(k, 0), (int, float)):
+                mine[k] = mine.get(k, 0) + v
+    return {"stages": stages, "counters": counters, "caches": caches}
+
+
+def merge(other: Dict[str, Any]):
+    """Add another process's summary() (e.g. a shard worker) into this one."""
+    with _lock:
+        for k, st in other.get("stages", {}).items():
+            t = _timers.setdefault(k, [0, 0.0, 0.0])
+            t[0] += st["calls"]
+            t[1] += st["wall_seconds"]
+            t[2] += st["cpu_seconds"]
+        for k, v in other.get("counters", {}).items():
+            _counters[k] = _counters.get(k, 0) + v
+        for name, st in other.get("caches", {}).items():
+            mine = _merged.setdefault(name, {})
+            for k, v in st.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool) and not k.endswith("rate"):
+                    mine[k] = mine.get(k, 0) + v
+
+
+def write_json(path: Path, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    data = {**summary(), **(extra or {})}
+    Path(path).write_text(json.dumps(data, indent=2))
+    return data
+
+
+def _metric(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def prometheus() -> str:
+    # one metric family at a time: the text format wants all of a family's
+    # samples together, right after its # TYPE line
+    s = summary()
+    lines: List[str] = []
+    for family, key in (("stage_calls_total", "calls"), ("stage_wall_seconds_total", "wall_seconds"),
+                        ("stage_cpu_seconds_total", "cpu_seconds")):
+        lines.append(f"# TYPE trustguard_{family} counter")
+        lines += [f'trustguard_{family}{{stage="{stage}"}} {t[key]}' for stage, t in s["stages"].items()]
+    for name, v in s["counters"].items():
+        lines += [f"# TYPE trustguard_{_metric(name)}_total counter", f"trustguard_{_metric(name)}_total {v}"]
+    caches: Dict[str, List[str]] = {}
+    for cache, st in s["caches"].items():
+        for k, v in st.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                caches.setdefault(_metric(k), []).append(f'trustguard_cache_{_metric(k)}{{cache="{cache}"}} {v}')
+    for k, samples in caches.items():
+        lines += [f"# TYPE trustguard_cache_{k} gauge"] + samples
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Path):
+    """node_exporter textfile-collector format; written atomically."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(prometheus())
+    tmp.replace(path)
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _merged.clear()
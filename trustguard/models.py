@@ -0,0 +1,157 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .config import BLIP2_DTYPE, BLIP2_THREADS, BRAND_LEXICON, CLIP_VARIANT, EMBED_MODEL, KNOWN_BRANDS
+
+BLIP2_MODEL = "Salesforce/blip2-opt-2.7b"
+FLAN_MODEL  = "google/flan-t5-large"
+
+# which models each signal needs; a disabled signal never touches its models
+SIGNAL_MODELS: Dict[str, tuple] = {
+    "text":   ("gemini",),
+    "visual": ("clip", "blip2"),
+    "brand":  ("brand_lexicon", "paddle_ocr", "flan_t5"),
+    "embed":  ("sbert",),
+}
+
+_loaders : Dict[str, Callable[[], Any]] = {}
+_loaded  : Dict[str, Any]               = {}
+_stats   : Dict[str, Dict[str, float]]  = {}
+_lock    = threading.RLock()
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def register(name: str):
+    def deco(fn: Callable[[], Any]) -> Callable[[], Any]:
+        _loaders[name] = fn
+        return fn
+    return deco
+
+
+def get(name: str) -> Any:
+    obj = _loaded.get(name)
+    if obj is not None:
+        return obj
+    with _lock:
+        if name in _loaded:
+            return _loaded[name]
+        if name not in _loaders:
+            raise KeyError(f"Unknown model: {name}")
+        rss0, t0 = _rss_bytes(), time.perf_counter()
+        obj = _loaders[name]()
+        _stats[name] = {
+            "load_seconds": time.perf_counter() - t0,
+            "rss_delta_mb": (_rss_bytes() - rss0) / 2**20,
+        }
+        _loaded[name] = obj
+        return obj
+
+
+def is_loaded(name: str) -> bool:
+    return name in _loaded
+
+
+def warmup(names: Optional[Iterable[str]] = None,
+           disabled: Iterable[str] = ()) -> Dict[str, Dict[str, float]]:
+    skip = {m for s in disabled for m in SIGNAL_MODELS.get(s, ())}
+    for name in (names if names is not None else list(_loaders)):
+        if name not in skip:
+            get(name)
+    return stats()
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return {k: dict(v) for k, v in _stats.items()}
+
+
+def unload(name: str):
+    with _lock:
+        _loaded.pop(name, None)
+        _stats.pop(name, None)
+
+
+def loaded_names() -> List[str]:
+    return list(_loaded)
+
+
+# ───────────────────────────── loaders ─────────────────────────────
+
+@register("clip")
+def _load_clip():
+    import clip
+    dev = device()
+    model, preprocess = clip.load(CLIP_VARIANT, device=dev)
+    if dev == "cuda":
+        model = model.half()
+    return model, preprocess
+
+
+@register("blip2")
+def _load_blip2():
+    import torch
+    from transformers import Blip2Processor, Blip2ForConditionalGeneration
+    if BLIP2_THREADS > 0:
+        torch.set_num_threads(BLIP2_THREADS)
+    dev   = device()
+    dtype = torch.float16 if dev == "cuda" else {"bf16": torch.bfloat16}.get(BLIP2_DTYPE, torch.float32)
+    processor = Blip2Processor.from_pretrained(BLIP2_MODEL, use_fast=True)
+    processor.tokenizer.padding_side = "left"  # OPT is decoder-only; batched generate needs left padding
+    model = Blip2ForConditionalGeneration.from_pretrained(BLIP2_MODEL, torch_dtype=dtype).to(dev).eval()
+    if dev == "cpu" and BLIP2_DTYPE == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return processor, model
+
+
+@register("paddle_ocr")
+def _load_paddle():
+    from paddleocr import PaddleOCR
+    return PaddleOCR(lang="en")
+
+
+@register("brand_lexicon")
+def _load_brand_lexicon():
+    from .brand_lexicon import load
+    return load(BRAND_LEXICON, extra=KNOWN_BRANDS)
+
+
+@register("flan_t5")
+def _load_flan():
+    from transformers import pipeline
+    return pipeline(
+        "text2text-generation",
+        model=FLAN_MODEL,
+        tokenizer=FLAN_MODEL,
+        device=-1,
+    )
+
+
+@register("sbert")
+def _load_sbert():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL)
+
+
+@register("gemini")
+def _load_gemini():
+    from .llm_client import GeminiClient
+    from .utils import at_exit
+    client = GeminiClient()
+    at_exit(client.close)
+    return client
@@ -1,34 +1,147 @@
-from typing import Any, Dict
-from .review_llm    import review_fraud_score
-from .visual_clip   import weighted_visual_risk
-from .brand_match   import brand_mismatch
-from .rules         import anomaly_score
-from .scoring       import aggregate
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .config        import DISABLED_SIGNALS, LLM_PACK, TEXT_MODE, EMBED_INDEX, EMBED_INDEX_PQ
+from .review_llm    import review_fraud_score, review_fraud_scores, trivial_verdict
+from .visual_clip   import (weighted_visual_risk, clip_risk_batch, worst_clip_score,
+                            blip_risk, blip_risk_batch, combine_visual, visual_risk_bounds)
+from .brand_match   import brand_mismatch, brand_mismatch_many
+from .rules         import anomaly_score, anomaly_scores
+from .scoring       import aggregate, aggregate_many, verdict_settled
+from .ingest        import to_columns
 from .embed_store   import EmbedDB
+from .review_dupes  import reuse_ratios, local_text_score, is_decisive
+from .images        import ImageBatch
+from . import fetch, fingerprint, metrics
 
-vecdb = EmbedDB()
+vecdb = EmbedDB(kind=EMBED_INDEX, pq_m=EMBED_INDEX_PQ)
 
-def analyse_listing(listing: Dict[str, Any]) -> Dict[str, Any]:
-    text_score, text_reason = review_fraud_score(listing["reviews"])
-    vecdb.add(listing["reviews"])
+# neutral values reported for signals that are switched off
+DISABLED_TEXT   = (0.5, "signal disabled")
+DISABLED_VISUAL = 0.5
 
-    visual_score = weighted_visual_risk(listing["title"], listing["images"])
+# most images any signal looks at (CLIP top_n)
+PREFETCH_IMAGES = 3
 
-    brand_mismatch_flag = any(
-        brand_mismatch(url, listing["title"])
+# The stages below are what analyse_listing runs in order; the pipelined
+# batch mode (trustguard.pipeline) runs them on separate worker pools.
+
+def stage_fetch(listing: Dict[str, Any], disabled: Iterable[str] = DISABLED_SIGNALS) -> None:
+    if not {"visual", "brand"} <= set(disabled):
+        with metrics.timer("fetch"):
+            fetch.prefetch(listing["images"][:PREFETCH_IMAGES])
+
+
+def _brand_flag(listing: Dict[str, Any], images: Optional[ImageBatch] = None) -> bool:
+    return any(
+        brand_mismatch(url, listing["title"], images=images)
         for url in listing["images"][:2]
     )
+
+
+def _brand_flags(listings: List[Dict[str, Any]], disabled: Set[str],
+                 images: Optional[ImageBatch] = None) -> List[bool]:
+    if "brand" in disabled or not listings:
+        return [False] * len(listings)
+    return brand_mismatch_many([(l["title"], l["images"]) for l in listings], images=images)
+
+
+def _window_images(listings: List[Dict[str, Any]], disabled: Set[str]) -> ImageBatch:
+    """Fetch a window's images once; CLIP, BLIP-2 and OCR share the decodes."""
+    if {"visual", "brand"} <= disabled:
+        return ImageBatch()
+    return ImageBatch(u for l in listings for u in l["images"][:PREFETCH_IMAGES])
+
+
+def stage_vision(listing: Dict[str, Any], disabled: Iterable[str] = DISABLED_SIGNALS,
+                 clip_risk: Optional[float] = None,
+                 blip_risk: Optional[float] = None,
+                 brand_flag: Optional[bool] = None) -> Dict[str, Any]:
+    disabled = set(disabled)
+    images   = ImageBatch()
+    if "visual" in disabled:
+        visual_score = DISABLED_VISUAL
+    else:
+        visual_score = weighted_visual_risk(listing["title"], listing["images"],
+                                            clip_r=clip_risk, blip_r=blip_risk, images=images)
+
+    brand_mismatch_flag = brand_flag if brand_flag is not None else (
+        "brand" not in disabled and _brand_flag(listing, images))
     if brand_mismatch_flag:
         visual_score = 1.0
+    return {"visual_score": visual_score, "brand_mismatch": brand_mismatch_flag}
 
-    rule_score = anomaly_score(listing.get("ratings", []), listing.get("returns", 0))
 
-    trust_score, verdict = aggregate(
-        text_score,
-        visual_score,
-        rule_score,
-        brand_mismatch_flag,
-    )
+def stage_rules(listing: Dict[str, Any]) -> Dict[str, Any]:
+    with metrics.timer("rules"):
+        return {"rule_score": anomaly_score(listing.get("ratings", []), listing.get("returns", 0))}
+
+
+def _local_text(listing: Dict[str, Any], mode: str) -> Tuple[Optional[Dict[str, float]],
+                                                             Optional[Tuple[float, str]]]:
+    """Embedding-based review reuse; returns (ratios, verdict-if-it-settles-the-signal)."""
+    if mode == "llm":
+        return None, None
+    with metrics.timer("review_reuse"):
+        ratios = reuse_ratios(vecdb, listing["reviews"], listing.get("id"))
+    if ratios["n"] >= 3 and (mode == "local" or is_decisive(ratios)):
+        return ratios, local_text_score(ratios)
+    if mode == "local":
+        return ratios, review_fraud_score(listing["reviews"])  # < 3 reviews: no Gemini call
+    return ratios, None
+
+
+def _index(listing: Dict[str, Any], disabled: Iterable[str]) -> None:
+    if "embed" not in set(disabled):
+        with metrics.timer("faiss_insert"):
+            vecdb.add(listing["reviews"], owner=listing.get("id"))
+
+
+def stage_reuse(listing: Dict[str, Any], disabled: Iterable[str] = DISABLED_SIGNALS,
+                mode: str = TEXT_MODE) -> Tuple[Any, Any]:
+    """_local_text, then index the listing's reviews. Run it in listing order:
+    each listing then sees exactly the earlier ones, as in back-to-back
+    analyse_listing calls, whatever the window size or pipelining."""
+    local = _local_text(listing, mode) if "text" not in set(disabled) else (None, None)
+    _index(listing, disabled)
+    return local
+
+
+def _local_texts(listings: List[Dict[str, Any]], disabled: Set[str]) -> List[Tuple[Any, Any]]:
+    return [stage_reuse(l, disabled) for l in listings]
+
+
+def stage_text(listing: Dict[str, Any], disabled: Iterable[str] = DISABLED_SIGNALS,
+               text: Optional[Tuple[float, str]] = None, mode: str = TEXT_MODE,
+               local: Optional[Tuple[Any, Any]] = None) -> Dict[str, Any]:
+    """`local` is a precomputed _local_text result (see _local_texts)."""
+    ratios = None
+    if "text" in set(disabled):
+        text_score, text_reason = DISABLED_TEXT
+    elif text is not None:
+        text_score, text_reason = text
+    else:
+        ratios, verdict = local if local is not None else _local_text(listing, mode)
+        if verdict is None:
+            verdict = review_fraud_score(listing["reviews"])
+        text_score, text_reason = verdict
+    return {"text_score": text_score, "text_reason": text_reason, "review_reuse": ratios}
+
+
+def finalize(listing: Dict[str, Any], signals: Dict[str, Any],
+             disabled: Iterable[str] = DISABLED_SIGNALS,
+             scored: Optional[Tuple[int, bool]] = None,
+             images: Optional[ImageBatch] = None, index: bool = True) -> Dict[str, Any]:
+    if index:  # False when the caller already indexed it in order (_local_texts)
+        _index(listing, disabled)
+
+    if scored is not None:  # already aggregated column-wise by analyse_batch
+        trust_score, verdict = scored
+    else:
+        trust_score, verdict = aggregate(
+            signals["text_score"],
+            signals["visual_score"],
+            signals["rule_score"],
+            signals["brand_mismatch"],
+        )
 
     return {
         "asin":         listing.get("id", ""),
@@ -37,12 +150,232 @@ def analyse_listing(listing: Dict[str, Any]) -> Dict[str, Any]:
         "trust_score":  trust_score,
         "verdict":      verdict,
         "breakdown": {
-            "text_score":     text_score,
-            "visual_score":   visual_score,
-            "brand_mismatch": brand_mismatch_flag,
-            "rule_score":     rule_score,
+            "text_score":     signals["text_score"],
+            "visual_score":   signals["visual_score"],
+            "brand_mismatch": signals["brand_mismatch"],
+            "rule_score":     signals["rule_score"],
         },
         "explanation": {
-            "text": text_reason,
+            "text": signals["text_reason"],
+            **({"review_reuse": signals["review_reuse"]} if signals.get("review_reuse") else {}),
+            **({"cascade": {"skipped": signals["cascade"]}} if "cascade" in signals else {}),
         },
+        "fingerprint": fingerprint.of(listing, disabled, images),
     }
+
+
+# ───────────────────────── cascade ─────────────────────────
+# Cheap signals first (rules, brand OCR, CLIP); BLIP-2 and Gemini only run while
+# they could still flip the verdict. A skipped signal is reported at the
+# midpoint of the range it could have taken, and listed in explanation.cascade.
+
+SKIPPED_TEXT = "skipped: verdict already decided"
+
+def _cascade_cheap(listing: Dict[str, Any], disabled: Iterable[str],
+                   clip_risk: Optional[float] = None,
+                   text: Optional[Tuple[float, str]] = None,
+                   rule_score: Optional[float] = None,
+                   brand: Optional[bool] = None,
+                   images: Optional[ImageBatch] = None,
+                   local: Optional[Tuple[Any, Any]] = None) -> Dict[str, Any]:
+    """Everything up to (and including) BLIP-2; leaves text for the caller
+    when Gemini is still needed (signals["needs_llm"])."""
+    disabled = set(disabled)
+    images   = images if images is not None else ImageBatch()
+    s: Dict[str, Any] = {"rule_score": rule_score} if rule_score is not None else stage_rules(listing)
+    skipped: List[str] = []
+
+    if brand is None:
+        brand = "brand" not in disabled and _brand_flag(listing, images)
+    s["brand_mismatch"] = brand
+
+    if "text" in disabled:
+        text = DISABLED_TEXT
+    elif text is None:
+        s["review_reuse"], text = local if local is not None else _local_text(listing, TEXT_MODE)
+        text = text or trivial_verdict(listing["reviews"])
+    t_range = (text[0], text[0]) if text else (0.0, 1.0)
+
+    if "visual" in disabled:
+        s["visual_score"] = DISABLED_VISUAL
+    elif s["brand_mismatch"]:
+        s["visual_score"] = 1.0
+        skipped += ["clip", "blip2"]
+    else:
+        clip_r = clip_risk if clip_risk is not None else worst_clip_score(
+            listing["title"], listing["images"], images=images)
+        v_range = visual_risk_bounds(clip_r)
+        if verdict_settled(t_range, v_range, s["rule_score"], s["brand_mismatch"]):
+            s["visual_score"] = (v_range[0] + v_range[1]) / 2
+            skipped.append("blip2")
+        else:
+            s["visual_score"] = combine_visual(clip_r, blip_risk(listing["title"], listing["images"], images=images))
+    if s["brand_mismatch"]:
+        s["visual_score"] = 1.0
+
+    v = (s["visual_score"], s["visual_score"])
+    if text is None and verdict_settled(t_range, v, s["rule_score"], s["brand_mismatch"]):
+        text = ((t_range[0] + t_range[1]) / 2, SKIPPED_TEXT)
+        skipped.append("gemini")
+    if text is not None:
+        s["text_score"], s["text_reason"] = text
+    s["needs_llm"] = text is None
+    s["cascade"]   = skipped
+    return s
+
+
+def _cascade_finish(listing: Dict[str, Any], s: Dict[str, Any],
+                    text: Optional[Tuple[float, str]] = None) -> Dict[str, Any]:
+    if s.pop("needs_llm"):
+        s["text_score"], s["text_reason"] = text or review_fraud_score(listing["reviews"])
+    return s
+
+
+def analyse_listing(listing: Dict[str, Any], disabled: Iterable[str] = DISABLED_SIGNALS,
+                    clip_risk: Optional[float] = None,
+                    text: Optional[Tuple[float, str]] = None,
+                    cascade: bool = False) -> Dict[str, Any]:
+    with metrics.listing() as acc:
+        record = _analyse_listing(listing, set(disabled), clip_risk, text, cascade)
+    record["timings_ms"] = metrics.as_ms(acc)
+    return record
+
+
+def _analyse_listing(listing: Dict[str, Any], disabled: Set[str],
+                     clip_risk: Optional[float], text: Optional[Tuple[float, str]],
+                     cascade: bool) -> Dict[str, Any]:
+    if cascade:
+        signals = _cascade_cheap(listing, disabled, clip_risk, text)
+        return finalize(listing, _cascade_finish(listing, signals), disabled)
+    signals: Dict[str, Any] = {}
+    signals.update(stage_text(listing, disabled, text))
+    signals.update(stage_vision(listing, disabled, clip_risk))
+    signals.update(stage_rules(listing))
+    return finalize(listing, signals, disabled)
+
+
+def _cascade_batch(listings: List[Dict[str, Any]], disabled: Set[str], pack: int,
+                   images: ImageBatch, local: List[Tuple[Any, Any]]) -> List[Dict[str, Any]]:
+    with metrics.timer("rules"):
+        cols   = to_columns(listings)
+        rules  = anomaly_scores(cols["ratings"], cols["offsets"], cols["returns"])
+    brands = _brand_flags(listings, disabled, images)
+
+    clip_risks: List[Optional[float]] = [None] * len(listings)
+    need_clip = [i for i, b in enumerate(brands) if not b] if "visual" not in disabled else []
+    for i, r in zip(need_clip, clip_risk_batch([(listings[i]["title"], listings[i]["images"]) for i in need_clip],
+                                                        images=images)):
+        clip_risks[i] = r
+
+    batch = [
+        _cascade_cheap(l, disabled, clip_risk=c, rule_score=float(r), brand=b, images=images, local=lt)
+        for l, c, r, b, lt in zip(listings, clip_risks, rules, brands, local)
+    ]
+    ask = [i for i, s in enumerate(batch) if s["needs_llm"]]
+    texts: Dict[int, Tuple[float, str]] = dict(zip(ask, review_fraud_scores([listings[i]["reviews"] for i in ask], pack=pack)))
+    return [_cascade_finish(l, s, texts.get(i)) for i, (l, s) in enumerate(zip(listings, batch))]
+
+
+def analyse_batch(listings: List[Dict[str, Any]], disabled: Iterable[str] = DISABLED_SIGNALS,
+                  pack: int = LLM_PACK, cascade: bool = False, tag: bool = True) -> List[Dict[str, Any]]:
+    """Score a window of listings, sharing one batched CLIP pass and concurrent
+    (optionally packed) Gemini calls across them. Each record's timings_ms is
+    its even share of the window's stage times. `tag=False` leaves the
+    ClipStore's image owners untouched (lookups only)."""
+    with metrics.listing() as acc:
+        records = _analyse_batch(listings, set(disabled), pack, cascade, tag=tag)
+    for r in records:
+        r["timings_ms"] = metrics.as_ms(acc, len(records))
+    return records
+
+
+def _analyse_batch(listings: List[Dict[str, Any]], disabled: Set[str],
+                   pack: int, cascade: bool, images: Optional[ImageBatch] = None,
+                   local: Optional[List[Tuple[Any, Any]]] = None, tag: bool = True) -> List[Dict[str, Any]]:
+    """`local`: _local_texts results when the caller already ran (and indexed) them."""
+    images   = images if images is not None else _window_images(listings, disabled)
+    local    = local if local is not None else _local_texts(listings, disabled)
+    if cascade and listings:
+        batch = _cascade_batch(listings, disabled, pack, images, local)
+        return _finalize_batch(listings, batch, disabled, images)
+    if "visual" in disabled or not listings:
+        clip_risks: List[Optional[float]] = [None] * len(listings)
+        blip_risks: List[Optional[float]] = [None] * len(listings)
+    else:
+        pairs      = [(l["title"], l["images"]) for l in listings]
+        owners     = [l.get("id", "") for l in listings] if tag else None
+        clip_risks = clip_risk_batch(pairs, images=images, owners=owners)
+        blip_risks = blip_risk_batch(pairs, images=images)
+    reuse = [u for u, _ in local]
+    texts = [t for _, t in local]
+    if "text" not in disabled and listings:
+        ask = [i for i, t in enumerate(texts) if t is None]
+        for i, t in zip(ask, review_fraud_scores([listings[i]["reviews"] for i in ask], pack=pack)):
+            texts[i] = t
+    with metrics.timer("rules"):
+        cols   = to_columns(listings)
+        rules  = anomaly_scores(cols["ratings"], cols["offsets"], cols["returns"])
+    brands = _brand_flags(listings, disabled, images)
+
+    batch: List[Dict[str, Any]] = []
+    for l, r, b, t, u, rule, bf in zip(listings, clip_risks, blip_risks, texts, reuse, rules, brands):
+        signals: Dict[str, Any] = {"rule_score": float(rule)}
+        signals.update(stage_text(l, disabled, t))
+        if u is not None:
+            signals["review_reuse"] = u
+        signals.update(stage_vision(l, disabled, r, b, bf))
+        batch.append(signals)
+    return _finalize_batch(listings, batch, disabled, images)
+
+
+def _finalize_batch(listings: List[Dict[str, Any]], batch: List[Dict[str, Any]],
+                    disabled: Set[str], images: Optional[ImageBatch] = None) -> List[Dict[str, Any]]:
+    scores, verdicts = aggregate_many(
+        [s["text_score"] for s in batch],
+        [s["visual_score"] for s in batch],
+        [s["rule_score"] for s in batch],
+        [s["brand_mismatch"] for s in batch],
+    )
+    return [
+        finalize(l, s, disabled, scored=(int(sc), bool(v)), images=images, index=False)
+        for l, s, sc, v in zip(listings, batch, scores, verdicts)
+    ]
+
+
+# ───────────────────────── incremental ─────────────────────────
+# analyse_since re-runs only the signals whose input fingerprint differs from
+# the previous report's record and carries the others' scores forward; the
+# trust score is always re-aggregated. Listings that carry a signal run
+# without the cascade, whose skip decisions assume neutral disabled signals.
+
+def analyse_since(listings: List[Dict[str, Any]], previous: Dict[str, Dict[str, Any]],
+                  disabled: Iterable[str] = DISABLED_SIGNALS, pack: int = LLM_PACK,
+                  cascade: bool = False) -> List[Dict[str, Any]]:
+    disabled = set(disabled)
+    with metrics.listing() as acc:
+        images = _window_images(listings, disabled)
+        fps    = [fingerprint.of(l, disabled, images) for l in listings]
+        olds   = [previous.get(str(l.get("id", ""))) for l in listings]
+        groups: Dict[frozenset, List[int]] = {}
+        local: List[Tuple[Any, Any]] = []
+        for i, (fp, old) in enumerate(zip(fps, olds)):
+            keep = fingerprint.unchanged(old, fp) - {"rules"}  # rules are cheaper to rerun than to look up
+            groups.setdefault(frozenset(keep), []).append(i)
+            # review reuse in window order, before the listings are split into groups
+            local.append(stage_reuse(listings[i], disabled | (keep & {"text"})))
+
+        records: List[Optional[Dict[str, Any]]] = [None] * len(listings)
+        for keep, idx in groups.items():
+            sub = [listings[i] for i in idx]
+            for i, rec in zip(idx, _analyse_batch(sub, disabled | keep, pack, cascade and not keep, images,
+                                                  [local[i] for i in idx])):
+                if keep:
+                    fingerprint.carry(rec, olds[i], keep)
+                    bd = rec["breakdown"]
+                    rec["trust_score"], rec["verdict"] = aggregate(
+                        bd["text_score"], bd["visual_score"], bd["rule_score"], bd["brand_mismatch"])
+                rec["fingerprint"] = fps[i]
+                records[i] = rec
+    for r in records:
+        r["timings_ms"] = metrics.as_ms(acc, len(records))
+    return records  # type: ignore[return-value]
@@ -0,0 +1,209 @@
+from __future__ import annotations
+import heapq
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .             import metrics
+from .config       import DISABLED_SIGNALS
+from .orchestrator import stage_fetch, stage_vision, stage_rules, stage_reuse, stage_text, finalize
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name    = name
+        self.workers = workers
+        self.items   = 0
+        self.busy    = 0.0
+        self._lock   = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.items += 1
+            self.busy  += seconds
+
+    def as_dict(self, wall: float) -> Dict[str, float]:
+        return {
+            "workers":        self.workers,
+            "items":          self.items,
+            "busy_seconds":   round(self.busy, 3),
+            "items_per_sec":  round(self.items / wall, 3) if wall else 0.0,
+            "utilisation":    round(self.busy / (wall * self.workers), 3) if wall else 0.0,
+        }
+
+
+class _Stage:
+    """A worker pool reading (seq, listing, signals) from inq and writing to outq."""
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any], Dict[str, Any]], None],
+                 workers: int, inq: queue.Queue, outq: queue.Queue):
+        self.fn      = fn
+        self.inq     = inq
+        self.outq    = outq
+        self.stats   = StageStats(name, workers)
+        self._left   = workers
+        self._lock   = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"tg-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def _work(self):
+        while True:
+            item = self.inq.get()
+            if item is _DONE:
+                self.inq.put(_DONE)  # let sibling workers see it too
+                with self._lock:
+                    self._left -= 1
+                    last = self._left == 0
+                if last:
+                    self.outq.put(_DONE)
+                return
+            self._handle(item)
+
+    def _handle(self, item):
+        _, listing, signals = item
+        if "error" not in signals:
+            t0 = time.perf_counter()
+            try:
+                with metrics.listing() as acc:
+                    self.fn(listing, signals)
+            except Exception as exc:  # surfaced in order by the writer
+                signals["error"] = exc
+            timings = signals.setdefault("timings", {})
+            for k, v in acc.items():
+                timings[k] = timings.get(k, 0.0) + v
+            self.stats.record(time.perf_counter() - t0)
+        self.outq.put(item)
+
+
+class _OrderedStage(_Stage):
+    """One worker that handles items strictly in input order, buffering the
+    ones that overtake each other in the stages before it. The buffer is
+    bounded by Pipeline's in-flight window, not here."""
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any], Dict[str, Any]], None],
+                 inq: queue.Queue, outq: queue.Queue):
+        super().__init__(name, fn, 1, inq, outq)
+
+    def _work(self):
+        pending: List[tuple] = []
+        nxt = 0
+        while True:
+            item = self.inq.get()
+            if item is _DONE:  # upstream is drained, so nothing is left waiting
+                self.outq.put(_DONE)
+                return
+            heapq.heappush(pending, (item[0], id(item), item))
+            while pending and pending[0][0] == nxt:
+                self._handle(heapq.heappop(pending)[2])
+                nxt += 1
+
+
+class Pipeline:
+    """ingest → image fetch → CPU models → ordered review reuse → rate-limited LLM
+    → ordered aggregate."""
+
+    def __init__(self, disabled: Iterable[str] = DISABLED_SIGNALS, fetch_workers: int = 4,
+                 cpu_workers: int = 2, llm_workers: int = 1, queue_size: int = 64):
+        self.disabled   = set(disabled)
+        self.queue_size = queue_size
+        self.sizes      = {"fetch": fetch_workers, "cpu": cpu_workers, "llm": llm_workers}
+        self.stats      : List[StageStats] = []
+        self.wall       = 0.0
+
+    def _cpu(self, listing, signals):
+        signals.update(stage_vision(listing, self.disabled))
+        signals.update(stage_rules(listing))
+
+    def _reuse(self, listing, signals):
+        signals["local"] = stage_reuse(listing, self.disabled)
+
+    def _llm(self, listing, signals):
+        signals.update(stage_text(listing, self.disabled, local=signals.pop("local")))
+
+    def run(self, listings: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        qs = [queue.Queue(maxsize=self.queue_size) for _ in range(5)]
+        stages = [
+            _Stage("fetch", lambda l, s: stage_fetch(l, self.disabled), self.sizes["fetch"], qs[0], qs[1]),
+            _Stage("cpu",   self._cpu, self.sizes["cpu"], qs[1], qs[2]),
+            _OrderedStage("reuse", self._reuse, qs[2], qs[3]),
+            _Stage("llm",   self._llm, self.sizes["llm"], qs[3], qs[4]),
+        ]
+        ingest    = StageStats("ingest", 1)
+        aggregate = StageStats("aggregate", 1)
+        self.stats = [ingest] + [s.stats for s in stages] + [aggregate]
+        # at most queue_size listings between ingest and the writer, so one slow
+        # listing cannot pile the ones behind it up in the reorder buffers
+        window = threading.BoundedSemaphore(self.queue_size)
+
+        def feed():
+            seq = 0
+            it  = iter(listings)
+            while True:
+                window.acquire()
+                t0 = time.perf_counter()
+                try:
+                    listing = next(it)
+                except StopIteration:
+                    break
+                except Exception as exc:
+                    qs[0].put((seq, {}, {"error": exc}))
+                    break
+                ingest.record(time.perf_counter() - t0)
+                qs[0].put((seq, listing, {}))
+                seq += 1
+            qs[0].put(_DONE)
+
+        start = time.perf_counter()
+        threading.Thread(target=feed, name="tg-ingest", daemon=True).start()
+        for s in stages:
+            s.start()
+
+        pending: List[tuple] = []
+        nxt = 0
+        try:
+            while True:
+                item = qs[4].get()
+                if item is _DONE:
+                    break
+                heapq.heappush(pending, (item[0], id(item), item))
+                while pending and pending[0][0] == nxt:
+                    _, _, (seq, listing, signals) = heapq.heappop(pending)
+                    window.release()
+                    if "error" in signals:
+                        raise signals["error"]
+                    t0 = time.perf_counter()
+                    timings = signals.pop("timings", {})
+                    with metrics.listing() as acc:
+                        record = finalize(listing, signals, self.disabled, index=False)
+                    for k, v in acc.items():
+                        timings[k] = timings.get(k, 0.0) + v
+                    record["timings_ms"] = metrics.as_ms(timings)
+                    aggregate.record(time.perf_counter() - t0)
+                    nxt += 1
+                    yield record
+        finally:
+            self.wall = time.perf_counter() - start
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {s.name: s.as_dict(self.wall) for s in self.stats}
+
+
+def run_pipeline(listings: Iterable[Dict[str, Any]], disabled: Iterable[str] = DISABLED_SIGNALS,
+                 workers: int = 2, llm_workers: int = 1, queue_size: int = 64,
+                 stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    pipe = Pipeline(disabled, fetch_workers=2 * workers, cpu_workers=workers,
+                    llm_workers=llm_workers, queue_size=queue_size)
+    try:
+        yield from pipe.run(listings)
+    finally:
+        if stats is not None:
+            stats.update(pipe.report())
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+# Reports are written one record per line, either as JSONL or as a JSON array
+# laid out as "[", "{...},", ..., "{...}", "]".  Both stay valid to a line-wise
+# reader while the run is still going, which is what --resume relies on.
+
+
+def _scan(path: Path) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield (record, end_offset) for every complete record in a report file."""
+    offset = 0
+    with open(path, "rb") as fh:
+        for line in fh:
+            start, offset = offset, offset + len(line)
+            body = line.strip()
+            if body in (b"", b"[", b"]"):
+                continue
+            body = body.rstrip(b",")
+            try:
+                rec = json.loads(body)
+            except ValueError:
+                return  # torn tail from an interrupted run
+            if not isinstance(rec, dict):
+                return
+            yield rec, start + line.index(body) + len(body)
+
+
+def _legacy(path: Path) -> list:
+    # reports written before streaming were one indented JSON array
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8", errors="replace"))
+    except ValueError:
+        return []
+    return data if isinstance(data, list) else []
+
+
+def read_report(path: Path) -> Iterator[Dict[str, Any]]:
+    from .report_columnar import format_of, read
+    if format_of(path):
+        yield from read(path)
+        return
+    n = 0
+    for rec, _ in _scan(Path(path)):
+        n += 1
+        yield rec
+    if n == 0:
+        yield from _legacy(path)
+
+
+def written_asins(path: Path) -> Set[str]:
+    """ASINs a writer opened on `path` with resume=True would keep."""
+    from .report_columnar import format_of, written_asins as columnar_asins
+    if format_of(path):
+        return columnar_asins(path)
+    if not Path(path).exists():
+        return set()
+    return {str(r.get("asin", "")) for r in read_report(path)}
+
+
+class ReportWriter:
+    """Streams records to the report; with a `store` (report_store.ReportStore)
+    every record is also upserted there, committed at each checkpoint.
+    `checkpoint_every=None` means every 100 records."""
+
+    def __init__(self, path: Path, fmt: Optional[str] = None, resume: bool = False,
+                 checkpoint_every: Optional[int] = None, checkpoint_secs: float = 30.0, store=None):
+        self.path             = Path(path)
+        self.store            = store
+        self.fmt              = fmt or ("jsonl" if self.path.suffix == ".jsonl" else "json")
+        self.checkpoint_every = checkpoint_every or 100
+        self.checkpoint_secs  = checkpoint_secs
+        self.done  : Set[str] = set()
+        self.count            = 0
+        self._since_ckpt      = 0
+        self._last_ckpt       = time.monotonic()
+
+        end, legacy = 0, []
+        if resume and self.path.exists():
+            for rec, end in _scan(self.path):
+                self.done.add(str(rec.get("asin", "")))
+                self.count += 1
+            if not self.count:
+                legacy = _legacy(self.path)
+
+        self._written = self.count
+        if self.count:
+            self._fh = open(self.path, "r+b")
+            self._fh.truncate(end)
+            self._fh.seek(end)
+            if self.fmt == "jsonl":
+                self._fh.write(b"\n")
+        else:
+            self._fh = open(self.path, "wb")
+            if self.fmt == "json":
+                self._fh.write(b"[\n")
+            for rec in legacy:
+                self.write(rec)
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        if self.fmt == "json":
+            self._fh.write((b",\n" if self._written else b"") + line)
+        else:
+            self._fh.write(line + b"\n")
+        if self.store is not None:
+            self.store.add(record)
+        self._written    += 1
+        self.count       += 1
+        self._since_ckpt += 1
+        self.done.add(str(record.get("asin", "")))
+        if (self._since_ckpt >= self.checkpoint_every
+                or time.monotonic() - self._last_ckpt >= self.checkpoint_secs):
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        if self.store is not None:
+            self.store.flush()
+        self._since_ckpt = 0
+        self._last_ckpt  = time.monotonic()
+
+    def close(self):
+        if self._fh.closed:
+            return
+        if self.fmt == "json":
+            self._fh.write(b"\n]\n")
+        self.checkpoint()
+        self._fh.close()
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(path: Path, **kwargs):
+    """ReportWriter, or the Parquet / Arrow writer for those suffixes."""
+    from .report_columnar import ColumnarReportWriter, format_of
+    if format_of(path):
+        return ColumnarReportWriter(path, **kwargs)
+    return ReportWriter(path, **kwargs)
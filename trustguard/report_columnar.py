@@ -0,0 +1,311 @@
+"""Parquet / Arrow IPC reports: one flat, typed row per listing.
+
+The nested record (breakdown, explanation, fingerprint, timings) becomes
+typed columns; anything without a column of its own is kept in `extra` as
+JSON, so flatten() / unflatten() round-trip every record. While a run is
+going, rows are checkpointed as complete part files under <out>.parts/ (which
+--resume reads back); close() compacts them into row groups (Parquet) or
+record batches (Arrow) in <out>.
+"""
+from __future__ import annotations
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+SUFFIXES = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+_TOP    = {"asin", "title", "product_url", "trust_score", "verdict", "breakdown",
+           "explanation", "fingerprint", "timings_ms"}
+_SCORES = ("text_score", "visual_score", "rule_score")
+_FP     = ("text", "visual", "brand", "rules")
+
+
+def format_of(path: Path) -> Optional[str]:
+    return SUFFIXES.get(Path(path).suffix.lower())
+
+
+def schema(dictionary: bool = True):
+    """Report schema. Arrow IPC files allow one dictionary per field for the
+    whole file, so the Arrow writer passes dictionary=False (plain strings)."""
+    import pyarrow as pa
+
+    def label():
+        return pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+
+    return pa.schema([
+        ("asin",            pa.string()),
+        ("title",           pa.string()),
+        ("product_url",     pa.string()),
+        ("trust_score",     pa.int32()),
+        ("verdict",         pa.bool_()),
+        # float64: --since re-aggregates carried scores, and a rounded score can
+        # land on the other side of a threshold
+        ("text_score",      pa.float64()),
+        ("visual_score",    pa.float64()),
+        ("rule_score",      pa.float64()),
+        ("brand_mismatch",  pa.bool_()),
+        ("text_reason",     label()),
+        ("review_reuse",    pa.string()),                       # JSON, rarely present
+        ("cascade_skipped", pa.list_(label())),
+        ("carried",         pa.list_(label())),
+        ("fingerprint",     pa.struct([(k, pa.string()) for k in _FP])),
+        ("timings_ms",      pa.map_(label(), pa.float32())),
+        ("extra",           pa.string()),                       # JSON of unmapped fields
+    ])
+
+
+def flatten(rec: Dict[str, Any]) -> Dict[str, Any]:
+    bd = rec.get("breakdown") or {}
+    ex = dict(rec.get("explanation") or {})
+    row = {
+        "asin":            str(rec.get("asin", "")),
+        "title":           rec.get("title"),
+        "product_url":     rec.get("product_url"),
+        "trust_score":     rec.get("trust_score"),
+        "verdict":         rec.get("verdict"),
+        **{k: bd.get(k) for k in _SCORES},
+        "brand_mismatch":  bd.get("brand_mismatch"),
+        "text_reason":     ex.pop("text", None),
+        "review_reuse":    json.dumps(ex.pop("review_reuse")) if "review_reuse" in ex else None,
+        "cascade_skipped": ex.pop("cascade", {}).get("skipped") if "cascade" in ex else None,
+        "carried":         ex.pop("carried", None),
+        "fingerprint":     rec.get("fingerprint"),
+        "timings_ms":      list((rec.get("timings_ms") or {}).items()) if "timings_ms" in rec else None,
+    }
+    extra = {k: v for k, v in rec.items() if k not in _TOP}
+    extra_bd = {k: v for k, v in bd.items() if k not in _SCORES and k != "brand_mismatch"}
+    if ex:
+        extra["explanation"] = ex
+    if extra_bd:
+        extra["breakdown"] = extra_bd
+    row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return row
+
+
+def unflatten(row: Dict[str, Any]) -> Dict[str, Any]:
+    extra = json.loads(row["extra"]) if row.get("extra") else {}
+    ex: Dict[str, Any] = {"text": row.get("text_reason")}
+    if row.get("review_reuse"):
+        ex["review_reuse"] = json.loads(row["review_reuse"])
+    if row.get("cascade_skipped") is not None:
+        ex["cascade"] = {"skipped": row["cascade_skipped"]}
+    if row.get("carried") is not None:
+        ex["carried"] = row["carried"]
+    ex.update(extra.pop("explanation", {}))
+    rec = {
+        "asin":        row.get("asin"),
+        "title":       row.get("title"),
+        "product_url": row.get("product_url"),
+        "trust_score": row.get("trust_score"),
+        "verdict":     row.get("verdict"),
+        "breakdown": {
+            "text_score":     row.get("text_score"),
+            "visual_score":   row.get("visual_score"),
+            "brand_mismatch": row.get("brand_mismatch"),
+            "rule_score":     row.get("rule_score"),
+            **extra.pop("breakdown", {}),
+        },
+        "explanation": ex,
+    }
+    if row.get("fingerprint") is not None:
+        rec["fingerprint"] = row["fingerprint"]
+    if row.get("timings_ms") is not None:
+        rec["timings_ms"] = dict(row["timings_ms"])
+    rec.update(extra)
+    return rec
+
+
+def _batches(path: Path, batch_size: int = 10_000, columns: Optional[List[str]] = None):
+    import pyarrow as pa
+
+    if format_of(path) == "parquet":
+        import pyarrow.parquet as pq
+        # one row group at a time: each has its own dictionaries, and a batch
+        # spanning two cannot hold the nested dictionary columns
+        pf = pq.ParquetFile(path)
+        for i in range(pf.num_row_groups):
+            yield from pf.read_row_group(i, columns=columns).to_batches(max_chunksize=batch_size)
+        return
+    f = pa.ipc.open_file(pa.memory_map(str(path), "r"))
+    for i in range(f.num_record_batches):
+        batch = f.get_batch(i)
+        yield batch.select(columns) if columns else batch
+
+
+def parts_dir(path: Path) -> Path:
+    return Path(f"{path}.parts")
+
+
+def _parts(path: Path) -> List[Path]:
+    return sorted(parts_dir(path).glob(f"part-*{Path(path).suffix}"))
+
+
+def _sources(path: Path) -> List[Path]:
+    # a complete file always holds every part: close() renames it into place
+    # before removing the parts, so if both exist the file wins
+    return [Path(path)] if Path(path).exists() else _parts(path)
+
+
+def read(path: Path, batch_size: int = 10_000) -> Iterator[Dict[str, Any]]:
+    """Records of a complete report, or of the parts an interrupted run left."""
+    for src in _sources(path):
+        for batch in _batches(src, batch_size):
+            for row in batch.to_pylist():
+                yield unflatten(row)
+
+
+def written_asins(path: Path) -> Set[str]:
+    """ASINs ColumnarReportWriter(path, resume=True) would keep."""
+    return {str(a) for src in _sources(path) for b in _batches(src, columns=["asin"])
+            for a in b.column(0).to_pylist()}
+
+
+def _fsync(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ColumnarReportWriter:
+    """ReportWriter counterpart for .parquet / .arrow outputs.
+
+    Rows are buffered and written as complete, fsynced part files under
+    <out>.parts/ every `checkpoint_every` rows (default `row_group`) or
+    `checkpoint_secs` seconds, whichever comes first; close() compacts the
+    parts into <out>, in row groups of `row_group`, and removes them. With
+    resume=True the parts of an interrupted run (or an earlier complete file)
+    are kept and their ASINs land in `done`, as with ReportWriter."""
+
+    def __init__(self, path: Path, fmt: Optional[str] = None, resume: bool = False,
+                 checkpoint_every: Optional[int] = None, checkpoint_secs: float = 30.0,
+                 store=None, row_group: int = 10_000, compression: str = "zstd"):
+        self.path             = Path(path)
+        self.fmt              = fmt or format_of(self.path) or "parquet"
+        self.store            = store
+        self.checkpoint_every = checkpoint_every or row_group
+        self.checkpoint_secs  = checkpoint_secs
+        self.row_group        = row_group
+        self.compression      = compression
+        self.done  : Set[str] = set()
+        self.count            = 0
+        self._rows : List[Dict[str, Any]] = []
+        self._schema          = schema(dictionary=self.fmt == "parquet")
+        self._dir             = parts_dir(self.path)
+        self._last_ckpt       = time.monotonic()
+        self._closed          = False
+
+        if not resume:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self.path.unlink(missing_ok=True)
+        elif self.path.exists():  # a finished run: its file becomes the first part
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir.mkdir(parents=True)
+            os.replace(self.path, self._dir / f"part-00000{self.path.suffix}")
+        self._dir.mkdir(parents=True, exist_ok=True)
+        for part in _parts(self.path):
+            for batch in _batches(part, columns=["asin"]):
+                self.done.update(str(a) for a in batch.column(0).to_pylist())
+                self.count += batch.num_rows
+        self._next = len(_parts(self.path))
+
+    def write(self, record: Dict[str, Any]):
+        self._rows.append(flatten(record))
+        self.done.add(str(record.get("asin", "")))
+        self.count += 1
+        if self.store is not None:
+            self.store.add(record)
+        if (len(self._rows) >= self.checkpoint_every
+                or time.monotonic() - self._last_ckpt >= self.checkpoint_secs):
+            self.checkpoint()
+
+    def _open(self, sink: Path):
+        import pyarrow as pa
+
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(str(sink), self._schema, compression=self.compression)
+        return pa.ipc.new_file(str(sink), self._schema,
+                               options=pa.ipc.IpcWriteOptions(compression=self.compression))
+
+    def _write(self, writer, table):
+        # one chunk per column: parts carry their own dictionaries, and nested
+        # dictionary columns split across chunks cannot be read back from Parquet
+        table = table.combine_chunks()
+        if self.fmt == "parquet":
+            writer.write_table(table, row_group_size=self.row_group)
+        else:
+            for batch in table.to_batches(max_chunksize=self.row_group):
+                writer.write_batch(batch)
+
+    def checkpoint(self):
+        """Write the buffered rows as the next part file."""
+        import pyarrow as pa
+
+        if self._rows:
+            part = self._dir / f"part-{self._next:05d}{self.path.suffix}"
+            tmp  = part.with_suffix(".tmp")
+            writer = self._open(tmp)
+            self._write(writer, pa.Table.from_pylist(self._rows, schema=self._schema))
+            writer.close()
+            _fsync(tmp)
+            os.replace(tmp, part)
+            self._next += 1
+            self._rows = []
+        if self.store is not None:
+            self.store.flush()
+        self._last_ckpt = time.monotonic()
+
+    def close(self):
+        if self._closed:
+            return
+        import pyarrow as pa
+
+        self.checkpoint()
+        tmp = Path(f"{self.path}.tmp")
+        writer = self._open(tmp)
+        buf, rows = [], 0
+        for part in _parts(self.path):
+            for batch in _batches(part, self.row_group):
+                buf.append(batch)
+                rows += batch.num_rows
+                if rows >= self.row_group:
+                    self._write(writer, pa.Table.from_batches(buf, self._schema))
+                    buf, rows = [], 0
+        if buf:
+            self._write(writer, pa.Table.from_batches(buf, self._schema))
+        writer.close()
+        _fsync(tmp)
+        os.replace(tmp, self.path)
+        shutil.rmtree(self._dir, ignore_errors=True)
+        self._closed = True
+
+    def __enter__(self) -> "ColumnarReportWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_json(src: Path, dst: Path) -> int:
+    """Compatibility export: a columnar report as the line-per-record JSON / JSONL report."""
+    from .report import ReportWriter
+
+    with ReportWriter(dst) as writer:
+        for rec in read(src):
+            writer.write(rec)
+    return writer.count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a Parquet / Arrow report as JSON (or JSONL)")
+    parser.add_argument("src", type=Path, help="Report written with --out *.parquet / *.arrow")
+    parser.add_argument("dst", type=Path, help="Output .json or .jsonl")
+    args = parser.parse_args()
+    print(f"✓ {export_json(args.src, args.dst)} records → {args.dst}")
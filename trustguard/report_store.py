@@ -0,0 +1,215 @@
+"""Indexed SQLite copy of a report for the moderator dashboard.
+
+batch_run writes it next to the report (<out>.sqlite). Summary columns are
+indexed for filtering / sorting and titles are full-text indexed (FTS5, or
+LIKE where SQLite lacks it); the full record is only read for one listing.
+
+    python -m trustguard.report_store my_report.json            # build from an existing report
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_COLUMNS = ("asin", "title", "product_url", "trust_score", "verdict", "brand_mismatch",
+            "text_score", "visual_score", "rule_score")
+
+# ORDER BY keys the dashboard may ask for
+SORTS = {"trust_score", "text_score", "visual_score", "rule_score", "asin"}
+
+
+def store_path(report: Path) -> Path:
+    return Path(f"{report}.sqlite")
+
+
+def _row(rec: Dict[str, Any]) -> Tuple:
+    bd = rec.get("breakdown") or {}
+    return (
+        str(rec.get("asin") or rec.get("id") or ""), rec.get("title", ""),
+        rec.get("product_url") or rec.get("url", ""), rec.get("trust_score"),
+        int(bool(rec.get("verdict"))), int(bool(bd.get("brand_mismatch"))),
+        bd.get("text_score"), bd.get("visual_score"), bd.get("rule_score"),
+        json.dumps(rec, ensure_ascii=False),
+    )
+
+
+def _fts_query(text: str) -> str:
+    """User text as an FTS5 query: every word must prefix-match."""
+    words = re.findall(r"\w+", text, flags=re.UNICODE)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+class ReportStore:
+    def __init__(self, path: Path, batch: int = 500):
+        self.path   = Path(path)
+        self.batch  = batch
+        self.fts    = False
+        self._buf   : List[Tuple] = []
+        self._lock  = threading.Lock()
+        self._conn  : Optional[sqlite3.Connection] = None
+        self._pid   : Optional[int] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS listings (
+                id INTEGER PRIMARY KEY, asin TEXT UNIQUE NOT NULL, title TEXT, product_url TEXT,
+                trust_score INTEGER, verdict INTEGER, brand_mismatch INTEGER,
+                text_score REAL, visual_score REAL, rule_score REAL, record TEXT)""")
+            for cols in ("trust_score", "verdict, trust_score", "brand_mismatch, trust_score",
+                         "text_score", "visual_score", "rule_score"):
+                name = "listings_" + re.sub(r"\W+", "_", cols)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON listings ({cols})")
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS titles USING "
+                             "fts5(title, content='listings', content_rowid='id')")
+                conn.executescript("""
+                    CREATE TRIGGER IF NOT EXISTS listings_ai AFTER INSERT ON listings BEGIN
+                        INSERT INTO titles(rowid, title) VALUES (new.id, new.title); END;
+                    CREATE TRIGGER IF NOT EXISTS listings_ad AFTER DELETE ON listings BEGIN
+                        INSERT INTO titles(titles, rowid, title) VALUES ('delete', old.id, old.title); END;
+                    CREATE TRIGGER IF NOT EXISTS listings_au AFTER UPDATE OF title ON listings BEGIN
+                        INSERT INTO titles(titles, rowid, title) VALUES ('delete', old.id, old.title);
+                        INSERT INTO titles(rowid, title) VALUES (new.id, new.title); END;
+                """)
+                self.fts = True
+            except sqlite3.OperationalError:  # SQLite built without FTS5
+                self.fts = False
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    # ── writing ──
+
+    def add(self, record: Dict[str, Any]):
+        self._buf.append(_row(record))
+        if len(self._buf) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self._buf:
+            return
+        cols = ", ".join(_COLUMNS + ("record",))
+        sets = ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS[1:] + ("record",))
+        with self._lock:
+            db = self._db()
+            db.executemany(f"INSERT INTO listings ({cols}) VALUES ({','.join('?' * (len(_COLUMNS) + 1))}) "
+                           f"ON CONFLICT(asin) DO UPDATE SET {sets}", self._buf)
+            db.commit()
+            self._buf = []
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for rec in records:
+            self.add(rec)
+            n += 1
+        self.flush()
+        return n
+
+    def clear(self):
+        self._buf = []
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM listings")
+            if self.fts:
+                db.execute("INSERT INTO titles(titles) VALUES ('delete-all')")
+            db.commit()
+
+    # ── reading ──
+
+    def _where(self, verdict: Optional[bool], min_score: Optional[float], max_score: Optional[float],
+               brand_mismatch: Optional[bool], search: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, args = [], []
+        if verdict is not None:
+            clauses.append("verdict = ?")
+            args.append(int(verdict))
+        if min_score is not None:
+            clauses.append("trust_score >= ?")
+            args.append(min_score)
+        if max_score is not None:
+            clauses.append("trust_score <= ?")
+            args.append(max_score)
+        if brand_mismatch is not None:
+            clauses.append("brand_mismatch = ?")
+            args.append(int(brand_mismatch))
+        if search and search.strip():
+            q = _fts_query(search) if self.fts else ""
+            if q:
+                clauses.append("id IN (SELECT rowid FROM titles WHERE titles MATCH ?)")
+                args.append(q)
+            else:
+                clauses.append("title LIKE ? ESCAPE '\\'")
+                args.append("%" + re.sub(r"([%_\\])", r"\\\1", search.strip()) + "%")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, verdict: Optional[bool] = None, min_score: Optional[float] = None,
+              max_score: Optional[float] = None, brand_mismatch: Optional[bool] = None,
+              search: Optional[str] = None, sort: str = "trust_score", descending: bool = False,
+              limit: int = 50, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of summary rows (no full records) and the total match count."""
+        if sort not in SORTS:
+            raise ValueError(f"cannot sort by {sort!r}")
+        order = f"{sort} {'DESC' if descending else 'ASC'}, id"
+        with self._lock:
+            db = self._db()
+            where, args = self._where(verdict, min_score, max_score, brand_mismatch, search)
+            total = db.execute(f"SELECT COUNT(*) FROM listings{where}", args).fetchone()[0]
+            cur = db.execute(f"SELECT {', '.join(_COLUMNS)} FROM listings{where} ORDER BY {order} "
+                             f"LIMIT ? OFFSET ?", args + [limit, offset])
+            rows = [dict(zip(_COLUMNS, r)) for r in cur]
+        for r in rows:
+            r["verdict"], r["brand_mismatch"] = bool(r["verdict"]), bool(r["brand_mismatch"])
+        return rows, total
+
+    def get(self, asin: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT record FROM listings WHERE asin = ?", (asin,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            total, listable, brand = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(verdict), 0), COALESCE(SUM(brand_mismatch), 0) FROM listings").fetchone()
+        return {"total": total, "listable": listable, "flagged": total - listable, "brand_mismatch": brand}
+
+    def version(self) -> float:
+        """Changes whenever the store is written (for UI caches)."""
+        return max((p.stat().st_mtime for p in (self.path, Path(f"{self.path}-wal")) if p.exists()), default=0.0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+            self._conn = None
+
+
+def build(report: Path, path: Optional[Path] = None) -> ReportStore:
+    """(Re)build the store for an existing report file."""
+    from .report import read_report
+
+    store = ReportStore(path or store_path(report))
+    store.clear()
+    store.add_many(read_report(Path(report)))
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the dashboard store for a report")
+    parser.add_argument("report", type=Path, help="Report written by batch_run (.json, .jsonl, .parquet or .arrow)")
+    parser.add_argument("--store", type=Path, default=None, help="Output path (default <report>.sqlite)")
+    args = parser.parse_args()
+    s = build(args.report, args.store)
+    print(f"✓ {len(s)} listings → {s.path} (title search: {'fts5' if s.fts else 'LIKE'})")
@@ -0,0 +1,43 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embed_store import EmbedDB
+
+DUP_SIM      = 0.92  # cosine similarity above which two reviews are "the same text"
+DECISIVE_DUP = 0.5   # hybrid mode: this much reuse settles the text signal locally
+
+
+def reuse_ratios(db: EmbedDB, reviews: List[Any], listing_id: Optional[str] = None,
+                 k: int = 10, sim: float = DUP_SIM) -> Dict[str, float]:
+    """Share of a listing's reviews that have a near-duplicate inside the same
+    listing (intra) or in another listing already in `db` (cross)."""
+    _, vecs = db.encode(reviews)
+    n = vecs.shape[0]
+    if n == 0:
+        return {"n": 0, "intra_dup_ratio": 0.0, "cross_dup_ratio": 0.0}
+
+    gram = vecs @ vecs.T
+    np.fill_diagonal(gram, -1.0)
+    intra = float((gram >= sim).any(axis=1).mean()) if n > 1 else 0.0
+
+    D, I = db.search_vectors(vecs, k)
+    other = np.array([
+        i >= 0 and (listing_id is None or db.owner[i] != listing_id) for i in I.ravel()
+    ]).reshape(I.shape)
+    cross = float(((D >= sim) & other).any(axis=1).mean())
+    return {"n": n, "intra_dup_ratio": intra, "cross_dup_ratio": cross}
+
+
+def local_text_score(ratios: Dict[str, float]) -> Tuple[float, str]:
+    """Map reuse ratios onto review_fraud_score's 0 (genuine) → 1 (fake) scale."""
+    dup = max(ratios["intra_dup_ratio"], ratios["cross_dup_ratio"])
+    score = round(0.2 + 0.8 * dup, 3)
+    why = (f"{ratios['intra_dup_ratio']:.0%} of reviews repeat within the listing, "
+           f"{ratios['cross_dup_ratio']:.0%} reused from other listings")
+    return score, why
+
+
+def is_decisive(ratios: Dict[str, float], threshold: float = DECISIVE_DUP) -> bool:
+    return max(ratios["intra_dup_ratio"], ratios["cross_dup_ratio"]) >= threshold
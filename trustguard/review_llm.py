@@ -1,52 +1,39 @@
 from __future__ import annotations
-import inspect
+import asyncio
+import hashlib
 import json
+import math
 import re
-import textwrap
-import time
-from functools import lru_cache
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
-from .config import GOOGLE_API_KEY, LLM_MODEL
+from . import metrics, models
+from .cache import SqliteCache
+from .config import CACHE_DIR, LLM_MODEL, LLM_REVIEW_TOKEN_BUDGET
+from .llm_client import estimate_tokens
+from .utils import run_sync
 
-genai.configure(api_key=GOOGLE_API_KEY)
-_model = genai.GenerativeModel(LLM_MODEL)
+Reviews = Union[List[Dict[str, Any]], List[str]]
 
-_MAX_RPM      = 15
-_MIN_INTERVAL = 60.0 / _MAX_RPM
-_last_call    = 0.0
+# bump whenever the prompt wording or compaction changes, so old verdicts are not reused
+# (4: drops unparsed "no reason" verdicts that v3 cached)
+PROMPT_VERSION = 4
 
+# returned (never cached) when Gemini fails or its reply has no usable score
+_FALLBACK = (0.5, "rate-limit fallback")
+_NEAR_DUP = 0.85  # word-shingle Jaccard above which two reviews count as one
 
-@lru_cache(maxsize=512)
-def _query_llm(prompt: str) -> Dict[str, Any]:
-    global _last_call
-    wait = _MIN_INTERVAL - (time.time() - _last_call)
-    if wait > 0:
-        time.sleep(wait)
+_verdicts = SqliteCache(CACHE_DIR / "llm_verdicts.sqlite", table="verdicts")
+metrics.source("llm_verdicts", _verdicts.stats)
 
-    for _ in range(2):
-        try:
-            resp = _model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.0, "max_output_tokens": 64},
-            )
-            _last_call = time.time()
-            raw = resp.text.strip()
-            try:
-                return json.loads(raw)
-            except json.JSONDecodeError:
-                block = re.search(r"\{.*?\}", raw, re.S)
-                return json.loads(block.group(0)) if block else {}
-        except ResourceExhausted as e:
-            back = getattr(e, "retry_delay", None)
-            time.sleep(back.seconds if back and hasattr(back, "seconds") else 60)
-
-    return {"score": 0.5, "why": "rate-limit fallback"}
-
-
-def _bodies(rev: Union[List[Dict[str, Any]], List[str]], cap: int = 20) -> List[str]:
+
+async def _query_llm_async(prompt: str, max_output_tokens: int = 64) -> Dict[str, Any]:
+    try:
+        return await models.get("gemini").generate_json(prompt, max_output_tokens)
+    except RuntimeError:
+        return {}  # no score: the caller falls back
+
+
+def _bodies(rev: Reviews, cap: int = 20) -> List[str]:
     out: List[str] = []
     for r in rev:
         body = r.get("body") if isinstance(r, dict) else r
@@ -57,40 +44,201 @@ def _bodies(rev: Union[List[Dict[str, Any]], List[str]], cap: int = 20) -> List[
     return out
 
 
-def review_fraud_score(
-    reviews: Union[List[Dict[str, Any]], List[str]], sample: int = 20
-) -> Tuple[float, str]:
-    texts = _bodies(reviews, sample)
-    n = len(texts)
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text)
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _compact(texts: List[str], token_budget: int = LLM_REVIEW_TOKEN_BUDGET) -> List[str]:
+    """Collapse exact / near-duplicate reviews into "(×n) text" lines and trim
+    to the token budget. The order is canonical, so the same review set always
+    yields the same lines."""
+    groups: List[List[Any]] = []  # [normalized text, shingles, count, first original]
+    for t in texts:
+        n = _norm(t)
+        sh = _shingles(n)
+        for g in groups:
+            if g[0] == n or len(sh & g[1]) / len(sh | g[1]) >= _NEAR_DUP:
+                g[2] += 1
+                break
+        else:
+            groups.append([n, sh, 1, re.sub(r"\s+", " ", t).strip()])
+
+    groups.sort(key=lambda g: (-g[2], g[0]))
+    lines: List[str] = []
+    used = 0
+    for _, _, count, text in groups:
+        line = f"(×{count}) {text}" if count > 1 else text
+        cost = estimate_tokens(line)
+        if lines and used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
 
+def _review_key(lines: List[str], total: int) -> str:
+    blob = json.dumps([LLM_MODEL, PROMPT_VERSION, total, [_norm(l) for l in lines]], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _trivial(texts: List[str]) -> Optional[Tuple[float, str]]:
+    # counts the raw reviews: 20 copies of one text are 20 reviews, not "few"
+    n = len(texts)
     if n == 0:
         return 0.8, "no reviews"
     if n < 3:
         return 0.6, "few reviews"
+    return None
+
+
+def _verdict(obj: Any) -> Optional[Tuple[float, str]]:
+    """(score, reason) from a reply object; None when it has no numeric score."""
+    try:
+        score = float(obj["score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not math.isfinite(score):
+        return None
+    return score, str(obj.get("why", "no reason"))[:200]
+
+
+_REPEATS = """
+Identical and near-identical reviews are shown once, prefixed with "(×N)" where
+N reviewers posted that text. Such repetition is strong evidence of fake,
+templated reviews: the more of a listing's reviews sit in repeated lines, the
+closer the score should be to 1.0. A listing whose reviews are all one repeated
+text is almost certainly fake.
+""".strip()
 
+
+def _prompt(texts: List[str], total: int) -> str:
     snippet = "\n".join(texts)
-    prompt = f"""
+    return f"""
 You are a fraud-detection analyst for an e-commerce marketplace.
 
 Return ONLY one JSON object with two keys:
   "score": float from 0.0 (certainly genuine) to 1.0 (certainly fake)
   "why":   ≤ 20 words explaining the MAIN signal used.
 
-Special cases
--------------
-• If no review text is provided, set "score": 0.8 and "why": "no reviews".
-• If fewer than 3 distinct reviews are given, set "score": 0.6 and "why": "few reviews".
+{_REPEATS}
 
-Otherwise
----------
 Analyse linguistic patterns, repetitiveness and sentiment consistency.
 Be strict about identical or templated language across reviewers.
 
-Reviews:
+Reviews ({total} in total, {len(texts)} distinct shown):
 {snippet}
 """.strip()
 
-    obj    = _query_llm(prompt)
-    score  = float(obj.get("score", 0.5))
-    reason = str(obj.get("why",  "no reason"))[:200]
-    return score, reason
+
+def _packed_prompt(groups: Sequence[List[str]], totals: Sequence[int]) -> str:
+    blocks = "\n\n".join(
+        f"### Listing {i}\n({total} reviews in total, {len(texts)} distinct shown)\n"
+        + "\n".join(f"- {t}" for t in texts)
+        for i, (texts, total) in enumerate(zip(groups, totals))
+    )
+    return f"""
+You are a fraud-detection analyst for an e-commerce marketplace.
+Below are the reviews of {len(groups)} separate listings. Judge each listing independently.
+
+Return ONLY one JSON object of the form
+  {{"results": [{{"id": <listing number>, "score": <float>, "why": "<reason>"}}, ...]}}
+with exactly one entry per listing, where
+  "score": float from 0.0 (certainly genuine) to 1.0 (certainly fake)
+  "why":   ≤ 20 words explaining the MAIN signal used.
+
+{_REPEATS}
+
+Analyse linguistic patterns, repetitiveness and sentiment consistency.
+Be strict about identical or templated language across reviewers.
+
+{blocks}
+""".strip()
+
+
+async def _score_pack(groups: List[List[str]], totals: List[int]) -> List[Optional[Tuple[float, str]]]:
+    """One verdict per group; None where Gemini gave no usable score."""
+    if len(groups) == 1:
+        return [_verdict(await _query_llm_async(_prompt(groups[0], totals[0])))]
+    obj = await _query_llm_async(_packed_prompt(groups, totals), max_output_tokens=64 * len(groups))
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for item in obj.get("results", []) if isinstance(obj.get("results"), list) else []:
+        try:
+            by_id[int(item["id"])] = item
+        except (KeyError, TypeError, ValueError):
+            continue
+    out: List[Optional[Tuple[float, str]]] = []
+    for i, (texts, total) in enumerate(zip(groups, totals)):
+        v = _verdict(by_id[i]) if i in by_id else None
+        if v is None:  # model dropped this listing or gave no score – ask for it on its own
+            v = _verdict(await _query_llm_async(_prompt(texts, total)))
+        out.append(v)
+    return out
+
+
+async def review_fraud_scores_async(review_sets: Sequence[Reviews], pack: int = 1,
+                                    sample: int = 20) -> List[Tuple[float, str]]:
+    texts   = [_bodies(r, sample) for r in review_sets]
+    results : List[Optional[Tuple[float, str]]] = [_trivial(t) for t in texts]
+    lines   = {i: _compact(t) for i, t in enumerate(texts) if results[i] is None}
+    keys    = {i: _review_key(l, len(texts[i])) for i, l in lines.items()}
+    cached  = _verdicts.get_many(keys.values())
+
+    todo: Dict[str, List[int]] = {}  # identical review sets are asked about once
+    for i, k in keys.items():
+        if k in cached:
+            results[i] = tuple(cached[k])  # type: ignore[assignment]
+        else:
+            todo.setdefault(k, []).append(i)
+
+    order  = list(todo)
+    step   = max(1, pack)
+    packs  = [order[j:j + step] for j in range(0, len(order), step)]
+    scored = await asyncio.gather(*(_score_pack([lines[todo[k][0]] for k in p],
+                                                [len(texts[todo[k][0]]) for k in p]) for p in packs))
+    for p, verdicts in zip(packs, scored):
+        for k, v in zip(p, verdicts):
+            if v is None:
+                v = _FALLBACK
+            else:
+                _verdicts.put(k, list(v))
+            for i in todo[k]:
+                results[i] = v
+    return results  # type: ignore[return-value]
+
+
+@metrics.timed("gemini")
+def review_fraud_scores(review_sets: Sequence[Reviews], pack: int = 1,
+                        sample: int = 20) -> List[Tuple[float, str]]:
+    """Score many listings concurrently, `pack` listings per Gemini prompt."""
+    return run_sync(review_fraud_scores_async(review_sets, pack, sample))
+
+
+def trivial_verdict(reviews: Reviews, sample: int = 20) -> Optional[Tuple[float, str]]:
+    """The verdict review_fraud_score returns without asking Gemini, if any."""
+    return _trivial(_bodies(reviews, sample))
+
+
+def review_fraud_score(reviews: Reviews, sample: int = 20) -> Tuple[float, str]:
+    texts = _bodies(reviews, sample)
+    trivial = _trivial(texts)
+    if trivial is not None:
+        return trivial
+
+    lines = _compact(texts)
+    key = _review_key(lines, len(texts))
+    hit = _verdicts.get(key)
+    if hit is not None:
+        return hit[0], hit[1]
+    with metrics.timer("gemini"):
+        v = _verdict(run_sync(_query_llm_async(_prompt(lines, len(texts)))))
+    if v is None:
+        return _FALLBACK
+    _verdicts.put(key, list(v))
+    return v
@@ -1,3 +1,5 @@
+import numpy as np
+
 def aggregate(text_s: float,visual_s: float,rule_s: float,brand_flag: bool,threshold: int = 70,) -> tuple[int, bool]:
     # weights must sum to 1.0
     w_text, w_visual, w_rule, w_brand = 0.20, 0.20, 0.20, 0.40
@@ -6,3 +8,26 @@ def aggregate(text_s: float,visual_s: float,rule_s: float,brand_flag: bool,thres
     score   = int(trust_frac * 100)
     listable = score >= threshold
     return score, listable
+
+
+def aggregate_many(text_s: np.ndarray, visual_s: np.ndarray, rule_s: np.ndarray, brand_flag: np.ndarray,
+                   threshold: int = 70) -> tuple[np.ndarray, np.ndarray]:
+    # same weights and operation order as aggregate(), so results match it exactly
+    w_text, w_visual, w_rule, w_brand = 0.20, 0.20, 0.20, 0.40
+    risk_brand = np.where(np.asarray(brand_flag, dtype=bool), 1.0, 0.0)
+    trust_frac = ((1.0 - np.asarray(text_s, dtype=np.float64)) * w_text
+                  + (1.0 - np.asarray(visual_s, dtype=np.float64)) * w_visual
+                  + (1.0 - np.asarray(rule_s, dtype=np.float64)) * w_rule
+                  + (1.0 - risk_brand) * w_brand)
+    score    = (trust_frac * 100).astype(np.int64)
+    listable = score >= threshold
+    return score, listable
+
+
+def verdict_settled(text_range: tuple[float, float], visual_range: tuple[float, float],
+                    rule_s: float, brand_flag: bool, threshold: int = 70) -> bool:
+    """True when every text/visual risk inside the given ranges yields the same
+    verdict. aggregate() is monotone in each risk, so the extremes suffice."""
+    best  = aggregate(text_range[0], visual_range[0], rule_s, brand_flag, threshold)[1]
+    worst = aggregate(text_range[1], visual_range[1], rule_s, brand_flag, threshold)[1]
+    return best == worst
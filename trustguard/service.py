@@ -0,0 +1,283 @@
+"""Local scoring service: POST listing JSON, get the analyse_listing record back.
+
+    python -m trustguard.service --port 8080            # real models
+    python -m trustguard.service --port 8080 --stubs    # stub models, no weights needed
+
+Concurrent requests are collected into micro-batches that go through
+analyse_batch together, so CLIP, BLIP-2, OCR and the review embeddings run
+once per batch instead of once per request.
+
+The service never adds reviews to the review index (`embed` is always
+disabled) nor image owners to the ClipStore: a long-running process would
+grow them without bound, and a score would depend on which requests came
+before it. Review reuse is looked up against a fixed catalogue instead,
+loaded read-only with --index-dir.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from . import metrics, models
+from .config import (DISABLED_SIGNALS, EMBED_INDEX, EMBED_INDEX_PQ, LLM_PACK, SERVICE_BUDGET_MS,
+                     SERVICE_MAX_BATCH, SERVICE_MAX_QUEUE, SERVICE_MAX_WAIT_MS, TEXT_MODE)
+
+
+class Overloaded(Exception):
+    """Raised by admission control; the request is answered with 503."""
+
+
+class MicroBatcher:
+    """Groups listings submitted by concurrent requests into batches of up to
+    max_batch, holding the first one at most max_wait seconds, and runs each
+    batch through `fn` on a single worker thread."""
+
+    def __init__(self, fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 max_batch: int = SERVICE_MAX_BATCH, max_wait: float = SERVICE_MAX_WAIT_MS / 1000,
+                 max_queue: int = SERVICE_MAX_QUEUE, budget: float = SERVICE_BUDGET_MS / 1000):
+        self.fn        = fn
+        self.max_batch = max_batch
+        self.max_wait  = max_wait
+        self.max_queue = max_queue
+        self.budget    = budget
+        self.pending   = 0        # submitted, not yet answered
+        self.batches   = 0
+        self.rejected  = 0
+        self.batch_seconds: Optional[float] = None  # EWMA of one batch's run time
+        self._buf  : List[Tuple[Dict[str, Any], asyncio.Future, float]] = []
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tg-service")
+        self._task : Optional[asyncio.Task] = None
+
+    def start(self):
+        self._arrived = asyncio.Event()
+        self._full    = asyncio.Event()
+        self._task    = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self._pool.shutdown(wait=False)
+
+    def expected_wait(self, n: int = 1) -> float:
+        """Seconds until n more listings would be answered, from the batch EWMA."""
+        if self.batch_seconds is None:
+            return 0.0
+        return (math.ceil((self.pending + n) / self.max_batch) + 1) * self.batch_seconds
+
+    def admit(self, n: int):
+        if self.pending + n > self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.pending} listings queued (limit {self.max_queue})")
+        if self.budget and self.expected_wait(n) > self.budget:
+            self.rejected += 1
+            raise Overloaded(f"expected wait {self.expected_wait(n):.2f}s exceeds budget {self.budget:.2f}s")
+
+    async def submit(self, listings: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, float]]]:
+        self.admit(len(listings))
+        loop = asyncio.get_running_loop()
+        futs = [loop.create_future() for _ in listings]
+        now  = loop.time()
+        self.pending += len(listings)
+        self._buf.extend((l, f, now) for l, f in zip(listings, futs))
+        self._arrived.set()
+        if len(self._buf) >= self.max_batch:
+            self._full.set()
+        return list(await asyncio.gather(*futs))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            delay = self._buf[0][2] + self.max_wait - loop.time()
+            if len(self._buf) < self.max_batch and delay > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._buf = self._buf[:self.max_batch], self._buf[self.max_batch:]
+            if not self._buf:
+                self._arrived.clear()
+            await self._score(loop, batch)
+
+    async def _score(self, loop, batch):
+        start = loop.time()
+        try:
+            records = await loop.run_in_executor(self._pool, self._call, [l for l, _, _ in batch])
+        except Exception as exc:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        finally:
+            self.pending -= len(batch)
+        took = loop.time() - start
+        self.batches += 1
+        self.batch_seconds = took if self.batch_seconds is None else 0.8 * self.batch_seconds + 0.2 * took
+        for (_, fut, queued), rec in zip(batch, records):
+            if not fut.done():
+                fut.set_result((rec, {"queue_ms": round((start - queued) * 1000, 2),
+                                      "batch_ms": round(took * 1000, 2), "batch_size": len(batch)}))
+
+    def _call(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with metrics.timer("service_batch"):
+            return self.fn(listings)
+
+
+def _listing(obj: Any) -> Dict[str, Any]:
+    """A request listing in the load_listings shape; missing fields default."""
+    if not isinstance(obj, dict):
+        raise ValueError("each listing must be a JSON object")
+    asin = str(obj.get("id") or obj.get("asin") or "")
+    return {
+        "id":          asin,
+        "url":         obj.get("url") or obj.get("product_url") or (f"https://www.amazon.in/dp/{asin}" if asin else ""),
+        "title":       str(obj.get("title", "")),
+        "description": str(obj.get("description", "")),
+        "images":      [str(u) for u in obj.get("images", [])],
+        "reviews":     [str(r) for r in obj.get("reviews", [])],
+        "ratings":     [float(r) for r in obj.get("ratings", [])],
+        "returns":     int(obj.get("returns", 0) or 0),
+    }
+
+
+def service_disabled(disabled) -> set:
+    """The signals the service skips: `disabled` plus review-index inserts."""
+    return set(disabled) | {"embed"}
+
+
+def load_catalogue(index_dir: Optional[Path]):
+    """Use a saved review index, memory-mapped, for reuse lookups."""
+    from . import orchestrator
+    from .embed_store import EmbedDB
+
+    if index_dir is not None:
+        orchestrator.vecdb = EmbedDB.open(index_dir, kind=EMBED_INDEX, pq_m=EMBED_INDEX_PQ, mmap=True)
+
+
+def make_app(disabled=DISABLED_SIGNALS, cascade: bool = False, pack: int = LLM_PACK,
+             batcher: Optional[MicroBatcher] = None, warmup: bool = True) -> web.Application:
+    from .orchestrator import analyse_batch
+
+    disabled = service_disabled(disabled)
+    batcher  = batcher or MicroBatcher(lambda ls: analyse_batch(ls, disabled=disabled, pack=pack,
+                                                                cascade=cascade, tag=False))
+    # lookups still embed the request's reviews unless text is LLM-only
+    warm_skip = disabled - ({"embed"} if TEXT_MODE != "llm" else set())
+    state    = {"ready": not warmup, "error": None}
+
+    async def score(request: web.Request) -> web.Response:
+        if state["error"]:
+            return web.json_response({"error": f"warmup failed: {state['error']}"}, status=503)
+        if not state["ready"]:
+            return web.json_response({"error": "warming up"}, status=503, headers={"Retry-After": "5"})
+        try:
+            body = await request.json()
+            bulk = isinstance(body, list) or (isinstance(body, dict) and "listings" in body)
+            items = body if isinstance(body, list) else body["listings"] if bulk else [body]
+            listings = [_listing(o) for o in items]
+        except (ValueError, TypeError, KeyError) as exc:
+            return web.json_response({"error": f"bad request: {exc}"}, status=400)
+        metrics.inc("service.requests")
+        metrics.inc("service.listings", len(listings))
+        try:
+            scored = await batcher.submit(listings)
+        except Overloaded as exc:
+            metrics.inc("service.rejected")
+            retry = max(1, math.ceil(batcher.expected_wait()))
+            return web.json_response({"error": f"overloaded: {exc}"}, status=503,
+                                     headers={"Retry-After": str(retry)})
+        out = [{**rec, "latency_ms": lat} for rec, lat in scored]
+        return web.json_response({"results": out} if bulk else out[0],
+                                 dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+    async def healthz(_request: web.Request) -> web.Response:
+        body = {
+            "status": "ok" if state["ready"] else "failed" if state["error"] else "warming",
+            "error": state["error"],
+            "models": models.loaded_names(),
+            "pending": batcher.pending, "max_queue": batcher.max_queue,
+            "batches": batcher.batches, "rejected": batcher.rejected,
+            "batch_ms": round(batcher.batch_seconds * 1000, 2) if batcher.batch_seconds else None,
+        }
+        return web.json_response(body, status=200 if state["ready"] else 503)
+
+    async def prometheus(_request: web.Request) -> web.Response:
+        gauges = [
+            "# TYPE trustguard_service_pending gauge",
+            f"trustguard_service_pending {batcher.pending}",
+            f"trustguard_service_batches {batcher.batches}",
+            f"trustguard_service_batch_seconds {batcher.batch_seconds or 0.0}",
+            f"trustguard_service_ready {int(state['ready'])}",
+        ]
+        return web.Response(text=metrics.prometheus() + "\n".join(gauges) + "\n",
+                            content_type="text/plain")
+
+    def warmed(fut):
+        exc = fut.exception()
+        if exc is None:
+            state["ready"] = True
+            return
+        state["error"] = f"{type(exc).__name__}: {exc}"
+        print("✗ Warmup failed; /score answers 503 until restarted", file=sys.stderr)
+        traceback.print_exception(type(exc), exc, exc.__traceback__, file=sys.stderr)
+
+    async def on_startup(_app):
+        batcher.start()
+        if warmup:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(batcher._pool, models.warmup, None, warm_skip).add_done_callback(warmed)
+
+    async def on_cleanup(_app):
+        await batcher.stop()
+
+    app = web.Application(client_max_size=32 * 2**20)
+    app.router.add_post("/score", score)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", prometheus)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app["batcher"] = batcher
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TrustGuard+ scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--disable", default=",".join(sorted(DISABLED_SIGNALS)),
+                        help="Comma-separated signals to skip (text,visual,brand,embed)")
+    parser.add_argument("--cascade", action="store_true", help="Skip BLIP-2 / Gemini when the verdict is decided")
+    parser.add_argument("--pack", type=int, default=LLM_PACK, help="Listings per Gemini prompt")
+    parser.add_argument("--max-batch", type=int, default=SERVICE_MAX_BATCH, help="Listings per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=SERVICE_MAX_WAIT_MS,
+                        help="Longest a listing waits for its batch to fill")
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE,
+                        help="Pending listings above which requests get 503")
+    parser.add_argument("--budget-ms", type=float, default=SERVICE_BUDGET_MS,
+                        help="Refuse work whose expected wait exceeds this (0 = off)")
+    parser.add_argument("--index-dir", type=Path, default=None,
+                        help="Saved review index (batch_run --index-dir) to look up review reuse against; never written")
+    parser.add_argument("--stubs", action="store_true",
+                        help="Use trustguard.stubs instead of real models (point GEMINI_BASE_URL at a fake, or --disable text)")
+    args = parser.parse_args()
+    if args.stubs:
+        from . import stubs
+        stubs.install()
+    disabled = service_disabled(s.strip() for s in args.disable.split(",") if s.strip())
+    load_catalogue(args.index_dir)
+    from .orchestrator import analyse_batch
+    batcher = MicroBatcher(
+        lambda ls: analyse_batch(ls, disabled=disabled, pack=args.pack, cascade=args.cascade, tag=False),
+        max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue, budget=args.budget_ms / 1000)
+    web.run_app(make_app(disabled, args.cascade, args.pack, batcher), host=args.host, port=args.port)
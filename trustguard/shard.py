@@ -0,0 +1,191 @@
+from __future__ import annotations
+import array
+import gc
+import multiprocessing as mp
+import os
+import queue
+import sys
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from . import metrics, models
+from .config import DISABLED_SIGNALS, LLM_PACK
+from .llm_client import RateLimiter
+from .report import ReportWriter, open_writer, read_report, written_asins
+
+# Sharded batch mode: the parent loads every model once, then forks N workers
+# that inherit them copy-on-write. Listings are routed by crc32(ASIN) % N, each
+# worker streams its records to <out>.shard<i>.jsonl, and the parent merges the
+# shard files back into input order. Per-process state (review index, caches,
+# event loop, HTTP sessions) is per worker; the Gemini rate budget is shared.
+
+
+def shard_of(asin: str, shards: int) -> int:
+    return zlib.crc32(str(asin).encode("utf-8")) % shards
+
+
+def shard_path(output: Path, i: int) -> Path:
+    return Path(f"{output}.shard{i}.jsonl")
+
+
+def _set_threads(n: int):
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(n)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(n)
+
+
+def _worker(i: int, path: Path, inq, outq, opts: Dict[str, Any]):
+    from .orchestrator import analyse_batch, analyse_since
+
+    _set_threads(opts["threads"])
+    metrics.reset()
+    with ReportWriter(path, fmt="jsonl", resume=True, checkpoint_every=opts["checkpoint_every"]) as writer:
+        while True:
+            chunk = inq.get()
+            if chunk is None:
+                break
+            if opts["previous"] is not None:
+                records = analyse_since(chunk, opts["previous"], disabled=opts["disabled"],
+                                        pack=opts["pack"], cascade=opts["cascade"])
+            else:
+                records = analyse_batch(chunk, disabled=opts["disabled"], pack=opts["pack"],
+                                        cascade=opts["cascade"])
+            for record in records:
+                writer.write(record)
+            outq.put(("progress", i, len(chunk)))
+    outq.put(("done", i, metrics.summary()))
+
+
+def _put(q, item, proc, outq, on_result):
+    """Blocking put that notices a dead worker instead of hanging on its full queue."""
+    while True:
+        try:
+            q.put(item, timeout=1.0)
+            return
+        except queue.Full:
+            _drain(outq, on_result)
+            if not proc.is_alive():
+                raise RuntimeError(f"shard worker {proc.name} exited with code {proc.exitcode}")
+
+
+def _drain(outq, on_result, timeout: Optional[float] = None) -> bool:
+    try:
+        on_result(outq.get(timeout=timeout) if timeout else outq.get_nowait())
+        return True
+    except queue.Empty:
+        return False
+
+
+def done_asins(output: Path, shards: int) -> Set[str]:
+    """ASINs in the shard files of an interrupted sharded run."""
+    done: Set[str] = set()
+    for i in range(shards):
+        if shard_path(output, i).exists():
+            done.update(str(r.get("asin", "")) for r in read_report(shard_path(output, i)))
+    return done
+
+
+def merge(output: Path, order: Iterable[int], shards: int, checkpoint_every: Optional[int] = None,
+          store=None, resume: bool = False) -> int:
+    """Interleave the shard files back into input order, after the records
+    already in `output` when resuming; shard files are removed once the merged
+    report is closed. `order` lists the shard of every listing not yet in `output`."""
+    with open_writer(output, resume=resume, checkpoint_every=checkpoint_every, store=store) as writer:
+        kept    = set(writer.done)  # an interrupted merge may have copied some already
+        readers = [(r for r in read_report(shard_path(output, i)) if str(r.get("asin", "")) not in kept)
+                   for i in range(shards)]
+        for i in order:
+            try:
+                writer.write(next(readers[i]))
+            except StopIteration:
+                raise RuntimeError(f"shard {i} is missing records; rerun with --resume") from None
+    for i in range(shards):
+        shard_path(output, i).unlink()
+    return writer.count
+
+
+def run_sharded(listings: Iterable[Dict[str, Any]], output: Path, shards: int,
+                disabled=DISABLED_SIGNALS, window: int = 32, pack: int = LLM_PACK,
+                cascade: bool = False, resume: bool = False, checkpoint_every: Optional[int] = None,
+                threads: Optional[int] = None,
+                progress: Optional[Callable[[int], None]] = None,
+                previous: Optional[Dict[str, Dict[str, Any]]] = None,
+                store=None) -> Dict[str, Any]:
+    """Score `listings` across `shards` forked workers and write one ordered report.
+    With `previous` (asin -> old record), workers run analyse_since instead."""
+    ctx = mp.get_context("fork")
+    threads = threads or max(1, (os.cpu_count() or 1) // shards)
+
+    # load once here; workers share the weights copy-on-write
+    models.warmup(disabled=disabled)
+    if "text" not in disabled:
+        models.get("gemini").limiter = RateLimiter(shared=True)
+    gc.freeze()  # keep refcount updates off the inherited pages
+
+    # listings already in the report are skipped outright; those in shard files
+    # are not rescored, but still merged
+    reported = written_asins(output) if resume else set()
+    done     = (done_asins(output, shards) | reported) if resume else set()
+    if not resume:
+        for i in range(shards):
+            shard_path(output, i).unlink(missing_ok=True)
+
+    opts  = {"disabled": disabled, "pack": pack, "cascade": cascade,
+             "checkpoint_every": checkpoint_every, "threads": threads, "previous": previous}
+    outq  = ctx.Queue()
+    inqs  = [ctx.Queue(maxsize=4) for _ in range(shards)]
+    procs = [ctx.Process(target=_worker, args=(i, shard_path(output, i), inqs[i], outq, opts),
+                         name=f"tg-shard-{i}", daemon=True) for i in range(shards)]
+    for p in procs:
+        p.start()
+    gc.unfreeze()
+
+    counts   = [0] * shards
+    finished : List[int] = []
+
+    def on_result(msg):
+        kind, i, payload = msg
+        if kind == "progress":
+            if progress:
+                progress(payload)
+        else:
+            metrics.merge(payload)
+            finished.append(i)
+
+    order   = array.array("H")
+    pending : List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+    try:
+        for listing in listings:
+            i = shard_of(listing["id"], shards)
+            counts[i] += 1
+            if str(listing["id"]) in reported:
+                continue
+            order.append(i)
+            if str(listing["id"]) in done:
+                continue
+            pending[i].append(listing)
+            if len(pending[i]) >= window:
+                _put(inqs[i], pending[i], procs[i], outq, on_result)
+                pending[i] = []
+            while _drain(outq, on_result):
+                pass
+        for i in range(shards):
+            if pending[i]:
+                _put(inqs[i], pending[i], procs[i], outq, on_result)
+            _put(inqs[i], None, procs[i], outq, on_result)
+        while len(finished) < shards:
+            if not _drain(outq, on_result, timeout=1.0):
+                dead = [p for i, p in enumerate(procs) if i not in finished and not p.is_alive()]
+                if dead and not _drain(outq, on_result, timeout=1.0):
+                    raise RuntimeError(f"shard worker {dead[0].name} exited with code {dead[0].exitcode}")
+    finally:
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+    written = merge(output, order, shards, checkpoint_every, store, resume)
+    return {"shards": shards, "threads_per_shard": threads, "listings_per_shard": counts,
+            "resumed": len(done), "written": written}
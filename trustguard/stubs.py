@@ -0,0 +1,144 @@
+"""Tiny stand-ins for the heavy backends, registered through the model registry.
+
+They keep the real call signatures and return deterministic, plausible outputs
+after a configurable sleep, so the pipeline can be benchmarked offline without
+model weights. Gemini has no stub here: point GEMINI_BASE_URL at a local fake
+endpoint (see bench/server.py) so the real client and rate limiter are measured.
+"""
+from __future__ import annotations
+import hashlib
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from . import models
+
+# seconds per item (image, prompt, text) each stub sleeps
+DEFAULT_LATENCY: Dict[str, float] = {
+    "clip": 0.002, "blip2": 0.05, "paddle_ocr": 0.02, "flan_t5": 0.05, "sbert": 0.0005,
+}
+
+STUB_BRANDS = ("nike", "adidas", "puma", "reebok", "converse", "")
+
+
+def _seed(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _unit(rows: np.ndarray) -> np.ndarray:
+    return rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+
+
+class StubSBERT:
+    """Hashed bag-of-words vectors: identical texts embed identically and
+    near-duplicates stay close, like the real model."""
+
+    def __init__(self, dim: int = 384, latency: float = 0.0):
+        self.dim, self.latency = dim, latency
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True, **_) -> np.ndarray:
+        time.sleep(self.latency * len(texts))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in t.lower().split():
+                out[i, _seed(w.encode()) % self.dim] += 1.0
+        out[:, 0] += 1e-3  # no all-zero rows
+        return _unit(out) if normalize_embeddings else out
+
+
+class StubOCR:
+    """PaddleOCR 2.x-shaped `.ocr()` reading a brand picked from the pixels
+    (pages of boxes for det-only, flat [box, (text, conf)] lines otherwise)."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def ocr(self, arr: np.ndarray, det: bool = True, rec: bool = True):
+        time.sleep(self.latency)
+        h, w = arr.shape[:2]
+        box = [[0, 0], [w // 2, 0], [w // 2, h // 4], [0, h // 4]]
+        if not rec:
+            return [[box]]
+        brand = STUB_BRANDS[_seed(np.ascontiguousarray(arr[::16, ::16]).tobytes()) % len(STUB_BRANDS)]
+        return [[box, (brand.upper(), 0.9)]] if brand else []
+
+
+class StubFlan:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def __call__(self, prompt: str, max_new_tokens: int = 8, **_) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        return [{"generated_text": STUB_BRANDS[_seed(prompt.encode()) % (len(STUB_BRANDS) - 1)]}]
+
+
+def _stub_clip(latency: float, dim: int = 512):
+    import torch
+
+    gen  = torch.Generator().manual_seed(0)
+    proj = torch.randn(3 * 16 * 16, dim, generator=gen)
+    vocab = torch.randn(49408, dim, generator=gen)
+
+    def preprocess(img):
+        small = np.asarray(img.convert("RGB").resize((16, 16)), dtype=np.float32) / 255.0
+        return torch.from_numpy(small.transpose(2, 0, 1).copy())
+
+    class Model:
+        def encode_image(self, x):
+            time.sleep(latency * x.shape[0])
+            return x.reshape(x.shape[0], -1).float() @ proj
+
+        def encode_text(self, tokens):
+            time.sleep(latency * tokens.shape[0])
+            mask = (tokens > 0).float().unsqueeze(-1)
+            return (vocab[tokens] * mask).sum(1)
+
+    return Model(), preprocess
+
+
+def _stub_blip2(latency: float):
+    import torch
+
+    class Inputs(dict):
+        def to(self, *_args, **_kw):
+            return self
+
+    class Processor:
+        def __call__(self, images=None, text=None, padding=True, return_tensors="pt"):
+            px = torch.stack([torch.from_numpy(np.asarray(im.resize((8, 8)), dtype=np.float32)) for im in images])
+            ids = torch.tensor([[_seed(t.encode()) % 1000 + 1] for t in text])
+            return Inputs(pixel_values=px, input_ids=ids)
+
+        def batch_decode(self, ids, skip_special_tokens=True):
+            return [f"{int(i) % 10 / 10:.1f}" for i in ids[:, -1].tolist()]
+
+    class Model(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.w = torch.nn.Parameter(torch.zeros(1))
+
+        def generate(self, pixel_values=None, input_ids=None, max_new_tokens=5, **_):
+            time.sleep(latency * pixel_values.shape[0])
+            score = (pixel_values.mean(dim=(1, 2, 3)) * 7).long() % 10
+            return torch.cat([input_ids, score.unsqueeze(1)], dim=1)
+
+    return Processor(), Model().eval()
+
+
+def install(latency: Optional[Dict[str, float]] = None, names: Optional[List[str]] = None) -> Dict[str, float]:
+    """Swap the registry loaders for stubs (all of DEFAULT_LATENCY, or `names`),
+    dropping any real model already loaded. Returns the latencies in use."""
+    lat = {**DEFAULT_LATENCY, **(latency or {})}
+    loaders = {
+        "sbert":      lambda: StubSBERT(latency=lat["sbert"]),
+        "paddle_ocr": lambda: StubOCR(latency=lat["paddle_ocr"]),
+        "flan_t5":    lambda: StubFlan(latency=lat["flan_t5"]),
+        "clip":       lambda: _stub_clip(lat["clip"]),
+        "blip2":      lambda: _stub_blip2(lat["blip2"]),
+    }
+    for name in names or list(loaders):
+        models.unload(name)
+        models.register(name)(loaders[name])
+    return lat
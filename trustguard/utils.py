@@ -1,18 +1,49 @@
-from functools import lru_cache
-import requests, io, asyncio, aiohttp
-from PIL import Image
+import asyncio, atexit, os, threading
+
+_loop      = None
+_loop_pid  = None
+_loop_lock = threading.Lock()
+_closers   = []
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    # one I/O event loop per process (re-created after fork)
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="trustguard-io").start()
+            _loop_pid = os.getpid()
+    return _loop
+
+def run_sync(coro, timeout=None):
+    # never call from inside the background loop itself
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result(timeout)
+
+def at_exit(close):
+    # close() -> coroutine; run on the background loop when the interpreter exits
+    _closers.append(close)
+    return close
+
+@atexit.register
+def _shutdown():
+    if _loop is None or _loop_pid != os.getpid() or not _loop.is_running():
+        return
+    for close in _closers:
+        try:
+            run_sync(close(), timeout=5)
+        except Exception:
+            pass
 
-@lru_cache(maxsize=1024)
 def fetch_image_bytes(url: str) -> bytes:
-    return requests.get(url, timeout=10).content
+    from . import fetch
+    return fetch.get(url) or b""
 
 async def fetch_many(urls):
-    async with aiohttp.ClientSession() as sess:
-        async def grab(u):
-            async with sess.get(u, timeout=15) as resp:
-                return await resp.read()
-        tasks = [grab(u) for u in urls]
-        return await asyncio.gather(*tasks)
-
-def bytes_to_pil(b: bytes):
-    return Image.open(io.BytesIO(b)).convert("RGB")
\ No newline at end of file
+    # the fetcher's session lives on the background loop, not the caller's
+    from . import fetch
+    fut = asyncio.run_coroutine_threadsafe(fetch.default().fetch_all(list(urls)), background_loop())
+    return await asyncio.wrap_future(fut)
+
+def bytes_to_pil(b: bytes, size=None):
+    from .images import SharedImage
+    return SharedImage(b).pil(size)
@@ -1,103 +1,236 @@
-import time
-import functools
-import io
 import re
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Sequence, Tuple, Union
 
-import requests
-import torch, clip
-from PIL import Image, UnidentifiedImageError
-from transformers import Blip2Processor, Blip2ForConditionalGeneration
+from PIL import UnidentifiedImageError
 
-from .config import CLIP_VARIANT
+from . import metrics, models
+from .clip_store import ClipStore, dhash
+from .config import BLIP2_BATCH, CLIP_PHASH_REUSE, CLIP_STORE_DIR, CLIP_VARIANT
+from .images import BLIP2_SIZE, CLIP_SIZE, ImageBatch, SharedImage, shared
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+def _clip_input(img: SharedImage):
+    return img.input("clip", models.get("clip")[1], CLIP_SIZE)
 
-clip_model, preprocess = clip.load(CLIP_VARIANT, device=DEVICE)
-if DEVICE == "cuda":
-    clip_model = clip_model.half()
-
-@functools.lru_cache(maxsize=4096)
-def _download(url: str) -> Optional[bytes]:
-    try:
-        r = requests.get(url, timeout=10)
-        return r.content if r.ok else None
-    except requests.RequestException:
-        return None
-
-def _safe_similarity(title: str, raw: bytes) -> Optional[float]:
-    try:
-        img = Image.open(io.BytesIO(raw)).convert("RGB")
-        img_t = preprocess(img).unsqueeze(0).to(DEVICE)
-        txt_t = clip.tokenize([title]).to(DEVICE)
-        with torch.no_grad():
-            v = clip_model.encode_image(img_t)
-            t = clip_model.encode_text(txt_t)
-            v = v / v.norm(dim=-1, keepdim=True)
-            t = t / t.norm(dim=-1, keepdim=True)
-            return float((v @ t.T).item())
-    except UnidentifiedImageError:
+def _safe_similarity(title: str, raw: Union[bytes, SharedImage]) -> Optional[float]:
+    import torch, clip
+    clip_model, _ = models.get("clip")
+    dev = models.device()
+    px = _clip_input(shared(raw))
+    if px is None:
         return None
-
-def worst_clip_score(title: str, image_urls: List[str], top_n: int = 3) -> float:
-    sims: List[float] = []
-    for url in image_urls[:top_n]:
-        raw = _download(url)
-        if raw is None:
+    img_t = px.unsqueeze(0).to(dev)
+    txt_t = clip.tokenize([title]).to(dev)
+    with torch.no_grad():
+        v = clip_model.encode_image(img_t)
+        t = clip_model.encode_text(txt_t)
+        v = v / v.norm(dim=-1, keepdim=True)
+        t = t / t.norm(dim=-1, keepdim=True)
+        return float((v @ t.T).item())
+
+def worst_clip_score(title: str, image_urls: List[str], top_n: int = 3,
+                     images: Optional[ImageBatch] = None) -> float:
+    return clip_risk_batch([(title, image_urls)], top_n=top_n, images=images)[0]
+
+
+_store: Optional[ClipStore] = None
+
+def store() -> ClipStore:
+    global _store
+    if _store is None:
+        _store = ClipStore(CLIP_STORE_DIR / re.sub(r"[^A-Za-z0-9_.-]", "_", CLIP_VARIANT))
+    return _store
+
+metrics.source("clip_store", lambda: store().stats())
+
+def _phash(img: SharedImage) -> Optional[int]:
+    return img.input("dhash", dhash, size=CLIP_SIZE)  # same decode CLIP preprocessing uses
+
+def _encode_batched(encode, tensors, batch_size: int):
+    import torch
+    dev = models.device()
+    out = []
+    with torch.no_grad():
+        for i in range(0, len(tensors), batch_size):
+            feats = encode(torch.stack(tensors[i:i + batch_size]).to(dev)).float()
+            out.append(feats / feats.norm(dim=-1, keepdim=True))
+    return torch.cat(out)
+
+def _image_vectors(imgs: List[SharedImage], batch_size: int, workers: int):
+    """Unit CLIP vectors for decodable images (None otherwise). The encoder
+    only sees images whose content, or a near-identical copy, is not stored yet."""
+    import numpy as np
+    db   = store()
+    live = [img for img in dict.fromkeys(img for img in imgs if img)]  # unique objects, fetched
+    known = db.get_images([img.digest for img in live])
+    vecs  = {img: known[img.digest] for img in live if img.digest in known}
+
+    todo = [img for img in live if img not in vecs]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(_phash, todo))
+    fresh: List[SharedImage] = []
+    for img, ph in zip(todo, hashes):
+        if ph is None:
             continue
-        sim = _safe_similarity(title, raw)
-        if sim is not None:
-            sims.append(sim)
-    return 1.0 if not sims else 1.0 - min(sims)
-
-
-processor = Blip2Processor.from_pretrained("Salesforce/blip2-opt-2.7b", use_fast=True)
-blip2     = Blip2ForConditionalGeneration.from_pretrained(
-    "Salesforce/blip2-opt-2.7b"
-).to(DEVICE).eval()
-
-MAX_CALLS_PER_MIN = 15
-MIN_INTERVAL    = 60.0 / MAX_CALLS_PER_MIN
-_last_call_time = 0.0
-
-def blip2_vision_risk(title: str, raw: bytes) -> float:
-    global _last_call_time
-    since = time.time() - _last_call_time
-    if since < MIN_INTERVAL:
-        time.sleep(MIN_INTERVAL - since)
-
-    img = Image.open(io.BytesIO(raw)).convert("RGB")
-    prompt = (
+        reused = db.reuse(img.digest, ph, CLIP_PHASH_REUSE)
+        if reused is not None:
+            vecs[img] = reused
+        else:
+            fresh.append(img)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pixels = list(pool.map(_clip_input, fresh))
+    fresh = [(img, px) for img, px in zip(fresh, pixels) if px is not None]
+    if fresh:
+        clip_model, _ = models.get("clip")
+        enc = _encode_batched(clip_model.encode_image, [px for _, px in fresh], batch_size).cpu().numpy()
+        firsts = {}
+        for (img, _), v in zip(fresh, enc):
+            vecs[img] = v
+            firsts.setdefault(img.digest, (img, v))  # same bytes under two URLs
+        db.put_images([d for d in firsts], [_phash(img) for img, _ in firsts.values()],
+                      np.stack([v for _, v in firsts.values()]))
+    return [vecs.get(img) for img in imgs]
+
+def _text_vectors(titles: List[str], batch_size: int):
+    import numpy as np, clip
+    db = store()
+    known = db.get_texts(titles)
+    todo = [t for t in titles if t not in known]
+    if todo:
+        clip_model, _ = models.get("clip")
+        enc = _encode_batched(clip_model.encode_text, list(clip.tokenize(todo, truncate=True)), batch_size).cpu().numpy()
+        db.put_texts(todo, enc)
+        known.update(zip(todo, enc))
+    return np.stack([known[t] for t in titles])
+
+@metrics.timed("clip")
+def clip_risk_batch(items: Sequence[Tuple[str, List[str]]], top_n: int = 3,
+                    batch_size: int = 32, workers: int = 4,
+                    images: Optional[ImageBatch] = None,
+                    owners: Optional[Sequence[str]] = None) -> List[float]:
+    """Batched worst_clip_score over many (title, image_urls) listings.
+    Embeddings come from the persistent ClipStore where possible; `owners`
+    (listing ids) are recorded there for duplicate-image lookups."""
+    import numpy as np
+    idx, urls = [], []
+    for i, (_, image_urls) in enumerate(items):
+        for url in image_urls[:top_n]:
+            idx.append(i)
+            urls.append(url)
+
+    imgs  = (images if images is not None else ImageBatch()).many(urls)
+    vecs  = _image_vectors(imgs, batch_size, workers)
+    keep  = [(o, img, v) for o, img, v in zip(idx, imgs, vecs) if v is not None]
+    risks = [1.0] * len(items)
+    if not keep:
+        return risks
+    if owners is not None:
+        store().tag({(img.digest, owners[o]) for o, img, _ in keep})
+
+    titles = list(dict.fromkeys(items[o][0] for o, _, _ in keep))
+    t_idx  = {t: j for j, t in enumerate(titles)}
+    t = _text_vectors(titles, batch_size)
+    v = np.stack([v for _, _, v in keep])
+    sims = np.einsum("ij,ij->i", v, t[[t_idx[items[o][0]] for o, _, _ in keep]])
+
+    worst: dict = {}
+    for (o, _, _), sim in zip(keep, sims.tolist()):
+        worst[o] = min(sim, worst.get(o, sim))
+    for o, sim in worst.items():
+        risks[o] = 1.0 - sim
+    return risks
+
+
+def _blip_prompt(title: str) -> str:
+    return (
         "On a scale 0.0 (no relation) → 1.0 (perfect match), how well does "
         "this product title describe the image? Answer with single decimal.\n\n"
         f"Product Title: {title}"
     )
 
-    inputs = processor(img, prompt, return_tensors="pt").to(DEVICE)
-    out_ids = blip2.generate(**inputs, max_new_tokens=5)
-    answer = processor.decode(out_ids[0], skip_special_tokens=True)
-
+def _blip_answer_risk(answer: str) -> float:
     m = re.search(r"[01]\.[0-9]+|0|1", answer)
     score = float(m.group(0)) if m else 0.5
-
-    _last_call_time = time.time()
     return 1.0 - max(0.0, min(score, 1.0))
 
-
-def weighted_visual_risk(title: str, image_urls: List[str],clip_n:  int = 3,blip_n:  int = 1,strictness_factor: float = 0.5,  # <1.0 → less strict (lower risk)
-) -> float:
-    clip_r = worst_clip_score(title, image_urls, top_n=clip_n)
-
-    blip_r = 0.0
-    for url in image_urls[:blip_n]:
-        raw = _download(url)
-        if raw is None:
-            continue
-        blip_r = max(blip_r, blip2_vision_risk(title, raw))
-
+@metrics.timed("blip2")
+def blip2_risk_batch(items: Sequence[Tuple[str, Union[bytes, SharedImage, None]]],
+                     batch_size: int = BLIP2_BATCH) -> List[Optional[float]]:
+    """BLIP-2 title/image risk for many (title, image) pairs, padded into
+    batches for one generate() call each. None where the image is unreadable."""
+    import torch
+    processor, blip2 = models.get("blip2")
+    dtype = next(blip2.parameters()).dtype
+    dtype = dtype if dtype.is_floating_point else torch.float32  # int8 dynamic-quant keeps float inputs
+
+    imgs  = [shared(raw).pil(BLIP2_SIZE) for _, raw in items]
+    keep  = [i for i, img in enumerate(imgs) if img is not None]
+    risks : List[Optional[float]] = [None] * len(items)
+    for j in range(0, len(keep), batch_size):
+        idx    = keep[j:j + batch_size]
+        inputs = processor(images=[imgs[i] for i in idx], text=[_blip_prompt(items[i][0]) for i in idx],
+                           padding=True, return_tensors="pt").to(models.device())
+        inputs["pixel_values"] = inputs["pixel_values"].to(dtype)
+        with torch.inference_mode():
+            out_ids = blip2.generate(**inputs, max_new_tokens=5)
+        n_in = inputs["input_ids"].shape[1]
+        if out_ids.shape[1] > n_in and torch.equal(out_ids[:, :n_in], inputs["input_ids"]):
+            out_ids = out_ids[:, n_in:]  # newer transformers echo the prompt
+        for i, answer in zip(idx, processor.batch_decode(out_ids, skip_special_tokens=True)):
+            risks[i] = _blip_answer_risk(answer)
+    return risks
+
+def blip2_vision_risk(title: str, raw: Union[bytes, SharedImage]) -> float:
+    risk = blip2_risk_batch([(title, raw)])[0]
+    if risk is None:
+        raise UnidentifiedImageError(f"cannot identify image for {title!r}")
+    return risk
+
+
+def blip_risk_batch(items: Sequence[Tuple[str, List[str]]], blip_n: int = 1,
+                    images: Optional[ImageBatch] = None) -> List[float]:
+    """blip_risk over many (title, image_urls) listings in shared BLIP-2 batches."""
+    owners, pairs = [], []
+    for i, (title, image_urls) in enumerate(items):
+        for url in image_urls[:blip_n]:
+            owners.append(i)
+            pairs.append((title, url))
+    imgs  = (images if images is not None else ImageBatch()).many(u for _, u in pairs)
+    risks = [0.0] * len(items)
+    for o, r in zip(owners, blip2_risk_batch([(t, img) for (t, _), img in zip(pairs, imgs)])):
+        if r is not None:
+            risks[o] = max(risks[o], r)
+    return risks
+
+
+def blip_risk(title: str, image_urls: List[str], blip_n: int = 1,
+              images: Optional[ImageBatch] = None) -> float:
+    return blip_risk_batch([(title, image_urls)], blip_n, images)[0]
+
+
+def combine_visual(clip_r: float, blip_r: float, strictness_factor: float = 0.5) -> float:
     base = 0.2 * clip_r + 0.8 * blip_r
     # downscale the risk to make it less strict:
     risk = base * strictness_factor
 
     # clamp to [0,1]
     return min(1.0, max(0.0, risk))
+
+
+def visual_risk_bounds(clip_r: float, strictness_factor: float = 0.5) -> Tuple[float, float]:
+    """Range weighted_visual_risk can still take once CLIP is known (BLIP-2 in [0, 1])."""
+    return combine_visual(clip_r, 0.0, strictness_factor), combine_visual(clip_r, 1.0, strictness_factor)
+
+
+def weighted_visual_risk(title: str, image_urls: List[str],clip_n:  int = 3,blip_n:  int = 1,strictness_factor: float = 0.5,  # <1.0 → less strict (lower risk)
+    clip_r: Optional[float] = None,  # precomputed by clip_risk_batch
+    blip_r: Optional[float] = None,  # precomputed by blip_risk_batch
+    images: Optional[ImageBatch] = None,  # shared decodes for this listing / window
+) -> float:
+    images = images if images is not None else ImageBatch()
+    if clip_r is None:
+        clip_r = worst_clip_score(title, image_urls, top_n=clip_n, images=images)
+    if blip_r is None:
+        blip_r = blip_risk(title, image_urls, blip_n, images)
+    return combine_visual(clip_r, blip_r, strictness_factor)